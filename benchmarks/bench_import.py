@@ -0,0 +1,63 @@
+"""
+冷启动导入耗时: 每次在新的 python 进程中导入, 取中位数
+
+超过 --budget-ms 时以非 0 状态码退出, 可用于 CI 或部署前检查
+运行: python -m benchmarks.bench_import --budget-ms 1500
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CASES = {
+    "import parser": "import parser",
+    "import parser + warm up all": "import parser; parser.warm_up_parsers('all')",
+    "import main": "import main",
+}
+
+TIMING_CODE = """
+import time
+start = time.perf_counter()
+{code}
+print(time.perf_counter() - start)
+"""
+
+
+def measure(code: str, repeat: int) -> float:
+    costs = []
+    for _ in range(repeat):
+        output = subprocess.check_output(
+            [sys.executable, "-c", TIMING_CODE.format(code=code)],
+            cwd=ROOT_DIR,
+            env={**os.environ, "PARSER_WARMUP": ""},
+        )
+        costs.append(float(output.decode().strip().splitlines()[-1]))
+    return statistics.median(costs)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("-r", "--repeat", type=int, default=5)
+    arg_parser.add_argument(
+        "--budget-ms", type=float, default=1500, help="import main 的耗时上限(毫秒)"
+    )
+    args = arg_parser.parse_args()
+
+    results = {}
+    for name, code in CASES.items():
+        results[name] = measure(code, args.repeat) * 1e3
+        print(f"{name + ':':<30}{results[name]:.1f} ms")
+
+    cold_start = results["import main"]
+    if cold_start > args.budget_ms:
+        print(f"cold start {cold_start:.1f} ms exceeds budget {args.budget_ms:.0f} ms")
+        sys.exit(1)
+    print(f"cold start {cold_start:.1f} ms within budget {args.budget_ms:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+接口返回序列化耗时对比: fastapi 默认(jsonable_encoder + json.dumps) vs utils.fastjson
+
+运行: python -m benchmarks.bench_json --images 200
+"""
+
+import argparse
+import json
+import timeit
+
+from fastapi.encoders import jsonable_encoder
+
+from parser.base import ImgInfo, VideoAuthor, VideoInfo
+from utils import fastjson
+
+
+def build_gallery(image_count: int) -> VideoInfo:
+    cdn = "https://sns-webpic-qc.xhscdn.com/202410171200/0123456789abcdef"
+    return VideoInfo(
+        video_url="",
+        cover_url=f"{cdn}/cover!nd_dft_wlteh_webp_3",
+        title="大图集测试" * 5,
+        desc="图集描述 #话题 " * 50,
+        images=[
+            ImgInfo(
+                url=f"{cdn}/image_{i}?imageView2/format/png",
+                live_photo_url=f"{cdn}/live_{i}.mp4?sign=abcdef&t=6710a0b0",
+            )
+            for i in range(image_count)
+        ],
+        author=VideoAuthor(uid="5f1e2d3c4b5a", name="作者", avatar=f"{cdn}/avatar"),
+    )
+
+
+def fastapi_default(content: dict) -> bytes:
+    # 与 fastapi 返回 dict 时的处理一致: jsonable_encoder 后由 JSONResponse 序列化
+    return json.dumps(
+        jsonable_encoder(content),
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("--images", type=int, default=200)
+    arg_parser.add_argument("-n", "--number", type=int, default=200)
+    args = arg_parser.parse_args()
+
+    video_info = build_gallery(args.images)
+    content = {"code": 200, "msg": "解析成功", "data": video_info}
+
+    assert json.loads(fastapi_default(content)) == json.loads(fastjson.dumps(content))
+
+    default_cost = timeit.timeit(lambda: fastapi_default(content), number=args.number)
+    fast_cost = timeit.timeit(lambda: fastjson.dumps(content), number=args.number)
+
+    print(f"images: {args.images}, backend: {fastjson.JSON_BACKEND}")
+    print(f"fastapi default: {default_cost / args.number * 1e6:.1f} us/response")
+    print(f"fastjson:        {fast_cost / args.number * 1e6:.1f} us/response")
+    print(f"speedup:         {default_cost / fast_cost:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
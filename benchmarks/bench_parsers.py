@@ -0,0 +1,163 @@
+"""
+各平台解析器离线基准测试: 上游请求由 benchmarks.fixtures 的模拟响应返回, 不访问网络
+
+统计每个解析器单次解析的 CPU 时间、内存分配峰值和吞吐量(次/秒),
+与基准文件对比, CPU 时间或内存超过基准 --threshold 时标记为退化并以非 0 状态码退出
+
+运行: python -m benchmarks.bench_parsers -n 200
+更新基准: python -m benchmarks.bench_parsers -n 200 --update-baseline
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import tracemalloc
+from typing import Dict, List
+
+import httpx
+
+import parser
+from benchmarks.fixtures import SHARE_URLS, PlatformFixtures
+from parser.base import VideoSource, short_link_cache
+from parser.redbook import png_support_cache
+from utils.http_client import http_client_registry
+from utils.ratelimit import rate_limiter_registry
+from utils.user_agent import user_agent_pool
+
+BASELINE_FILE = os.path.join(os.path.dirname(__file__), "baseline_parsers.json")
+
+
+def clear_caches() -> None:
+    # 每次都完整解析, 不命中短链接跳转和图片格式探测缓存
+    short_link_cache.clear()
+    png_support_cache.clear()
+
+
+async def parse_once(source: VideoSource) -> None:
+    clear_caches()
+    await parser.get_parser_class(source)().parse_share_url(SHARE_URLS[source])
+
+
+async def bench_source(source: VideoSource, number: int) -> Dict[str, float]:
+    # 预热: 导入解析器模块, 创建 client
+    await parse_once(source)
+
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    for _ in range(number):
+        await parse_once(source)
+    cpu_cost = time.process_time() - cpu_start
+    wall_cost = time.perf_counter() - wall_start
+
+    # 内存统计单独运行, tracemalloc 会明显拖慢解析
+    peaks = []
+    tracemalloc.start()
+    for _ in range(min(number, 20)):
+        tracemalloc.reset_peak()
+        current, _ = tracemalloc.get_traced_memory()
+        await parse_once(source)
+        peaks.append(tracemalloc.get_traced_memory()[1] - current)
+    tracemalloc.stop()
+
+    return {
+        "cpu_us": cpu_cost / number * 1e6,
+        "alloc_kib": sum(peaks) / len(peaks) / 1024,
+        "parses_per_sec": number / wall_cost,
+    }
+
+
+def load_baseline() -> Dict[str, Dict[str, float]]:
+    if not os.path.exists(BASELINE_FILE):
+        return {}
+    with open(BASELINE_FILE, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def find_regressions(
+    results: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Dict[str, float]],
+    threshold: float,
+) -> List[str]:
+    regressions = []
+    for source, result in results.items():
+        if source not in baseline:
+            continue
+        for metric in ("cpu_us", "alloc_kib"):
+            base_value = baseline[source][metric]
+            if base_value > 0 and result[metric] > base_value * (1 + threshold):
+                regressions.append(
+                    f"{source} {metric}: {result[metric]:.1f} > "
+                    f"baseline {base_value:.1f} (+{threshold:.0%})"
+                )
+    return regressions
+
+
+async def run(sources: List[VideoSource], number: int, padding: int):
+    rate_limiter_registry.config = {"default": {"rate": 0, "max_concurrency": 1000}}
+    http_client_registry.configure(
+        transport=httpx.MockTransport(PlatformFixtures(padding=padding))
+    )
+    user_agent_pool.load()
+
+    results = {}
+    try:
+        for source in sources:
+            results[source.value] = await bench_source(source, number)
+    finally:
+        await http_client_registry.aclose()
+    return results
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("-n", "--number", type=int, default=200)
+    arg_parser.add_argument(
+        "-s", "--source", action="append", help="只测试指定平台, 可重复"
+    )
+    arg_parser.add_argument(
+        "--padding", type=int, default=20000, help="模拟响应中的无关数据大小(字节)"
+    )
+    arg_parser.add_argument(
+        "--threshold", type=float, default=0.2, help="超过基准多少比例视为退化"
+    )
+    arg_parser.add_argument("--update-baseline", action="store_true")
+    args = arg_parser.parse_args()
+
+    sources = [VideoSource(i) for i in args.source] if args.source else list(SHARE_URLS)
+    results = asyncio.run(run(sources, args.number, args.padding))
+
+    baseline = load_baseline()
+    print(
+        f"{'source':<14}{'cpu(us)':>10}{'alloc(KiB)':>12}"
+        f"{'parses/s':>10}{'vs base':>10}"
+    )
+    for source, result in results.items():
+        base_cpu = baseline.get(source, {}).get("cpu_us")
+        diff = f"{result['cpu_us'] / base_cpu - 1:+.0%}" if base_cpu else "-"
+        print(
+            f"{source:<14}{result['cpu_us']:>10.1f}{result['alloc_kib']:>12.1f}"
+            f"{result['parses_per_sec']:>10.0f}{diff:>10}"
+        )
+
+    if args.update_baseline:
+        with open(BASELINE_FILE, "w", encoding="utf-8") as f:
+            json.dump({**baseline, **results}, f, indent=2, sort_keys=True)
+        print(f"baseline updated: {BASELINE_FILE}")
+        return
+
+    if not baseline:
+        print("no baseline, run with --update-baseline to create one")
+        return
+
+    regressions = find_regressions(results, baseline, args.threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+小红书 window.__INITIAL_STATE__ 解析耗时对比: yaml.safe_load vs utils.jsobject
+
+页面数据为按线上结构生成的模拟数据, 其中包含 undefined 值
+分享页通常只有一篇笔记, --notes 调大时 noteDetailMap 占比变大, 局部解析的收益随之减小
+
+运行: python -m benchmarks.bench_redbook_state --notes 1 --images 18
+"""
+
+import argparse
+import json
+import timeit
+
+import yaml
+
+from utils import jsobject
+
+
+def build_state(note_count: int, image_count: int) -> str:
+    cdn = "https://sns-webpic-qc.xhscdn.com/202410171200/0123456789abcdef"
+    note_detail_map = {}
+    for i in range(note_count):
+        note_id = f"6710a0b0000000001{i:07d}"
+        note_detail_map[note_id] = {
+            "comments": {"list": [], "cursor": "", "hasMore": True},
+            "currentTime": 1729137600000,
+            "note": {
+                "noteId": note_id,
+                "type": "normal",
+                "title": f"笔记标题 {i}",
+                "desc": "笔记描述 #话题[话题]# " * 20,
+                "user": {
+                    "userId": "5f1e2d3c4b5a",
+                    "nickname": "作者",
+                    "avatar": f"{cdn}/avatar",
+                },
+                "imageList": [
+                    {
+                        "urlDefault": f"{cdn}/image_{j}!nd_dft_wlteh_webp_3",
+                        "width": 1080,
+                        "height": 1440,
+                        "livePhoto": False,
+                        "infoList": [
+                            {"imageScene": "WB_PRV", "url": f"{cdn}/prv_{j}"},
+                            {"imageScene": "WB_DFT", "url": f"{cdn}/dft_{j}"},
+                        ],
+                    }
+                    for j in range(image_count)
+                ],
+                "tagList": [{"id": str(j), "name": f"话题{j}"} for j in range(10)],
+                "interactInfo": {"liked": False, "likedCount": "1万+"},
+            },
+        }
+
+    state = {
+        "global": {"appSettings": {"notificationInterval": 30}},
+        "user": {"loggedIn": False, "userInfo": {}},
+        "search": {"keyword": "", "feeds": []},
+        "feed": {"feeds": [{"id": str(i), "index": i} for i in range(200)]},
+        "note": {
+            "prevRouteData": {},
+            "currentNoteId": next(iter(note_detail_map)),
+            "noteDetailMap": note_detail_map,
+            "serverRequestInfo": {"state": "success", "errorCode": 0},
+        },
+    }
+    # 页面中的 undefined 是 js 字面量, 序列化后替换占位符
+    text = json.dumps(state, ensure_ascii=False, separators=(",", ":"))
+    return text.replace('"cursor":""', '"cursor":undefined')
+
+
+def parse_by_yaml(text: str):
+    json_data = yaml.safe_load(text)
+    note_id = json_data["note"]["currentNoteId"]
+    return json_data["note"]["noteDetailMap"][note_id]["note"]
+
+
+def parse_by_jsobject(text: str):
+    json_data = jsobject.loads(text)
+    note_id = json_data["note"]["currentNoteId"]
+    return json_data["note"]["noteDetailMap"][note_id]["note"]
+
+
+def parse_by_jsobject_partial(text: str):
+    note_text = jsobject.extract_value(text, "note")
+    note_id = jsobject.loads_value(note_text, "currentNoteId")
+    return jsobject.loads_value(note_text, "noteDetailMap")[note_id]["note"]
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("--notes", type=int, default=1)
+    arg_parser.add_argument("--images", type=int, default=18)
+    arg_parser.add_argument("-n", "--number", type=int, default=20)
+    args = arg_parser.parse_args()
+
+    text = build_state(args.notes, args.images)
+    expected = parse_by_yaml(text)
+    assert parse_by_jsobject(text) == expected
+    assert parse_by_jsobject_partial(text) == expected
+
+    print(f"state size: {len(text) / 1024:.1f} KiB")
+    results = {}
+    for name, fn in (
+        ("yaml.safe_load", parse_by_yaml),
+        ("jsobject.loads", parse_by_jsobject),
+        ("jsobject.loads_value", parse_by_jsobject_partial),
+    ):
+        cost = timeit.timeit(lambda: fn(text), number=args.number) / args.number
+        results[name] = cost
+        print(f"{name + ':':<22}{cost * 1e3:.2f} ms/page")
+
+    yaml_cost = results["yaml.safe_load"]
+    for name in ("jsobject.loads", "jsobject.loads_value"):
+        print(f"speedup ({name}): {yaml_cost / results[name]:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+分享链接查找视频来源耗时对比: 按 domain_list 逐个子串匹配 vs parser.router
+
+路由结果的校验见 tests/test_router.py
+运行: python -m benchmarks.bench_router -n 100000
+"""
+
+import argparse
+import timeit
+
+from parser import source_router, video_source_info_mapping
+
+
+def legacy_get_video_source(share_url: str):
+    for item_source, item_source_info in video_source_info_mapping.items():
+        for item_url_domain in item_source_info["domain_list"]:
+            if item_url_domain in share_url:
+                return item_source
+    return None
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("-n", "--number", type=int, default=100000)
+    args = arg_parser.parse_args()
+
+    domain_count = sum(
+        len(i["domain_list"]) for i in video_source_info_mapping.values()
+    )
+    print(f"domains: {domain_count}")
+
+    # 取映射中最后一个域名, 子串匹配需要遍历所有域名
+    url = f"https://{list(source_router.items())[-1][0]}/share/abc"
+    legacy_cost = timeit.timeit(
+        lambda: legacy_get_video_source(url), number=args.number
+    )
+    router_cost = timeit.timeit(lambda: source_router.match(url), number=args.number)
+
+    print(f"substring scan: {legacy_cost / args.number * 1e6:.2f} us/lookup")
+    print(f"host router:    {router_cost / args.number * 1e6:.2f} us/lookup")
+    print(f"speedup:        {legacy_cost / router_cost:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+解析结果模型的内存占用与序列化耗时: 旧版(普通 dataclass + __dict__)与 slots 版对比
+
+运行: python -m benchmarks.bench_serialize --images 500
+"""
+
+import argparse
+import dataclasses
+import json
+import timeit
+import tracemalloc
+from typing import Callable
+
+from parser.base import ImgInfo, VideoAuthor, VideoInfo
+from utils import fastjson
+
+# 旧版模型: 与 parser.base 字段相同, 不使用 slots
+LegacyAuthor = dataclasses.make_dataclass(
+    "LegacyAuthor", [("uid", str, ""), ("name", str, ""), ("avatar", str, "")]
+)
+LegacyImgInfo = dataclasses.make_dataclass(
+    "LegacyImgInfo", [("url", str, ""), ("live_photo_url", str, "")]
+)
+LegacyVideoInfo = dataclasses.make_dataclass(
+    "LegacyVideoInfo",
+    [
+        ("video_url", str),
+        ("cover_url", str),
+        ("title", str, ""),
+        ("desc", str, ""),
+        ("music_url", str, ""),
+        ("images", list, dataclasses.field(default_factory=list)),
+        ("author", LegacyAuthor, dataclasses.field(default_factory=LegacyAuthor)),
+    ],
+)
+
+
+def legacy_dumps(obj) -> bytes:
+    # 旧版 fastjson.dumps: orjson 直接编码 dataclass
+    if fastjson.orjson is not None:
+        return fastjson.orjson.dumps(obj, default=fastjson._default)
+    return fastjson.dumps(obj)
+
+
+def build(video_cls, img_cls, author_cls, images: int):
+    return video_cls(
+        video_url="",
+        cover_url="https://cdn.mock.test/cover.jpg",
+        title="图集标题" * 4,
+        desc="图集描述" * 20,
+        images=[
+            img_cls(
+                url=f"https://cdn.mock.test/image/{i:04d}.webp?imageView2/format/png",
+                live_photo_url=f"https://cdn.mock.test/live/{i:04d}.mp4",
+            )
+            for i in range(images)
+        ],
+        author=author_cls(uid="10001", name="作者", avatar="https://cdn.mock.test/a"),
+    )
+
+
+def measure_alloc(fn: Callable[[], object]) -> float:
+    """
+    单次调用的内存分配峰值(KiB)
+    """
+    tracemalloc.start()
+    result = fn()  # noqa: F841, 保持结果存活, 计入峰值
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 1024
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("--images", type=int, default=500, help="图集图片数量")
+    arg_parser.add_argument("-n", "--number", type=int, default=200)
+    args = arg_parser.parse_args()
+
+    legacy = build(LegacyVideoInfo, LegacyImgInfo, LegacyAuthor, args.images)
+    video_info = build(VideoInfo, ImgInfo, VideoAuthor, args.images)
+
+    cases = [
+        (
+            "model legacy",
+            lambda: build(LegacyVideoInfo, LegacyImgInfo, LegacyAuthor, args.images),
+        ),
+        ("model slots", lambda: build(VideoInfo, ImgInfo, VideoAuthor, args.images)),
+        # 旧版 imghub 转换为 dict 的方式
+        (
+            "dict legacy",
+            lambda: json.loads(
+                json.dumps(legacy, ensure_ascii=False, default=lambda x: x.__dict__)
+            ),
+        ),
+        ("dict to_dict", video_info.to_dict),
+        (
+            "json legacy",
+            lambda: legacy_dumps({"code": 200, "msg": "解析成功", "data": legacy}),
+        ),
+        (
+            "json slots",
+            lambda: fastjson.dumps(
+                {"code": 200, "msg": "解析成功", "data": video_info}
+            ),
+        ),
+    ]
+
+    # 不同版本的 orjson 编码 dataclass 的耗时差别较大, 对比时以 requirements.txt 中的版本为准
+    version = getattr(fastjson.orjson, "__version__", "")
+    print(f"images: {args.images}, json backend: {fastjson.JSON_BACKEND} {version}")
+    print(f"{'case':<16}{'time(us)':>10}{'alloc(KiB)':>12}")
+    for name, fn in cases:
+        cost = timeit.timeit(fn, number=args.number) / args.number
+        print(f"{name:<16}{cost * 1e6:>10.1f}{measure_alloc(fn):>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
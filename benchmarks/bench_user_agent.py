@@ -0,0 +1,35 @@
+"""
+User-Agent 生成耗时对比: 每次构造 fake_useragent.UserAgent vs 预生成的 UA 池
+
+运行: python -m benchmarks.bench_user_agent
+"""
+
+import argparse
+import timeit
+
+import fake_useragent
+
+from utils.user_agent import UserAgentPool
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("-n", "--number", type=int, default=200)
+    args = arg_parser.parse_args()
+
+    pool = UserAgentPool()
+    load_cost = timeit.timeit(pool.load, number=1)
+
+    fake_cost = timeit.timeit(
+        lambda: fake_useragent.UserAgent(os=["ios"]).random, number=args.number
+    )
+    pool_cost = timeit.timeit(lambda: pool.random("ios"), number=args.number)
+
+    print(f"pool load (once): {load_cost * 1e3:.3f} ms")
+    print(f"fake_useragent:   {fake_cost / args.number * 1e6:.2f} us/request")
+    print(f"user_agent_pool:  {pool_cost / args.number * 1e6:.2f} us/request")
+    print(f"speedup:          {fake_cost / pool_cost:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,561 @@
+"""
+各平台上游接口的模拟响应, 用于离线压测与基准测试
+
+数据按解析器读取的字段构造, 结构与线上接口一致, 只保留解析需要的部分;
+padding 控制页面/接口中与解析无关的填充数据大小, 用于模拟不同大小的响应
+"""
+
+import base64
+import json
+from typing import Callable, Dict, List
+
+import httpx
+
+from parser.base import VideoSource
+
+CDN = "https://cdn.mock.test"
+
+# 每个平台用于压测的分享链接
+SHARE_URLS: Dict[VideoSource, str] = {
+    VideoSource.AcFun: "https://www.acfun.cn/v/ac36935385",
+    VideoSource.DouPai: "https://doupai.cc/share?id=5f1e2d3c4b5a",
+    VideoSource.DouYin: "https://v.douyin.com/iRNBho6u/",
+    VideoSource.HaoKan: "https://haokan.baidu.com/v?vid=3881011248447537",
+    VideoSource.HuYa: "https://v.huya.com/play/940173443.html",
+    VideoSource.KuaiShou: "https://v.kuaishou.com/2xZkS9H",
+    VideoSource.LiShiPin: "https://www.pearvideo.com/detail_1797432",
+    VideoSource.LvZhou: "https://m.oasis.weibo.cn/v1/h5/share?sid=4871577468240303",
+    VideoSource.MeiPai: "https://www.meipai.com/video/6900000000000000001",
+    VideoSource.PiPiGaoXiao: "https://h5.pipigx.com/pp/post/580854126",
+    VideoSource.PiPiXia: "https://h5.pipix.com/s/iJ7hFqbW/",
+    VideoSource.QuanMin: "https://xspshare.baidu.com/share/index.html?vid=4520000000",
+    VideoSource.QuanMinKGe: "https://kg.qq.com/node/play?s=YMhWYyDq6Y_3xYqf",
+    VideoSource.RedBook: "https://xhslink.com/a/Bm5Ib5yMwxX0",
+    VideoSource.SixRoom: "https://m.6.cn/v/8010325",
+    VideoSource.WeiBo: "https://video.weibo.com/show?fid=1034:4875069453418507",
+    VideoSource.WeiShi: "https://isee.weishi.qq.com/ws/share/index.html?id=7a3v",
+    VideoSource.XiGua: "https://v.ixigua.com/iRNCq2sK/",
+    VideoSource.XinPianChang: "https://www.xinpianchang.com/a12930541",
+    VideoSource.ZuiYou: "https://share.xiaochuankeji.cn/hybrid/share/post?pid=2817054",
+}
+
+
+def _json_response(data, status_code: int = 200) -> httpx.Response:
+    return httpx.Response(
+        status_code,
+        content=json.dumps(data, ensure_ascii=False).encode(),
+        headers={"Content-Type": "application/json; charset=utf-8"},
+    )
+
+
+def _html_response(html: str, status_code: int = 200) -> httpx.Response:
+    return httpx.Response(
+        status_code,
+        content=html.encode(),
+        headers={"Content-Type": "text/html; charset=utf-8"},
+    )
+
+
+def _redirect(location: str, **headers) -> httpx.Response:
+    return httpx.Response(302, headers={"Location": location, **headers})
+
+
+def encode_meipai_video(video_url: str) -> str:
+    """
+    按美拍 data-video 的格式编码视频地址, 与 MeiPai.parse_video_bs64 互逆
+    """
+    # 前 4 位是倒序的 16 进制数, 对应十进制 1234: 先在第 1 位后插入 2 个字符,
+    # 再在倒数第 3 位前插入 4 个字符
+    kk = base64.b64encode(video_url.replace("https:", "", 1).encode()).decode()
+    d = kk[:-3] + "~~~~" + kk[-3:]
+    return "2d40" + d[:1] + "@@" + d[1:]
+
+
+class PlatformFixtures:
+    """
+    按 host 分发请求, 返回对应平台的模拟响应, 可作为 httpx.MockTransport 的 handler
+    """
+
+    def __init__(self, padding: int = 0, images: int = 9):
+        """
+        :param padding: 每个响应中附带的无关数据大小(字节)
+        :param images: 图集图片数量
+        """
+        self.padding = padding
+        self.images = images
+        self._routes: Dict[str, Callable[[httpx.Request], httpx.Response]] = {
+            "www.acfun.cn": self.acfun,
+            "v2.doupai.cc": self.doupai,
+            "v.douyin.com": self.douyin_short_link,
+            "www.iesdouyin.com": self.douyin_page,
+            "aweme.snssdk.com": self.douyin_play,
+            "haokan.baidu.com": self.haokan,
+            "liveapi.huya.com": self.huya,
+            "v.kuaishou.com": self.kuaishou_short_link,
+            "v.m.chenzhongtech.com": self.kuaishou_page,
+            "www.pearvideo.com": self.lishipin,
+            "m.oasis.weibo.cn": self.lvzhou,
+            "www.meipai.com": self.meipai,
+            "share.ippzone.com": self.pipigaoxiao,
+            "h5.pipix.com": self.pipixia_short_link,
+            "api.pipix.com": self.pipixia,
+            "quanmin.hao222.com": self.quanmin,
+            "kg.qq.com": self.quanminkge,
+            "xhslink.com": self.redbook_short_link,
+            "www.xiaohongshu.com": self.redbook_page,
+            "ci.xiaohongshu.com": self.redbook_image,
+            "v.6.cn": self.sixroom,
+            "h5.video.weibo.com": self.weibo,
+            "h5.weishi.qq.com": self.weishi,
+            "v.ixigua.com": self.xigua_short_link,
+            "m.ixigua.com": self.xigua_page,
+            "www.xinpianchang.com": self.xinpianchang_page,
+            "mod-api.xinpianchang.com": self.xinpianchang_media,
+            "share.xiaochuankeji.cn": self.zuiyou,
+        }
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        route = self._routes.get(request.url.host)
+        if route is None:
+            return httpx.Response(404, text=f"no fixture for {request.url.host}")
+        return route(request)
+
+    @property
+    def hosts(self) -> List[str]:
+        return list(self._routes)
+
+    def _filler(self) -> str:
+        return "x" * self.padding
+
+    def _html(self, body: str, script: str = "") -> str:
+        # 页面内嵌数据前后都有大量无关内容, 流式解析找到结束标记后即可停止读取
+        return (
+            "<!DOCTYPE html><html><head><meta charset='utf-8'>"
+            f"<style>/*{self._filler()}*/</style></head><body>{body}"
+            f"<script>{script}</script>"
+            f"<script>/*{self._filler()}*/</script></body></html>"
+        )
+
+    def acfun(self, request: httpx.Request) -> httpx.Response:
+        video_info = {
+            "title": "AcFun 视频标题",
+            "cover": f"{CDN}/acfun/cover.jpg",
+            "description": self._filler(),
+        }
+        play_info = {"streams": [{"playUrls": [f"{CDN}/acfun/video.m3u8"]}]}
+        body = (
+            '<div class="up-info"><a class="info-item1" href="/upPage/123456"></a>'
+            '<span class="up-name">AcFun作者</span>'
+            f'<span class="up-avatar"><img src="{CDN}/acfun/avatar.jpg"></span></div>'
+        )
+        script = (
+            f"var videoInfo = {json.dumps(video_info, ensure_ascii=False)};\n"
+            f"var playInfo = {json.dumps(play_info)};"
+        )
+        return _html_response(self._html(body, script))
+
+    def doupai(self, request: httpx.Request) -> httpx.Response:
+        return _json_response(
+            {
+                "data": {
+                    "videoUrl": f"{CDN}/doupai/video.mp4",
+                    "imageUrl": f"{CDN}/doupai/cover.jpg",
+                    "name": "逗拍视频",
+                    "userId": {
+                        "id": "5f1e2d3c4b5a",
+                        "name": "逗拍作者",
+                        "avatar": f"{CDN}/doupai/avatar.jpg",
+                    },
+                    "extra": self._filler(),
+                }
+            }
+        )
+
+    def _router_data(self, page_key: str) -> dict:
+        item = {
+            "desc": "视频描述 #话题",
+            "video": {
+                "play_addr": {
+                    "url_list": [
+                        "https://aweme.snssdk.com/aweme/v1/playwm/?video_id=v0200fg1"
+                    ]
+                },
+                "cover": {"url_list": [f"{CDN}/aweme/cover.jpg"]},
+            },
+            "author": {
+                "sec_uid": "MS4wLjABAAAA",
+                "unique_id": "unique_id",
+                "nickname": "抖音作者",
+                "avatar_thumb": {"url_list": [f"{CDN}/aweme/avatar.jpg"]},
+            },
+            "extra": self._filler(),
+        }
+        return {
+            "loaderData": {
+                page_key: {"videoInfoRes": {"item_list": [item], "filter_list": []}}
+            }
+        }
+
+    def douyin_short_link(self, request: httpx.Request) -> httpx.Response:
+        return _redirect(
+            "https://www.iesdouyin.com/share/video/7300000000000000000/?region=CN"
+        )
+
+    def douyin_page(self, request: httpx.Request) -> httpx.Response:
+        data = self._router_data("video_(id)/page")
+        script = f"window._ROUTER_DATA = {json.dumps(data, ensure_ascii=False)}"
+        return _html_response(self._html("", script))
+
+    def douyin_play(self, request: httpx.Request) -> httpx.Response:
+        return _redirect(f"{CDN}/aweme/video.mp4")
+
+    def haokan(self, request: httpx.Request) -> httpx.Response:
+        return _json_response(
+            {
+                "errno": 0,
+                "error": "",
+                "data": {
+                    "apiData": {
+                        "curVideoMeta": {
+                            "playurl": f"{CDN}/haokan/video.mp4",
+                            "poster": f"{CDN}/haokan/cover.jpg",
+                            "title": "好看视频",
+                            "mth": {
+                                "mthid": "1649000000",
+                                "author_name": "好看作者",
+                                "author_photo": f"{CDN}/haokan/avatar.jpg",
+                            },
+                        },
+                        "extra": self._filler(),
+                    }
+                },
+            }
+        )
+
+    def huya(self, request: httpx.Request) -> httpx.Response:
+        return _json_response(
+            {
+                "data": {
+                    "moment": {
+                        "videoInfo": {
+                            "uid": 1199000000,
+                            "definitions": [{"url": f"{CDN}/huya/video.mp4"}],
+                            "videoCover": f"{CDN}/huya/cover.jpg",
+                            "videoTitle": "虎牙视频",
+                            "actorNick": "虎牙主播",
+                            "actorAvatarUrl": f"{CDN}/huya/avatar.jpg",
+                        },
+                        "extra": self._filler(),
+                    }
+                }
+            }
+        )
+
+    def kuaishou_short_link(self, request: httpx.Request) -> httpx.Response:
+        return _redirect(
+            "https://v.m.chenzhongtech.com/fw/photo/3xabcdefg?fid=0",
+            **{"Set-Cookie": "did=web_mock; Path=/"},
+        )
+
+    def kuaishou_page(self, request: httpx.Request) -> httpx.Response:
+        state = {
+            "tusjoh": {"fid": "0"},
+            "photo_key": {
+                "result": 1,
+                "photo": {
+                    "mainMvUrls": [{"url": f"{CDN}/kuaishou/video.mp4"}],
+                    "coverUrls": [{"url": f"{CDN}/kuaishou/cover.jpg"}],
+                    "caption": "快手视频",
+                    "userName": "快手作者",
+                    "headUrl": f"{CDN}/kuaishou/avatar.jpg",
+                    "extra": self._filler(),
+                },
+            },
+        }
+        script = f"window.INIT_STATE = {json.dumps(state, ensure_ascii=False)}"
+        return _html_response(self._html("", script))
+
+    def lishipin(self, request: httpx.Request) -> httpx.Response:
+        timer = "1700000000000"
+        return _json_response(
+            {
+                "systemTime": timer,
+                "videoInfo": {
+                    "videos": {"srcUrl": f"{CDN}/pearvideo/{timer}-1797432-hd.mp4"},
+                    "video_image": f"{CDN}/pearvideo/cover.jpg",
+                    "extra": self._filler(),
+                },
+            }
+        )
+
+    def lvzhou(self, request: httpx.Request) -> httpx.Response:
+        body = (
+            f'<video src="{CDN}/oasis/video.mp4"></video>'
+            f'<a class="avatar"><img src="{CDN}/oasis/avatar.jpg"></a>'
+            '<div class="video-cover" '
+            f'style="background-image:url({CDN}/oasis/cover.jpg)"></div>'
+            '<div class="status-title">绿洲视频</div>'
+            '<div class="nickname">绿洲作者</div>'
+        )
+        return _html_response(self._html(body))
+
+    def meipai(self, request: httpx.Request) -> httpx.Response:
+        video = encode_meipai_video(f"https://{CDN[8:]}/meipai/video.mp4")
+        body = (
+            f'<div id="shareMediaBtn" data-video="{video}"></div>'
+            f'<div id="detailVideo"><img src="{CDN}/meipai/cover.jpg"></div>'
+            '<h1 class="detail-cover-title"> 美拍视频 </h1>'
+            '<div class="detail-name"><a href="/user/1234567"></a></div>'
+            f'<img class="detail-avatar" alt="美拍作者" src="{CDN[6:]}/meipai/a.jpg">'
+        )
+        return _html_response(self._html(body))
+
+    def pipigaoxiao(self, request: httpx.Request) -> httpx.Response:
+        return _json_response(
+            {
+                "data": {
+                    "post": {
+                        "content": "皮皮搞笑",
+                        "imgs": [{"id": 1234567}],
+                        "videos": {"1234567": {"url": f"{CDN}/ippzone/video.mp4"}},
+                        "extra": self._filler(),
+                    }
+                }
+            }
+        )
+
+    def pipixia_short_link(self, request: httpx.Request) -> httpx.Response:
+        return _redirect("https://h5.pipix.com/item/7100000000000000000?app_id=1319")
+
+    def pipixia(self, request: httpx.Request) -> httpx.Response:
+        author = {
+            "id": 12345678,
+            "name": "皮皮虾作者",
+            "avatar": {"download_list": [{"url": f"{CDN}/pipix/avatar.jpg"}]},
+        }
+        video = {"video_high": {"url_list": [{"url": f"{CDN}/pipix/video.mp4"}]}}
+        item = {
+            "author": author,
+            "video": video,
+            "cover": {"url_list": [{"url": f"{CDN}/pipix/cover.jpg"}]},
+            "content": "皮皮虾视频",
+            "comments": [{"item": {"author": author, "video": video}}],
+            "extra": self._filler(),
+        }
+        return _json_response(
+            {
+                "status_code": 0,
+                "prompt": "",
+                "data": {"cell_comments": [{"comment_info": {"item": item}}]},
+            }
+        )
+
+    def quanmin(self, request: httpx.Request) -> httpx.Response:
+        return _json_response(
+            {
+                "errno": 0,
+                "error": "",
+                "data": {
+                    "meta": {
+                        "statusText": "",
+                        "title": "度小视视频",
+                        "image": f"{CDN}/quanmin/cover.jpg",
+                        "video_info": {
+                            "clarityUrl": [
+                                {"url": f"{CDN}/quanmin/sd.mp4"},
+                                {"url": f"{CDN}/quanmin/hd.mp4"},
+                            ]
+                        },
+                    },
+                    "shareInfo": {"title": "分享标题"},
+                    "author": {
+                        "id": "1234567",
+                        "name": "度小视作者",
+                        "icon": f"{CDN}/quanmin/avatar.jpg",
+                    },
+                    "extra": self._filler(),
+                },
+            }
+        )
+
+    def quanminkge(self, request: httpx.Request) -> httpx.Response:
+        data = {
+            "detail": {
+                "playurl_video": f"{CDN}/kg/video.mp4",
+                "cover": f"{CDN}/kg/cover.jpg",
+                "content": "全民K歌作品",
+                "uid": "639e9a8c2c",
+                "nick": "K歌作者",
+                "avatar": f"{CDN}/kg/avatar.jpg",
+                "extra": self._filler(),
+            }
+        }
+        script = f"window.__DATA__ = {json.dumps(data, ensure_ascii=False)}; "
+        return _html_response(self._html("", script))
+
+    def redbook_short_link(self, request: httpx.Request) -> httpx.Response:
+        return _redirect(
+            "https://www.xiaohongshu.com/discovery/item/6710a0b00000000021000001"
+            "?xsec_token=mock"
+        )
+
+    def redbook_page(self, request: httpx.Request) -> httpx.Response:
+        note_id = "6710a0b00000000021000001"
+        image_list = [
+            {
+                "urlDefault": f"{CDN}/202410171200/abcdef/notes_pre_post/"
+                f"1040g0k0{i:024d}!nd_dft_wlteh_webp_3",
+                "livePhoto": False,
+            }
+            for i in range(self.images)
+        ]
+        state = {
+            "global": {"extra": self._filler()},
+            "note": {
+                "currentNoteId": note_id,
+                "noteDetailMap": {
+                    note_id: {
+                        "comments": {"cursor": "__undefined__"},
+                        "note": {
+                            "title": "小红书笔记",
+                            "desc": "笔记描述 #话题[话题]#",
+                            "imageList": image_list,
+                            "user": {
+                                "userId": "5f1e2d3c4b5a",
+                                "nickname": "小红书作者",
+                                "avatar": f"{CDN}/xhs/avatar.jpg",
+                            },
+                        },
+                    }
+                },
+            },
+        }
+        # 页面中的 undefined 是 js 字面量, 不是合法 json
+        state_text = json.dumps(state, ensure_ascii=False).replace(
+            '"__undefined__"', "undefined"
+        )
+        script = f"window.__INITIAL_STATE__ = {state_text}"
+        return _html_response(self._html("", script))
+
+    def redbook_image(self, request: httpx.Request) -> httpx.Response:
+        return httpx.Response(206, content=b"\x89PNG" + b"\x00" * 96)
+
+    def sixroom(self, request: httpx.Request) -> httpx.Response:
+        return _json_response(
+            {
+                "content": {
+                    "playurl": f"{CDN}/6cn/video.mp4",
+                    "picurl": f"{CDN}/6cn/cover.jpg",
+                    "title": "六间房视频",
+                    "alias": "六间房主播",
+                    "picuser": f"{CDN}/6cn/avatar.jpg",
+                    "extra": self._filler(),
+                }
+            }
+        )
+
+    def weibo(self, request: httpx.Request) -> httpx.Response:
+        return _json_response(
+            {
+                "data": {
+                    "Component_Play_Playinfo": {
+                        "stream_url": f"{CDN}/weibo/stream.mp4",
+                        "urls": {"高清 1080P": f"{CDN[6:]}/weibo/1080.mp4"},
+                        "cover_image": f"{CDN[6:]}/weibo/cover.jpg",
+                        "title": "微博视频",
+                        "user": {"id": 1234567890},
+                        "author": "微博作者",
+                        "avatar": f"{CDN[6:]}/weibo/avatar.jpg",
+                        "extra": self._filler(),
+                    }
+                }
+            }
+        )
+
+    def weishi(self, request: httpx.Request) -> httpx.Response:
+        return _json_response(
+            {
+                "ret": 0,
+                "msg": "",
+                "data": {
+                    "errmsg": "",
+                    "feeds": [
+                        {
+                            "id": "7a3v",
+                            "video_url": f"{CDN}/weishi/video.mp4",
+                            "images": [{"url": f"{CDN}/weishi/cover.jpg"}],
+                            "feed_desc_withat": "微视视频",
+                            "poster": {
+                                "nick": "微视作者",
+                                "avatar": f"{CDN}/weishi/avatar.jpg",
+                            },
+                            "extra": self._filler(),
+                        }
+                    ],
+                },
+            }
+        )
+
+    def xigua_short_link(self, request: httpx.Request) -> httpx.Response:
+        return _redirect("https://www.ixigua.com/7300000000000000001?logTag=mock")
+
+    def xigua_page(self, request: httpx.Request) -> httpx.Response:
+        data = self._router_data("video_(id)/page")
+        script = f"window._ROUTER_DATA = {json.dumps(data, ensure_ascii=False)}"
+        return _html_response(self._html("", script))
+
+    def xinpianchang_page(self, request: httpx.Request) -> httpx.Response:
+        data = {
+            "props": {
+                "pageProps": {
+                    "detail": {
+                        "video": {"appKey": "61a2f329348b3bf77"},
+                        "media_id": "mock_media_id",
+                        "cover": f"{CDN}/xpc/cover.jpg",
+                        "title": "新片场作品",
+                        "author": {
+                            "userinfo": {
+                                "id": 10000001,
+                                "username": "新片场作者",
+                                "avatar": f"{CDN}/xpc/avatar.jpg",
+                            }
+                        },
+                        "extra": self._filler(),
+                    }
+                }
+            }
+        }
+        script = json.dumps(data, ensure_ascii=False)
+        body = f'<script id="__NEXT_DATA__" type="application/json">{script}</script>'
+        return _html_response(self._html(body))
+
+    def xinpianchang_media(self, request: httpx.Request) -> httpx.Response:
+        return _json_response(
+            {
+                "data": {
+                    "resource": {"progressive": [{"url": f"{CDN}/xpc/video.mp4"}]},
+                    "extra": self._filler(),
+                }
+            }
+        )
+
+    def zuiyou(self, request: httpx.Request) -> httpx.Response:
+        return _json_response(
+            {
+                "data": {
+                    "post": {
+                        "content": "最右帖子",
+                        "imgs": [{"id": 7654321}],
+                        "videos": {"7654321": {"url": f"{CDN}/zuiyou/video.mp4"}},
+                        "member": {
+                            "id": 1234567,
+                            "name": "最右作者",
+                            "avatar_urls": {
+                                "origin": {"urls": [f"{CDN}/zuiyou/avatar.jpg"]}
+                            },
+                        },
+                        "extra": self._filler(),
+                    }
+                }
+            }
+        )
@@ -0,0 +1,176 @@
+"""
+/share 接口端到端压测: 按目标 RPS 匀速发起请求(开环), 统计延迟分位数与吞吐量
+
+先启动模拟上游服务与应用, 应用的上游请求全部改发到模拟服务:
+    python -m benchmarks.mock_server --port 9000 --latency-ms 50 --jitter-ms 20
+    HTTP_UPSTREAM_OVERRIDE=http://127.0.0.1:9000 python main.py
+再运行: python -m benchmarks.load_test --rps 100 --duration 30
+"""
+
+import argparse
+import asyncio
+import itertools
+import statistics
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from benchmarks.fixtures import SHARE_URLS
+from parser.base import VideoSource
+
+
+def percentile(values: List[float], percent: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(percent / 100 * (len(values) - 1))))
+    return values[index]
+
+
+class LoadTest:
+    def __init__(
+        self,
+        app_url: str,
+        sources: List[VideoSource],
+        rps: float,
+        duration: float,
+        max_in_flight: int,
+        cache_bust: bool = True,
+        auth: Optional[Tuple[str, str]] = None,
+    ):
+        self.app_url = app_url.rstrip("/")
+        self.sources = sources
+        self.rps = rps
+        self.duration = duration
+        self.max_in_flight = max_in_flight
+        self.cache_bust = cache_bust
+        self.auth = auth
+
+        self.latencies: Dict[VideoSource, List[float]] = defaultdict(list)
+        self.results: Counter = Counter()
+        self.dropped = 0
+
+    def build_share_url(self, source: VideoSource, index: int) -> str:
+        share_url = SHARE_URLS[source]
+        if not self.cache_bust:
+            return share_url
+        # 每次请求的链接都不同, 避免命中解析结果缓存
+        return f"{share_url}{'&' if '?' in share_url else '?'}lt={index}"
+
+    async def send(
+        self, client: httpx.AsyncClient, source: VideoSource, index: int
+    ) -> None:
+        start = time.perf_counter()
+        try:
+            response = await client.get(
+                f"{self.app_url}/share",
+                params={"url": self.build_share_url(source, index)},
+            )
+            if response.status_code != 200:
+                result = f"http {response.status_code}"
+            else:
+                code = response.json().get("code")
+                result = "ok" if code == 200 else f"code {code}"
+        except httpx.HTTPError as err:
+            result = type(err).__name__
+        self.latencies[source].append(time.perf_counter() - start)
+        self.results[result] += 1
+
+    async def run(self) -> float:
+        semaphore = asyncio.Semaphore(self.max_in_flight)
+        tasks = set()
+        total = int(self.rps * self.duration)
+
+        async def send_limited(source: VideoSource, index: int) -> None:
+            try:
+                await self.send(client, source, index)
+            finally:
+                semaphore.release()
+
+        limits = httpx.Limits(max_connections=self.max_in_flight)
+        async with httpx.AsyncClient(
+            limits=limits, timeout=30, auth=self.auth
+        ) as client:
+            start = time.perf_counter()
+            sources = itertools.cycle(self.sources)
+            for index in range(total):
+                # 开环压测: 按计划时间发出请求, 不等待前一个请求返回
+                delay = start + index / self.rps - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                if semaphore.locked():
+                    # 在途请求已满, 说明服务处理不过来, 记为丢弃
+                    self.dropped += 1
+                    continue
+                await semaphore.acquire()
+                task = asyncio.create_task(send_limited(next(sources), index))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.wait(tasks)
+            return time.perf_counter() - start
+
+    def report(self, elapsed: float) -> None:
+        all_latencies = [i for values in self.latencies.values() for i in values]
+        completed = len(all_latencies)
+        print(
+            f"target: {self.rps:.0f} rps x {self.duration:.0f}s, "
+            f"completed: {completed}, dropped: {self.dropped}, "
+            f"elapsed: {elapsed:.1f}s, throughput: {completed / elapsed:.1f} rps"
+        )
+        print("results: " + ", ".join(f"{k}={v}" for k, v in self.results.items()))
+
+        print(
+            f"{'source':<14}{'count':>7}{'mean':>9}{'p50':>9}"
+            f"{'p90':>9}{'p99':>9}{'max':>9}  (ms)"
+        )
+        rows = [(source.value, self.latencies[source]) for source in self.sources]
+        rows.append(("all", all_latencies))
+        for name, values in rows:
+            if not values:
+                continue
+            print(
+                f"{name:<14}{len(values):>7}"
+                f"{statistics.mean(values) * 1e3:>9.1f}"
+                f"{percentile(values, 50) * 1e3:>9.1f}"
+                f"{percentile(values, 90) * 1e3:>9.1f}"
+                f"{percentile(values, 99) * 1e3:>9.1f}"
+                f"{max(values) * 1e3:>9.1f}"
+            )
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("--app-url", default="http://127.0.0.1:8000")
+    arg_parser.add_argument("--rps", type=float, default=50)
+    arg_parser.add_argument("--duration", type=float, default=10, help="秒")
+    arg_parser.add_argument(
+        "--max-in-flight", type=int, default=500, help="最大在途请求数"
+    )
+    arg_parser.add_argument(
+        "-s", "--source", action="append", help="只压测指定平台, 可重复"
+    )
+    arg_parser.add_argument(
+        "--no-cache-bust", action="store_true", help="重复使用相同的分享链接"
+    )
+    arg_parser.add_argument("--auth", help="basic auth, 格式 username:password")
+    args = arg_parser.parse_args()
+
+    sources = [VideoSource(i) for i in args.source] if args.source else list(SHARE_URLS)
+    load_test = LoadTest(
+        app_url=args.app_url,
+        sources=sources,
+        rps=args.rps,
+        duration=args.duration,
+        max_in_flight=args.max_in_flight,
+        cache_bust=not args.no_cache_bust,
+        auth=tuple(args.auth.split(":", 1)) if args.auth else None,
+    )
+    elapsed = asyncio.run(load_test.run())
+    load_test.report(elapsed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+本地模拟各平台上游接口, 配合 HTTP_UPSTREAM_OVERRIDE 对 main.py 做端到端压测
+
+按请求头 X-Upstream-Host 区分平台, 响应内容与 benchmarks.fixtures 一致,
+可配置延迟、抖动、错误率和响应大小
+
+运行: python -m benchmarks.mock_server --port 9000 --latency-ms 50 --jitter-ms 20
+"""
+
+import argparse
+import asyncio
+import random
+
+import httpx
+import uvicorn
+from starlette.requests import Request
+from starlette.responses import Response
+
+from benchmarks.fixtures import PlatformFixtures
+
+# 透传给客户端的响应头, 其余由 starlette 重新生成
+PASS_HEADERS = ("content-type", "location", "set-cookie")
+
+
+class MockPlatformServer:
+    """
+    模拟上游服务的 ASGI 应用
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        padding: int = 0,
+        images: int = 9,
+    ):
+        """
+        :param latency: 平均响应延迟(秒)
+        :param jitter: 延迟抖动(秒), 实际延迟在 latency ± jitter 之间均匀分布
+        :param error_rate: 返回 503 的比例
+        :param padding: 响应中与解析无关的填充数据大小(字节)
+        :param images: 图集图片数量
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.fixtures = PlatformFixtures(padding=padding, images=images)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return
+        response = await self.handle(Request(scope, receive))
+        await response(scope, receive, send)
+
+    async def handle(self, request: Request) -> Response:
+        delay = self.latency + random.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        if random.random() < self.error_rate:
+            return Response("mock upstream error", status_code=503)
+
+        host = request.headers.get("x-upstream-host", request.url.hostname)
+        url = f"https://{host}{request.url.path}"
+        if request.url.query:
+            url += f"?{request.url.query}"
+        upstream_response = self.fixtures(
+            httpx.Request(request.method, url, headers=request.headers.raw)
+        )
+
+        response = Response(
+            upstream_response.content, status_code=upstream_response.status_code
+        )
+        # 同名响应头(如多个 set-cookie)需要逐个添加
+        for name, value in upstream_response.headers.multi_items():
+            if name in PASS_HEADERS:
+                response.raw_headers.append((name.encode(), value.encode()))
+        return response
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("--host", default="127.0.0.1")
+    arg_parser.add_argument("--port", type=int, default=9000)
+    arg_parser.add_argument("--latency-ms", type=float, default=0)
+    arg_parser.add_argument("--jitter-ms", type=float, default=0)
+    arg_parser.add_argument("--error-rate", type=float, default=0)
+    arg_parser.add_argument(
+        "--padding", type=int, default=20000, help="响应中的无关数据大小(字节)"
+    )
+    arg_parser.add_argument("--images", type=int, default=9, help="图集图片数量")
+    args = arg_parser.parse_args()
+
+    app = MockPlatformServer(
+        latency=args.latency_ms / 1000,
+        jitter=args.jitter_ms / 1000,
+        error_rate=args.error_rate,
+        padding=args.padding,
+        images=args.images,
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,171 @@
+import asyncio
 import os
 import re
 import secrets
-from utils.imghub import process_media_item
-from parser import VideoSource, parse_video_id, parse_video_share_url
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import Any, List
+from utils import fastjson
+from utils.breaker import circuit_breaker_registry
+from utils.http_client import http_client_registry
+from utils.imghub import TransferProgress, process_media_item
+from utils.jobs import CallbackNotAllowed, JobFailed, JobQueueFull, job_manager
+from utils.metrics import metrics_registry
+from utils.ratelimit import rate_limiter_registry
+from utils.tracing import ServerTimingMiddleware
+from utils.user_agent import user_agent_pool
+from parser import (
+    VideoSource,
+    get_video_source,
+    parse_video_id,
+    parse_video_share_url,
+    warm_up_parsers,
+)
 
 import uvicorn
 from fastapi import Depends, FastAPI, HTTPException, Request, status
-from fastapi.responses import HTMLResponse
+from fastapi.responses import (
+    HTMLResponse,
+    JSONResponse,
+    PlainTextResponse,
+    StreamingResponse,
+)
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
 from fastapi.templating import Jinja2Templates
+from pydantic import BaseModel
 
-app = FastAPI()
+# 批量解析: 单次请求最多解析的数量
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "100"))
+# 批量解析: 同一平台同时解析的数量
+BATCH_PLATFORM_CONCURRENCY = int(os.getenv("BATCH_PLATFORM_CONCURRENCY", "4"))
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    使用 orjson/msgspec 直接序列化 dataclass, 跳过 fastapi 的 jsonable_encoder
+    """
+
+    def render(self, content: Any) -> bytes:
+        return fastjson.dumps(content)
+
+
+def _rate_limiter_samples(key: str):
+    for platform, hosts in rate_limiter_registry.stats().items():
+        for host, stats in hosts.items():
+            yield {"platform": platform, "host": host}, stats[key]
+
+
+def _circuit_breaker_samples(key: str):
+    for name, stats in circuit_breaker_registry.stats().items():
+        yield {"source": name}, stats[key]
+
+
+def _circuit_breaker_state_samples():
+    # 每个状态一条, 当前状态为 1
+    for name, stats in circuit_breaker_registry.stats().items():
+        for state in ("closed", "open", "half_open"):
+            yield {"source": name, "state": state}, int(stats["state"] == state)
+
+
+def _http_pool_samples(key: str):
+    for name, stats in http_client_registry.stats().items():
+        yield {"client": name}, stats[key]
+
+
+def _job_samples():
+    stats = job_manager.stats()
+    for state in ("pending", "running"):
+        yield {"state": state}, stats[state]
+
+
+# 限流器、熔断器、连接池的状态在输出指标时读取
+metrics_registry.gauge(
+    "rate_limiter_concurrency_limit",
+    "上游并发上限",
+    lambda: _rate_limiter_samples("concurrency_limit"),
+)
+metrics_registry.gauge(
+    "rate_limiter_in_flight",
+    "上游在途请求数",
+    lambda: _rate_limiter_samples("in_flight"),
+)
+metrics_registry.gauge(
+    "rate_limiter_waiting",
+    "等待限流名额的请求数",
+    lambda: _rate_limiter_samples("waiting"),
+)
+metrics_registry.gauge(
+    "rate_limiter_throttled_total",
+    "上游限流/超时次数",
+    lambda: _rate_limiter_samples("throttled"),
+    metric_type="counter",
+)
+metrics_registry.gauge(
+    "circuit_breaker_state", "熔断器状态", _circuit_breaker_state_samples
+)
+metrics_registry.gauge(
+    "circuit_breaker_opened_total",
+    "熔断次数",
+    lambda: _circuit_breaker_samples("opened_count"),
+    metric_type="counter",
+)
+metrics_registry.gauge(
+    "circuit_breaker_rejected_total",
+    "熔断期间被拒绝的请求数",
+    lambda: _circuit_breaker_samples("rejected_count"),
+    metric_type="counter",
+)
+metrics_registry.gauge(
+    "http_pool_connections", "连接池连接数", lambda: _http_pool_samples("connections")
+)
+metrics_registry.gauge(
+    "http_pool_idle_connections",
+    "连接池空闲连接数",
+    lambda: _http_pool_samples("idle_connections"),
+)
+metrics_registry.gauge(
+    "http_pool_pending_requests",
+    "等待连接的请求数",
+    lambda: _http_pool_samples("pending_requests"),
+)
+metrics_registry.gauge("jobs", "排队中、执行中的后台任务数", _job_samples)
+
+share_url_reg = re.compile(r"http[s]?:\/\/[\w.-]+[\w\/-]*[\w.-]*\??[\w=&:\-\+\%]*[/]*")
+
+
+async def _transfer_job(params: dict, progress: TransferProgress) -> dict:
+    """
+    后台转存任务: 在 worker 中重新解析(通常命中解析结果缓存),
+    重启后重新执行的任务可以拿到未过期的链接
+    """
+    video_info = await parse_video_share_url(params["url"])
+    upload = await process_media_item(video_info, progress)
+    result = {"data": video_info.to_dict(), "upload": upload}
+    if upload["failed"]:
+        raise JobFailed(f"{upload['failed']}/{upload['total']} 个文件转存失败", result)
+    return result
+
+
+job_manager.register("transfer", _transfer_job, TransferProgress)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 启动时预生成 User-Agent 池, 避免首个请求承担加载开销
+    user_agent_pool.load()
+    # 按 PARSER_WARMUP 预加载解析器, 其他平台在首次解析时再导入
+    warm_up_parsers()
+    # 启动后台任务 worker, 上次退出时未完成的任务重新排队
+    await job_manager.start()
+    yield
+    await job_manager.stop()
+    # 应用退出时关闭共享的 http 连接池
+    await http_client_registry.aclose()
+
+
+app = FastAPI(lifespan=lifespan)
+# 记录每个请求的上游请求、提取、解码耗时, 通过 Server-Timing 响应头返回
+app.add_middleware(ServerTimingMiddleware)
 
 templates = Jinja2Templates(directory="templates")
 
@@ -61,43 +216,180 @@ async def read_item(request: Request):
 
 @app.get("/share", dependencies=get_auth_dependency())
 async def share_url_parse(url: str):
-    url_reg = re.compile(r"http[s]?:\/\/[\w.-]+[\w\/-]*[\w.-]*\??[\w=&:\-\+\%]*[/]*")
-    video_share_url = url_reg.search(url).group()
+    video_share_url = share_url_reg.search(url).group()
 
     try:
         video_info = await parse_video_share_url(video_share_url)
-        return {"code": 200, "msg": "解析成功", "data": video_info.__dict__}
+        return FastJSONResponse({"code": 200, "msg": "解析成功", "data": video_info})
     except Exception as err:
-        return {
-            "code": 500,
-            "msg": str(err),
-        }
+        return FastJSONResponse(
+            {
+                "code": 500,
+                "msg": str(err),
+            }
+        )
 
 @app.get("/te", dependencies=get_auth_dependency())
-async def share_url_parse(url: str):
-    url_reg = re.compile(r"http[s]?:\/\/[\w.-]+[\w\/-]*[\w.-]*\??[\w=&:\-\+\%]*[/]*")
-    video_share_url = url_reg.search(url).group()
+async def share_url_parse(url: str, wait: bool = False, callback: str = ""):
+    """
+    解析并转存到图床, 默认提交后台任务后立即返回, 通过 /jobs/{job_id} 查询进度
+    :param wait: 为 true 时在请求内完成转存, 返回转存结果; 未启用后台任务时总是在请求内完成
+    :param callback: 后台任务结束时 POST 任务信息的地址, host 需要在 JOB_WEBHOOK_ALLOWED_HOSTS 中
+    """
+    video_share_url = share_url_reg.search(url).group()
 
     try:
         video_info = await parse_video_share_url(video_share_url)
-        _ = await process_media_item(video_info.__dict__)
-        return {"code": 200, "msg": "解析成功", "data": video_info.__dict__}
+        if wait or not job_manager.enabled:
+            upload = await process_media_item(video_info.to_dict())
+            return FastJSONResponse(
+                {"code": 200, "msg": "解析成功", "data": video_info, "upload": upload}
+            )
+        job = await job_manager.submit(
+            "transfer", {"url": video_share_url}, callback=callback
+        )
+        return FastJSONResponse(
+            {"code": 200, "msg": "解析成功", "data": video_info, "job": job}
+        )
+    except CallbackNotAllowed as err:
+        return FastJSONResponse({"code": 400, "msg": str(err)})
+    except JobQueueFull as err:
+        return FastJSONResponse({"code": 503, "msg": str(err)})
     except Exception as err:
+        return FastJSONResponse(
+            {
+                "code": 500,
+                "msg": str(err),
+            }
+        )
+
+
+@app.get("/jobs/{job_id}", dependencies=get_auth_dependency())
+async def get_job(job_id: str):
+    """
+    查询后台任务的状态和进度
+    """
+    if not job_manager.enabled:
+        return FastJSONResponse({"code": 503, "msg": "未启用后台任务"})
+    job = await job_manager.get(job_id)
+    if job is None:
+        return FastJSONResponse({"code": 404, "msg": "任务不存在"})
+    return FastJSONResponse({"code": 200, "msg": "ok", "data": job})
+
+
+class BatchParseVideoId(BaseModel):
+    source: VideoSource
+    video_id: str
+
+
+class BatchParseRequest(BaseModel):
+    # 分享链接列表
+    urls: List[str] = []
+    # 视频来源 + 视频ID 列表
+    items: List[BatchParseVideoId] = []
+
+
+async def _iter_batch_parse_results(batch: BatchParseRequest):
+    """
+    并发解析, 每解析完成一个就输出一行 json (NDJSON), 不等待最慢的请求
+    """
+    # 按平台限制并发数
+    semaphores = defaultdict(lambda: asyncio.Semaphore(BATCH_PLATFORM_CONCURRENCY))
+
+    async def parse_share_url(index: int, url: str) -> dict:
+        result = {"index": index, "url": url}
+        try:
+            video_share_url = share_url_reg.search(url).group()
+            async with semaphores[get_video_source(video_share_url)]:
+                video_info = await parse_video_share_url(video_share_url)
+            result.update({"code": 200, "msg": "解析成功", "data": video_info})
+        except Exception as err:
+            result.update({"code": 500, "msg": str(err)})
+        return result
+
+    async def parse_id(index: int, item: BatchParseVideoId) -> dict:
+        result = {
+            "index": index,
+            "source": item.source.value,
+            "video_id": item.video_id,
+        }
+        try:
+            async with semaphores[item.source]:
+                video_info = await parse_video_id(item.source, item.video_id)
+            result.update({"code": 200, "msg": "解析成功", "data": video_info})
+        except Exception as err:
+            result.update({"code": 500, "msg": str(err)})
+        return result
+
+    tasks = [
+        asyncio.ensure_future(parse_share_url(index, url))
+        for index, url in enumerate(batch.urls)
+    ]
+    tasks += [
+        asyncio.ensure_future(parse_id(index, item))
+        for index, item in enumerate(batch.items, start=len(batch.urls))
+    ]
+    try:
+        for task in asyncio.as_completed(tasks):
+            result = await task
+            yield fastjson.dumps(result) + b"\n"
+    finally:
+        # 客户端断开连接时, 取消未完成的解析
+        for task in tasks:
+            task.cancel()
+
+
+@app.post("/share/batch", dependencies=get_auth_dependency())
+async def share_url_batch_parse(batch: BatchParseRequest):
+    if len(batch.urls) + len(batch.items) > BATCH_MAX_SIZE:
         return {
-            "code": 500,
-            "msg": str(err),
+            "code": 400,
+            "msg": f"batch size exceeds limit {BATCH_MAX_SIZE}",
         }
 
+    return StreamingResponse(
+        _iter_batch_parse_results(batch), media_type="application/x-ndjson"
+    )
+
+
 @app.get("/video/id/parse", dependencies=get_auth_dependency())
 async def video_id_parse(source: VideoSource, video_id: str):
     try:
         video_info = await parse_video_id(source, video_id)
-        return {"code": 200, "msg": "解析成功", "data": video_info.__dict__}
+        return FastJSONResponse({"code": 200, "msg": "解析成功", "data": video_info})
     except Exception as err:
-        return {
-            "code": 500,
-            "msg": str(err),
-        }
+        return FastJSONResponse(
+            {
+                "code": 500,
+                "msg": str(err),
+            }
+        )
+
+
+@app.get("/limits", dependencies=get_auth_dependency())
+async def upstream_limits():
+    """
+    查看各平台上游请求的当前限流状态
+    """
+    return {"code": 200, "msg": "ok", "data": rate_limiter_registry.stats()}
+
+
+@app.get("/breakers", dependencies=get_auth_dependency())
+async def circuit_breakers():
+    """
+    查看各平台熔断器状态
+    """
+    return {"code": 200, "msg": "ok", "data": circuit_breaker_registry.stats()}
+
+
+@app.get("/metrics", dependencies=get_auth_dependency())
+async def metrics():
+    """
+    Prometheus 文本格式的运行指标
+    """
+    return PlainTextResponse(
+        metrics_registry.render(), media_type="text/plain; version=0.0.4"
+    )
 
 
 if __name__ == "__main__":
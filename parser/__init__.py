@@ -1,115 +1,283 @@
-from .acfun import AcFun
-from .base import VideoInfo, VideoSource
-from .doupai import DouPai
-from .douyin import DouYin
-from .haokan import HaoKan
-from .huya import HuYa
-from .kuaishou import KuaiShou
-from .lishipin import LiShiPin
-from .lvzhou import LvZhou
-from .meipai import MeiPai
-from .pipigaoxiao import PiPiGaoXiao
-from .pipixia import PiPiXia
-from .quanmin import QuanMin
-from .quanminkge import QuanMinKGe
-from .redbook import RedBook
-from .sixroom import SixRoom
-from .weibo import WeiBo
-from .weishi import WeiShi
-from .xigua import XiGua
-from .xinpianchang import XinPianChang
-from .zuiyou import ZuiYou
-
-# 视频来源与解析器的映射关系
+import importlib
+import os
+import time
+from typing import (
+    Awaitable,
+    Callable,
+    Dict,
+    Hashable,
+    Iterable,
+    Iterator,
+    List,
+    Type,
+    Union,
+)
+
+from utils import get_url_expire_time
+from utils.breaker import circuit_breaker_registry
+from utils.cache import TTLCache
+from utils.metrics import (
+    count_upstream_hops,
+    metrics_registry,
+    parse_duration_seconds,
+    parse_errors_total,
+    parse_requests_total,
+    parse_upstream_hops,
+)
+from utils.singleflight import SingleFlight
+from utils.tracing import trace_span
+
+from .base import BaseParser, VideoInfo, VideoSource
+from .router import HostRouter
+
+# 视频来源与解析器的映射关系, 解析器为 "模块.类名", 首次使用时才导入
 video_source_info_mapping = {
     VideoSource.AcFun: {
         "domain_list": ["www.acfun.cn"],
-        "parser": AcFun,
+        "parser": "acfun.AcFun",
     },
     VideoSource.DouPai: {
         "domain_list": ["doupai.cc"],
-        "parser": DouPai,
+        "parser": "doupai.DouPai",
     },
     VideoSource.DouYin: {
         "domain_list": ["v.douyin.com", "www.iesdouyin.com", "www.douyin.com"],
-        "parser": DouYin,
+        "parser": "douyin.DouYin",
     },
     VideoSource.HaoKan: {
         "domain_list": [
             "haokan.baidu.com",
             "haokan.hao123.com",
         ],
-        "parser": HaoKan,
+        "parser": "haokan.HaoKan",
     },
     VideoSource.HuYa: {
         "domain_list": ["v.huya.com"],
-        "parser": HuYa,
+        "parser": "huya.HuYa",
     },
     VideoSource.KuaiShou: {
         "domain_list": ["v.kuaishou.com"],
-        "parser": KuaiShou,
+        "parser": "kuaishou.KuaiShou",
     },
     VideoSource.LiShiPin: {
         "domain_list": ["www.pearvideo.com"],
-        "parser": LiShiPin,
+        "parser": "lishipin.LiShiPin",
     },
     VideoSource.LvZhou: {
         "domain_list": ["weibo.cn"],
-        "parser": LvZhou,
+        "parser": "lvzhou.LvZhou",
     },
     VideoSource.MeiPai: {
         "domain_list": ["meipai.com"],
-        "parser": MeiPai,
+        "parser": "meipai.MeiPai",
     },
     VideoSource.PiPiGaoXiao: {
         "domain_list": ["h5.pipigx.com"],
-        "parser": PiPiGaoXiao,
+        "parser": "pipigaoxiao.PiPiGaoXiao",
     },
     VideoSource.PiPiXia: {
         "domain_list": ["h5.pipix.com"],
-        "parser": PiPiXia,
+        "parser": "pipixia.PiPiXia",
     },
     VideoSource.QuanMin: {
         "domain_list": ["xspshare.baidu.com"],
-        "parser": QuanMin,
+        "parser": "quanmin.QuanMin",
     },
     VideoSource.QuanMinKGe: {
         "domain_list": ["kg.qq.com"],
-        "parser": QuanMinKGe,
+        "parser": "quanminkge.QuanMinKGe",
     },
     VideoSource.SixRoom: {
         "domain_list": ["6.cn"],
-        "parser": SixRoom,
+        "parser": "sixroom.SixRoom",
     },
     VideoSource.WeiBo: {
         "domain_list": ["weibo.com"],
-        "parser": WeiBo,
+        "parser": "weibo.WeiBo",
     },
     VideoSource.WeiShi: {
         "domain_list": ["isee.weishi.qq.com"],
-        "parser": WeiShi,
+        "parser": "weishi.WeiShi",
     },
     VideoSource.XiGua: {
         "domain_list": ["v.ixigua.com", "www.ixigua.com"],
-        "parser": XiGua,
+        "parser": "xigua.XiGua",
     },
     VideoSource.XinPianChang: {
         "domain_list": ["xinpianchang.com"],
-        "parser": XinPianChang,
+        "parser": "xinpianchang.XinPianChang",
     },
     VideoSource.ZuiYou: {
         "domain_list": ["share.xiaochuankeji.cn"],
-        "parser": ZuiYou,
+        "parser": "zuiyou.ZuiYou",
     },
     VideoSource.RedBook: {
         "domain_list": [
             "www.xiaohongshu.com",
             "xhslink.com",
         ],
-        "parser": RedBook,
+        "parser": "redbook.RedBook",
     },
 }
 
+# 启动时预加载的平台, 逗号分隔的 VideoSource 值, all 表示全部
+PARSER_WARMUP = os.getenv("PARSER_WARMUP", "")
+
+# 已导入的解析器: 视频来源 -> 解析器类
+_parser_classes: Dict[VideoSource, Type[BaseParser]] = {}
+# 解析器类名 -> 视频来源, 用于 from parser import DouYin 这类按类名的导入
+_parser_class_sources = {
+    source_info["parser"].rpartition(".")[2]: source
+    for source, source_info in video_source_info_mapping.items()
+}
+
+# 按分享链接的 host 查找视频来源, 启动时根据 domain_list 构建
+source_router = HostRouter()
+for _source, _source_info in video_source_info_mapping.items():
+    for _domain in _source_info["domain_list"]:
+        source_router.add(_domain, _source)
+
+# 解析结果缓存: (视频来源, 视频id/分享链接) -> VideoInfo
+result_cache = TTLCache(
+    maxsize=int(os.getenv("RESULT_CACHE_SIZE", "1000")),
+    ttl=float(os.getenv("RESULT_CACHE_TTL", "600")),
+)
+metrics_registry.register_cache("result", result_cache)
+# 返回的 CDN 地址过期前预留的时间(秒), 避免返回即将失效的链接
+RESULT_CACHE_EXPIRE_MARGIN = float(os.getenv("RESULT_CACHE_EXPIRE_MARGIN", "60"))
+# 相同视频的并发解析请求合并为一次上游抓取
+parse_single_flight = SingleFlight()
+
+
+def get_parser_class(source: VideoSource) -> Type[BaseParser]:
+    """
+    获取视频来源对应的解析器类, 首次调用时导入解析器模块
+    :param source: 视频来源
+    :return:
+    """
+    parser_class = _parser_classes.get(source)
+    if parser_class is not None:
+        return parser_class
+
+    parser_path = video_source_info_mapping[source]["parser"]
+    if not parser_path:
+        raise ValueError(f"source {source} has no video parser")
+
+    module_name, _, class_name = parser_path.rpartition(".")
+    module = importlib.import_module(f".{module_name}", __name__)
+    parser_class = _parser_classes[source] = getattr(module, class_name)
+    return parser_class
+
+
+def warm_up_parsers(sources: Union[str, Iterable[str]] = PARSER_WARMUP) -> List[str]:
+    """
+    预加载解析器, 避免首个请求承担导入开销
+    :param sources: 视频来源, 逗号分隔的字符串或列表, all 表示全部
+    :return: 已加载的视频来源
+    """
+    if isinstance(sources, str):
+        sources = [i.strip() for i in sources.split(",") if i.strip()]
+    if "all" in sources:
+        sources = [source.value for source in video_source_info_mapping]
+
+    loaded = []
+    for source in sources:
+        get_parser_class(VideoSource(source))
+        loaded.append(source)
+    return loaded
+
+
+def __getattr__(name: str) -> Type[BaseParser]:
+    source = _parser_class_sources.get(name)
+    if source is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return get_parser_class(source)
+
+
+def _iter_video_info_urls(video_info: VideoInfo) -> Iterator[str]:
+    yield video_info.video_url
+    yield video_info.cover_url
+    yield video_info.music_url
+    for img in video_info.images:
+        yield img.url
+        yield img.live_photo_url
+
+
+def _get_result_cache_ttl(video_info: VideoInfo) -> float:
+    """
+    缓存有效期取默认 ttl 与返回的 CDN 地址中最早过期时间的较小值
+    """
+    ttl = result_cache.ttl
+    now = time.time()
+    for url in _iter_video_info_urls(video_info):
+        if not url:
+            continue
+        expire_time = get_url_expire_time(url)
+        if expire_time:
+            ttl = min(ttl, expire_time - now - RESULT_CACHE_EXPIRE_MARGIN)
+    return ttl
+
+
+async def _cached_parse(
+    source: VideoSource,
+    cache_key: Hashable,
+    parse: Callable[[], Awaitable[VideoInfo]],
+) -> VideoInfo:
+    """
+    依次经过: 结果缓存 -> 并发请求合并 -> 平台熔断器 -> 解析, 并记录解析指标
+    """
+    start = time.perf_counter()
+    try:
+        with trace_span("parse", source.value) as span:
+            video_info = result_cache.get(cache_key)
+            if video_info is not None:
+                span.desc += " cached"
+            else:
+                video_info = await parse_single_flight.do(
+                    cache_key, lambda: _parse_and_cache(source, cache_key, parse)
+                )
+    except Exception as err:
+        parse_requests_total.inc(source=source.value, result="error")
+        parse_errors_total.inc(source=source.value, error=type(err).__name__)
+        raise
+    finally:
+        parse_duration_seconds.observe(time.perf_counter() - start, source=source.value)
+
+    parse_requests_total.inc(source=source.value, result="ok")
+    return video_info
+
+
+async def _parse_and_cache(
+    source: VideoSource,
+    cache_key: Hashable,
+    parse: Callable[[], Awaitable[VideoInfo]],
+) -> VideoInfo:
+    with count_upstream_hops() as hops:
+        try:
+            video_info = await circuit_breaker_registry.get(source.value).call(parse)
+        finally:
+            parse_upstream_hops.observe(hops[0], source=source.value)
+
+    result_cache.set(cache_key, video_info, ttl=_get_result_cache_ttl(video_info))
+    return video_info
+
+
+def _get_share_url_cache_key(share_url: str) -> str:
+    return share_url.strip().split("#")[0].rstrip("/")
+
+
+def get_video_source(share_url: str) -> VideoSource:
+    """
+    根据分享链接获取视频来源
+    :param share_url: 视频分享链接
+    :return:
+    """
+    source = source_router.match(share_url)
+    if source is not None:
+        return source
+
+    raise ValueError(f"share url [{share_url}] does not have source config")
+
 
 async def parse_video_share_url(share_url: str) -> VideoInfo:
     """
@@ -117,24 +285,14 @@ async def parse_video_share_url(share_url: str) -> VideoInfo:
     :param share_url: 视频分享链接
     :return:
     """
-    source = ""
-    for item_source, item_source_info in video_source_info_mapping.items():
-        for item_url_domain in item_source_info["domain_list"]:
-            if item_url_domain in share_url:
-                source = item_source
-                break
-        if source:
-            break
-
-    if not source:
-        raise ValueError(f"share url [{share_url}] does not have source config")
-
-    url_parser = video_source_info_mapping[source]["parser"]
-    if not url_parser:
-        raise ValueError(f"source {source} has no video parser")
+    source = get_video_source(share_url)
 
-    _obj = url_parser()
-    video_info = await _obj.parse_share_url(share_url)
+    _obj = get_parser_class(source)()
+    video_info = await _cached_parse(
+        source,
+        (source, _get_share_url_cache_key(share_url)),
+        lambda: _obj.parse_share_url(share_url),
+    )
 
     return video_info
 
@@ -149,11 +307,9 @@ async def parse_video_id(source: VideoSource, video_id: str) -> VideoInfo:
     if not video_id or not source:
         raise ValueError("video_id or source is empty")
 
-    id_parser = video_source_info_mapping[source]["parser"]
-    if not id_parser:
-        raise ValueError(f"source {source} has no video parser")
-
-    _obj = id_parser()
-    video_info = await _obj.parse_video_id(video_id)
+    _obj = get_parser_class(source)()
+    video_info = await _cached_parse(
+        source, (source, video_id), lambda: _obj.parse_video_id(video_id)
+    )
 
     return video_info
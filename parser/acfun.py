@@ -1,10 +1,11 @@
-import json
 import re
 
-import httpx
 from parsel import Selector
 
-from .base import BaseParser, VideoAuthor, VideoInfo
+from utils import fastjson
+from utils.tracing import trace_span
+
+from .base import BaseParser, VideoAuthor, VideoInfo, VideoSource
 
 
 class AcFun(BaseParser):
@@ -12,10 +13,13 @@ class AcFun(BaseParser):
     A站：视频地址是m3u8, 可以使用网站 https://tools.thatwind.com/tool/m3u8downloader 下载
     """
 
+    source = VideoSource.AcFun
+
     async def parse_share_url(self, share_url: str) -> VideoInfo:
-        async with httpx.AsyncClient(follow_redirects=True) as client:
-            response = await client.get(share_url, headers=self.get_default_headers())
-            response.raise_for_status()
+        response = await self.get(
+            share_url, headers=self.get_default_headers(), follow_redirects=True
+        )
+        response.raise_for_status()
 
         re_video_pattern = r"var videoInfo =\s(.*?);"
         re_video_result = re.search(re_video_pattern, response.text)
@@ -23,7 +27,8 @@ class AcFun(BaseParser):
             raise Exception("failed to parse video JSON info from HTML")
 
         video_text = re_video_result.group(1).strip()
-        video_data = json.loads(video_text)
+        with trace_span("decode"):
+            video_data = fastjson.loads(video_text)
 
         # 解析视频播放地址
         re_play_info_pattern = r"var playInfo =\s(.*?);"
@@ -32,10 +37,12 @@ class AcFun(BaseParser):
             raise Exception("failed to parse play info JSON info from HTML")
 
         play_info_text = re_play_info_result.group(1).strip()
-        play_info_data = json.loads(play_info_text)
+        with trace_span("decode"):
+            play_info_data = fastjson.loads(play_info_text)
 
         # 解析用户信息
-        sel = Selector(response.text)
+        with trace_span("extract"):
+            sel = Selector(response.text)
         uid = (
             sel.css("div.up-info > a.info-item1::attr(href)")
             .get(default="")
@@ -1,9 +1,31 @@
 import dataclasses
+import os
+import re
+import time
 from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
 from enum import Enum
-from typing import Dict, List
+from typing import Any, AsyncIterator, Dict, List, Optional
 
-import fake_useragent
+import httpx
+
+from utils.breaker import mark_upstream_failure
+from utils.cache import TTLCache
+from utils.http_client import get_http_client
+from utils.metrics import metrics_registry, record_upstream_request
+from utils.ratelimit import is_throttled_response, rate_limiter_registry
+from utils.tracing import trace_span
+from utils.user_agent import user_agent_pool
+
+# 短链接跳转缓存: 分享短链接 -> 跳转地址, 命中时省去一次上游请求
+short_link_cache = TTLCache(
+    maxsize=int(os.getenv("SHORT_LINK_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("SHORT_LINK_CACHE_TTL", "3600")),
+)
+metrics_registry.register_cache("short_link", short_link_cache)
+
+# 流式读取页面时, 保留的末尾字节数, 防止起始标记被切分在两个 chunk 之间
+STREAM_MARKER_OVERLAP = 256
 
 
 class VideoSource(Enum):
@@ -33,7 +55,7 @@ class VideoSource(Enum):
     RedBook = "redbook"  # 小红书
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class VideoAuthor:
     """
     视频作者信息
@@ -48,8 +70,11 @@ class VideoAuthor:
     # 作者头像
     avatar: str = ""
 
+    def to_dict(self) -> Dict[str, Any]:
+        return {"uid": self.uid, "name": self.name, "avatar": self.avatar}
 
-@dataclasses.dataclass
+
+@dataclasses.dataclass(slots=True)
 class ImgInfo:
     """
     图集图片信息
@@ -61,8 +86,11 @@ class ImgInfo:
     # livephoto 视频地址
     live_photo_url: str = ""
 
+    def to_dict(self) -> Dict[str, Any]:
+        return {"url": self.url, "live_photo_url": self.live_photo_url}
+
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class VideoInfo:
     """
     视频信息
@@ -89,14 +117,193 @@ class VideoInfo:
     # 视频作者信息
     author: VideoAuthor = dataclasses.field(default_factory=VideoAuthor)
 
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        转换为 dict, 比 dataclasses.asdict 少一次递归深拷贝
+        """
+        return {
+            "video_url": self.video_url,
+            "cover_url": self.cover_url,
+            "title": self.title,
+            "desc": self.desc,
+            "music_url": self.music_url,
+            # 图集可能有上百张图片, 直接构造 dict, 省去逐个方法调用
+            "images": [
+                {"url": image.url, "live_photo_url": image.live_photo_url}
+                for image in self.images
+            ],
+            "author": self.author.to_dict(),
+        }
+
 
 class BaseParser(ABC):
+    # 解析器对应的视频来源
+    source: Optional[VideoSource] = None
+
+    @property
+    def platform(self) -> str:
+        return self.source.value if self.source else type(self).__name__.lower()
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """
+        进程级共享的 http client, 复用 keep-alive 连接
+        """
+        return get_http_client()
+
+    @asynccontextmanager
+    async def stream(
+        self, method: str, url: str, **kwargs
+    ) -> AsyncIterator[httpx.Response]:
+        """
+        所有上游请求的统一出口, 按 (平台, host) 限流, 响应体需要在上下文中读取
+        :param method: 请求方法
+        :param url: 请求地址
+        :param kwargs: 透传给 httpx.AsyncClient.stream 的参数
+        :return:
+        """
+        host = httpx.URL(url).host
+        limiter = rate_limiter_registry.get(self.platform, host)
+        queued_at = time.perf_counter()
+        async with limiter.acquire():
+            with trace_span("upstream", f"{self.platform} {host}") as span:
+                # 耗时从拿到限流名额后开始计算, 不含排队时间
+                start = span.start
+                status = "cancelled"
+                response = None
+                try:
+                    async with self.client.stream(method, url, **kwargs) as response:
+                        status = str(response.status_code)
+                        if is_throttled_response(response):
+                            limiter.on_throttled()
+                            mark_upstream_failure(status)
+                        else:
+                            limiter.on_success()
+                        yield response
+                except Exception as err:
+                    if isinstance(err, httpx.TimeoutException):
+                        limiter.on_throttled()
+                    if response is None:
+                        # 未拿到响应时按异常类型统计
+                        status = type(err).__name__
+                    raise
+                finally:
+                    num_bytes = (
+                        response.num_bytes_downloaded if response is not None else 0
+                    )
+                    span.desc += f" {status}"
+                    span.attributes.update(
+                        status=status,
+                        bytes=num_bytes,
+                        queue_ms=round((start - queued_at) * 1e3, 2),
+                    )
+                    record_upstream_request(
+                        self.platform,
+                        host,
+                        status,
+                        time.perf_counter() - start,
+                        num_bytes,
+                    )
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """
+        发送请求并读取完整响应体
+        :param method: 请求方法
+        :param url: 请求地址
+        :param kwargs: 透传给 httpx.AsyncClient.stream 的参数
+        :return:
+        """
+        async with self.stream(method, url, **kwargs) as response:
+            await response.aread()
+        return response
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    async def fetch_embedded_data(
+        self, url: str, start_pattern: bytes, end_marker: bytes = b"</script>", **kwargs
+    ) -> str:
+        """
+        流式读取页面, 提取 start_pattern 与 end_marker 之间的内容(如页面内嵌的 json),
+        找到后立即断开连接, 不再下载和解码页面剩余部分
+        :param url: 页面地址
+        :param start_pattern: 起始标记的正则(bytes), 如 window._ROUTER_DATA 赋值语句
+        :param end_marker: 结束标记
+        :param kwargs: 透传给 httpx.AsyncClient.stream 的参数
+        :return: 提取到的内容, 未找到时返回空字符串
+        """
+        start_reg = re.compile(start_pattern)
+        buffer = bytearray()
+        start = -1
+        async with self.stream("GET", url, **kwargs) as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes():
+                # 结束标记可能被切分在两个 chunk 之间, 从上次末尾往前一点开始查找
+                end_search_from = len(buffer) - len(end_marker)
+                buffer += chunk
+                if start < 0:
+                    find_res = start_reg.search(buffer)
+                    if not find_res:
+                        # 未找到起始标记之前, 只保留末尾部分
+                        del buffer[:-STREAM_MARKER_OVERLAP]
+                        continue
+                    start = find_res.end()
+                    end_search_from = start
+
+                end = buffer.find(end_marker, max(start, end_search_from))
+                if end >= 0:
+                    encoding = response.encoding or "utf-8"
+                    return buffer[start:end].decode(encoding, errors="replace")
+        # 页面没有内嵌数据, 通常是风控页面
+        mark_upstream_failure("embedded data missing")
+        return ""
+
+    async def resolve_redirect(
+        self, share_url: str, headers: Dict[str, str], with_session: bool = False
+    ) -> Dict[str, Any]:
+        """
+        请求分享短链接(不跟随跳转), 获取跳转信息, 跳转地址按短链接缓存
+        :param share_url: 分享短链接
+        :param headers: 请求头
+        :param with_session: 是否需要跳转响应的响应头和 cookie; 会话信息不缓存,
+            避免过期的 cookie 或同一个会话被多个用户复用, 每次都请求短链接
+        :return: {"location": 跳转地址, "headers": 响应头, "cookies": 响应cookie},
+            with_session 为 False 时 headers、cookies 为空
+        """
+        if not with_session:
+            location = short_link_cache.get(share_url)
+            if location is not None:
+                return {"location": location, "headers": [], "cookies": {}}
+
+        response = await self.get(share_url, headers=headers)
+        location = response.headers.get("location", "")
+        if response.is_redirect and location:
+            short_link_cache.set(share_url, location)
+        if not with_session:
+            return {"location": location, "headers": [], "cookies": {}}
+        return {
+            "location": location,
+            "headers": response.headers.multi_items(),
+            "cookies": dict(response.cookies),
+        }
+
     @staticmethod
     def get_default_headers() -> Dict[str, str]:
         return {
-            "User-Agent": fake_useragent.UserAgent(os=["ios"]).random,
+            "User-Agent": user_agent_pool.random("ios"),
         }
 
+    def get_user_agent(self, os_name: str = "ios") -> str:
+        """
+        从预生成的 User-Agent 池中获取, 开启 UA_PIN_TTL 时同一平台固定使用同一个
+        :param os_name: 系统: ios, android, windows
+        :return:
+        """
+        return user_agent_pool.pinned(os_name, type(self).__name__)
+
     @abstractmethod
     async def parse_share_url(self, share_url: str) -> VideoInfo:
         """
@@ -1,8 +1,7 @@
-import httpx
+from utils import fastjson, get_val_from_url_by_query_key
+from utils.tracing import trace_span
 
-from utils import get_val_from_url_by_query_key
-
-from .base import BaseParser, VideoAuthor, VideoInfo
+from .base import BaseParser, VideoAuthor, VideoInfo, VideoSource
 
 
 class DouPai(BaseParser):
@@ -10,17 +9,19 @@ class DouPai(BaseParser):
     逗拍
     """
 
+    source = VideoSource.DouPai
+
     async def parse_share_url(self, share_url: str) -> VideoInfo:
         video_id = get_val_from_url_by_query_key(share_url, "id")
         return await self.parse_video_id(video_id)
 
     async def parse_video_id(self, video_id: str) -> VideoInfo:
         req_url = f"https://v2.doupai.cc/topic/{video_id}.json"
-        async with httpx.AsyncClient() as client:
-            response = await client.get(req_url, headers=self.get_default_headers())
-            response.raise_for_status()
+        response = await self.get(req_url, headers=self.get_default_headers())
+        response.raise_for_status()
 
-        json_data = response.json()
+        with trace_span("decode"):
+            json_data = fastjson.loads(response.content)
         data = json_data["data"]
 
         video_info = VideoInfo(
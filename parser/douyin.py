@@ -1,9 +1,7 @@
-import json
-import re
+from utils import fastjson
+from utils.tracing import trace_span
 
-import httpx
-
-from .base import BaseParser, ImgInfo, VideoAuthor, VideoInfo
+from .base import BaseParser, ImgInfo, VideoAuthor, VideoInfo, VideoSource
 
 
 class DouYin(BaseParser):
@@ -11,6 +9,8 @@ class DouYin(BaseParser):
     抖音 / 抖音火山版
     """
 
+    source = VideoSource.DouYin
+
     async def parse_share_url(self, share_url: str) -> VideoInfo:
         if share_url.startswith("https://www.douyin.com/video/"):
             # 支持电脑网页版链接 https://www.douyin.com/video/xxxxxx
@@ -18,32 +18,24 @@ class DouYin(BaseParser):
             share_url = self._get_request_url_by_video_id(video_id)
         else:
             # 支持app分享链接 https://v.douyin.com/xxxxxx
-            async with httpx.AsyncClient(follow_redirects=False) as client:
-                share_response = await client.get(
-                    share_url, headers=self.get_default_headers()
-                )
-                video_id = (
-                    share_response.headers.get("location")
-                    .split("?")[0]
-                    .strip("/")
-                    .split("/")[-1]
-                )
-                share_url = self._get_request_url_by_video_id(video_id)
-
-        async with httpx.AsyncClient(follow_redirects=True) as client:
-            response = await client.get(share_url, headers=self.get_default_headers())
-            response.raise_for_status()
-
-        pattern = re.compile(
-            pattern=r"window\._ROUTER_DATA\s*=\s*(.*?)</script>",
-            flags=re.DOTALL,
+            redirect = await self.resolve_redirect(
+                share_url, headers=self.get_default_headers()
+            )
+            video_id = redirect["location"].split("?")[0].strip("/").split("/")[-1]
+            share_url = self._get_request_url_by_video_id(video_id)
+
+        json_text = await self.fetch_embedded_data(
+            share_url,
+            rb"window\._ROUTER_DATA\s*=\s*",
+            headers=self.get_default_headers(),
+            follow_redirects=True,
         )
-        find_res = pattern.search(response.text)
 
-        if not find_res or not find_res.group(1):
+        if not json_text:
             raise ValueError("parse video json info from html fail")
 
-        json_data = json.loads(find_res.group(1).strip())
+        with trace_span("decode"):
+            json_data = fastjson.loads(json_text.strip())
 
         # 获取链接返回json数据进行视频和图集判断,如果指定类型不存在，抛出异常
         # 返回的json数据中，视频字典类型为 video_(id)/page
@@ -122,8 +114,7 @@ class DouYin(BaseParser):
         return video_info
 
     async def get_video_redirect_url(self, video_url: str) -> str:
-        async with httpx.AsyncClient(follow_redirects=False) as client:
-            response = await client.get(video_url, headers=self.get_default_headers())
+        response = await self.get(video_url, headers=self.get_default_headers())
         # 返回重定向后的地址，如果没有重定向则返回原地址(抖音中的西瓜视频,重定向地址为空)
         return response.headers.get("location") or video_url
 
@@ -1,8 +1,7 @@
-import httpx
+from utils import fastjson, get_val_from_url_by_query_key
+from utils.tracing import trace_span
 
-from utils import get_val_from_url_by_query_key
-
-from .base import BaseParser, VideoAuthor, VideoInfo
+from .base import BaseParser, VideoAuthor, VideoInfo, VideoSource
 
 
 class HaoKan(BaseParser):
@@ -10,17 +9,19 @@ class HaoKan(BaseParser):
     好看视频
     """
 
+    source = VideoSource.HaoKan
+
     async def parse_share_url(self, share_url: str) -> VideoInfo:
         video_id = get_val_from_url_by_query_key(share_url, "vid")
         return await self.parse_video_id(video_id)
 
     async def parse_video_id(self, video_id: str) -> VideoInfo:
         req_url = f"https://haokan.baidu.com/v?_format=json&vid={video_id}"
-        async with httpx.AsyncClient() as client:
-            response = await client.get(req_url, headers=self.get_default_headers())
-            response.raise_for_status()
+        response = await self.get(req_url, headers=self.get_default_headers())
+        response.raise_for_status()
 
-        json_data = response.json()
+        with trace_span("decode"):
+            json_data = fastjson.loads(response.content)
         # 接口返回错误
         if json_data["errno"] != 0:
             raise Exception(json_data["error"])
@@ -1,9 +1,9 @@
 import re
 
-import fake_useragent
-import httpx
+from utils import fastjson
+from utils.tracing import trace_span
 
-from .base import BaseParser, VideoAuthor, VideoInfo
+from .base import BaseParser, VideoAuthor, VideoInfo, VideoSource
 
 
 class HuYa(BaseParser):
@@ -11,6 +11,8 @@ class HuYa(BaseParser):
     虎牙
     """
 
+    source = VideoSource.HuYa
+
     async def parse_share_url(self, share_url: str) -> VideoInfo:
         re_pattern = r"\/(\d+).html"
         re_result = re.search(re_pattern, share_url)
@@ -23,15 +25,15 @@ class HuYa(BaseParser):
 
     async def parse_video_id(self, video_id: str) -> VideoInfo:
         req_url = f"https://liveapi.huya.com/moment/getMomentContent?videoId={video_id}"
-        async with httpx.AsyncClient() as client:
-            headers = {
-                "User-Agent": fake_useragent.UserAgent(os=["windows"]).random,
-                "Referer": "https://v.huya.com/",
-            }
-            response = await client.get(req_url, headers=headers)
-            response.raise_for_status()
-
-        json_data = response.json()
+        headers = {
+            "User-Agent": self.get_user_agent("windows"),
+            "Referer": "https://v.huya.com/",
+        }
+        response = await self.get(req_url, headers=headers)
+        response.raise_for_status()
+
+        with trace_span("decode"):
+            json_data = fastjson.loads(response.content)
         data = json_data["data"]["moment"]["videoInfo"]
         if data["uid"] == 0:
             raise Exception("video not found")
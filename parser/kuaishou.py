@@ -1,10 +1,9 @@
-import json
-import re
-
-import fake_useragent
 import httpx
 
-from .base import BaseParser, ImgInfo, VideoAuthor, VideoInfo
+from utils import fastjson
+from utils.tracing import trace_span
+
+from .base import BaseParser, ImgInfo, VideoAuthor, VideoInfo, VideoSource
 
 
 class KuaiShou(BaseParser):
@@ -12,41 +11,46 @@ class KuaiShou(BaseParser):
     快手
     """
 
+    source = VideoSource.KuaiShou
+
     async def parse_share_url(self, share_url: str) -> VideoInfo:
-        user_agent = fake_useragent.UserAgent(os=["ios"]).random
+        user_agent = self.get_user_agent("ios")
 
         # 获取跳转前的信息, 从中获取跳转url, cookie
-        async with httpx.AsyncClient(follow_redirects=False) as client:
-            share_response = await client.get(
-                share_url,
-                headers={
-                    "User-Agent": user_agent,
-                    "Referer": "https://v.kuaishou.com/",
-                },
-            )
+        redirect = await self.resolve_redirect(
+            share_url,
+            headers={
+                "User-Agent": user_agent,
+                "Referer": "https://v.kuaishou.com/",
+            },
+            with_session=True,
+        )
 
-        location_url = share_response.headers.get("location", "")
+        location_url = redirect["location"]
         if len(location_url) <= 0:
             raise Exception("failed to get location url from share url")
 
         # /fw/long-video/ 返回结果不一样, 统一替换为 /fw/photo/ 请求
         location_url = location_url.replace("/fw/long-video/", "/fw/photo/")
 
-        async with httpx.AsyncClient(follow_redirects=True) as client:
-            response = await client.get(
-                location_url,
-                headers=share_response.headers,
-                cookies=share_response.cookies,
+        # 共享 client 不保存 cookie, 跳转前拿到的 cookie 通过请求头传递
+        headers = httpx.Headers(redirect["headers"])
+        if redirect["cookies"]:
+            headers["Cookie"] = "; ".join(
+                f"{name}={value}" for name, value in redirect["cookies"].items()
             )
+        json_text = await self.fetch_embedded_data(
+            location_url,
+            rb"window.INIT_STATE\s*=\s*",
+            headers=headers,
+            follow_redirects=True,
+        )
 
-        re_pattern = r"window.INIT_STATE\s*=\s*(.*?)</script>"
-        re_result = re.search(re_pattern, response.text)
-
-        if not re_result or len(re_result.groups()) < 1:
+        if not json_text:
             raise Exception("failed to parse video JSON info from HTML")
 
-        json_text = re_result.group(1).strip()
-        json_data = json.loads(json_text)
+        with trace_span("decode"):
+            json_data = fastjson.loads(json_text.strip())
 
         photo_data = {}
         for json_item in json_data.values():
@@ -1,10 +1,10 @@
 import time
 from urllib.parse import urlparse
 
-import fake_useragent
-import httpx
+from utils import fastjson
+from utils.tracing import trace_span
 
-from .base import BaseParser, VideoInfo
+from .base import BaseParser, VideoInfo, VideoSource
 
 
 class LiShiPin(BaseParser):
@@ -12,6 +12,8 @@ class LiShiPin(BaseParser):
     梨视频
     """
 
+    source = VideoSource.LiShiPin
+
     async def parse_share_url(self, share_url: str) -> VideoInfo:
         url_res = urlparse(share_url)
 
@@ -27,17 +29,17 @@ class LiShiPin(BaseParser):
             f"https://www.pearvideo.com/videoStatus.jsp?contId={video_id}&mrd={now}"
         )
 
-        async with httpx.AsyncClient() as client:
-            headers = {
-                "Referer": f"https://www.pearvideo.com/detail_{video_id}",
-                "User-Agent": fake_useragent.UserAgent(os=["windows"]).random,
-            }
-            response = await client.get(req_url, headers=headers)
+        headers = {
+            "Referer": f"https://www.pearvideo.com/detail_{video_id}",
+            "User-Agent": self.get_user_agent("windows"),
+        }
+        response = await self.get(req_url, headers=headers)
 
         if response.status_code != 200:
             raise Exception("failed to fetch data")
 
-        json_data = response.json()
+        with trace_span("decode"):
+            json_data = fastjson.loads(response.content)
 
         # 获取 videoInfo 字段的值
         video_src_url = json_data["videoInfo"]["videos"]["srcUrl"]
@@ -1,9 +1,10 @@
 import re
 
-import httpx
 from parsel import Selector
 
-from .base import BaseParser, VideoAuthor, VideoInfo
+from utils.tracing import trace_span
+
+from .base import BaseParser, VideoAuthor, VideoInfo, VideoSource
 
 
 class LvZhou(BaseParser):
@@ -11,12 +12,14 @@ class LvZhou(BaseParser):
     绿洲
     """
 
+    source = VideoSource.LvZhou
+
     async def parse_share_url(self, share_url: str) -> VideoInfo:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(share_url, headers=self.get_default_headers())
-            response.raise_for_status()
+        response = await self.get(share_url, headers=self.get_default_headers())
+        response.raise_for_status()
 
-        sel = Selector(response.text)
+        with trace_span("extract"):
+            sel = Selector(response.text)
 
         video_url = sel.css("video::attr(src)").get()
         author_avatar = sel.css("a.avatar img::attr(src)").get()
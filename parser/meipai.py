@@ -1,11 +1,11 @@
 import base64
 from typing import Dict, List
 
-import fake_useragent
-import httpx
 from parsel import Selector
 
-from .base import BaseParser, VideoAuthor, VideoInfo
+from utils.tracing import trace_span
+
+from .base import BaseParser, VideoAuthor, VideoInfo, VideoSource
 
 
 class MeiPai(BaseParser):
@@ -13,15 +13,17 @@ class MeiPai(BaseParser):
     美拍
     """
 
+    source = VideoSource.MeiPai
+
     async def parse_share_url(self, share_url: str) -> VideoInfo:
-        async with httpx.AsyncClient() as client:
-            headers = {
-                "User-Agent": fake_useragent.UserAgent(os=["windows"]).random,
-            }
-            response = await client.get(share_url, headers=headers)
-            response.raise_for_status()
-
-        sel = Selector(response.text)
+        headers = {
+            "User-Agent": self.get_user_agent("windows"),
+        }
+        response = await self.get(share_url, headers=headers)
+        response.raise_for_status()
+
+        with trace_span("extract"):
+            sel = Selector(response.text)
         video_bs64 = sel.css("#shareMediaBtn::attr(data-video)").get(default="")
         video_url = self.parse_video_bs64(video_bs64)
 
@@ -1,9 +1,9 @@
 from urllib.parse import urlparse
 
-import fake_useragent
-import httpx
+from utils import fastjson
+from utils.tracing import trace_span
 
-from .base import BaseParser, VideoInfo
+from .base import BaseParser, VideoInfo, VideoSource
 
 
 class PiPiGaoXiao(BaseParser):
@@ -11,6 +11,8 @@ class PiPiGaoXiao(BaseParser):
     皮皮搞笑
     """
 
+    source = VideoSource.PiPiGaoXiao
+
     async def parse_share_url(self, share_url: str) -> VideoInfo:
         url_res = urlparse(share_url)
 
@@ -22,18 +24,18 @@ class PiPiGaoXiao(BaseParser):
 
     async def parse_video_id(self, video_id: str) -> VideoInfo:
         req_url = "https://share.ippzone.com/ppapi/share/fetch_content"
-        async with httpx.AsyncClient() as client:
-            headers = {
-                "Referer": req_url,
-                "Content-Type": "text/plain;charset=UTF-8",
-                "User-Agent": fake_useragent.UserAgent(os=["windows"]).random,
-            }
-            # pid需要是数字，这里直接拼接json字符串，不用json.dumps
-            post_content = '{"pid":' + video_id + ',"type":"post","mid":null}'
-            response = await client.post(req_url, headers=headers, content=post_content)
-            response.raise_for_status()
-
-        json_data = response.json()
+        headers = {
+            "Referer": req_url,
+            "Content-Type": "text/plain;charset=UTF-8",
+            "User-Agent": self.get_user_agent("windows"),
+        }
+        # pid需要是数字，这里直接拼接json字符串，不用json.dumps
+        post_content = '{"pid":' + video_id + ',"type":"post","mid":null}'
+        response = await self.post(req_url, headers=headers, content=post_content)
+        response.raise_for_status()
+
+        with trace_span("decode"):
+            json_data = fastjson.loads(response.content)
         # 接口返回错误
         if "msg" in json_data:
             raise Exception(json_data["msg"])
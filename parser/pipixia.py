@@ -1,6 +1,7 @@
-import httpx
+from utils import fastjson
+from utils.tracing import trace_span
 
-from .base import BaseParser, ImgInfo, VideoAuthor, VideoInfo
+from .base import BaseParser, ImgInfo, VideoAuthor, VideoInfo, VideoSource
 
 
 class PiPiXia(BaseParser):
@@ -8,10 +9,13 @@ class PiPiXia(BaseParser):
     皮皮虾
     """
 
+    source = VideoSource.PiPiXia
+
     async def parse_share_url(self, share_url: str) -> VideoInfo:
-        async with httpx.AsyncClient(follow_redirects=False) as client:
-            response = await client.get(share_url, headers=self.get_default_headers())
-        location_url = response.headers.get("location", "")
+        redirect = await self.resolve_redirect(
+            share_url, headers=self.get_default_headers()
+        )
+        location_url = redirect["location"]
         if len(location_url) <= 0:
             raise Exception("failed to get location url from share url")
 
@@ -25,11 +29,11 @@ class PiPiXia(BaseParser):
             + f"?offset=0&cell_type=1&api_version=1&cell_id={video_id}"
             + "&ac=wifi&channel=huawei_1319_64&aid=1319&app_name=super"
         )
-        async with httpx.AsyncClient(follow_redirects=False) as client:
-            response = await client.get(req_url, headers=self.get_default_headers())
-            response.raise_for_status()
+        response = await self.get(req_url, headers=self.get_default_headers())
+        response.raise_for_status()
 
-        json_data = response.json()
+        with trace_span("decode"):
+            json_data = fastjson.loads(response.content)
         if json_data["status_code"] != 0:
             raise Exception(f"获取作品信息失败:prompt={json_data['prompt']}")
         data = json_data["data"]["cell_comments"][0]["comment_info"]["item"]
@@ -1,12 +1,7 @@
-import json
-import re
+from utils import fastjson, get_val_from_url_by_query_key
+from utils.tracing import trace_span
 
-import fake_useragent
-import httpx
-
-from utils import get_val_from_url_by_query_key
-
-from .base import BaseParser, VideoAuthor, VideoInfo
+from .base import BaseParser, VideoAuthor, VideoInfo, VideoSource
 
 
 class QuanMinKGe(BaseParser):
@@ -14,27 +9,26 @@ class QuanMinKGe(BaseParser):
     全民K歌
     """
 
+    source = VideoSource.QuanMinKGe
+
     async def parse_share_url(self, share_url: str) -> VideoInfo:
         video_id = get_val_from_url_by_query_key(share_url, "s")
         return await self.parse_video_id(video_id)
 
     async def parse_video_id(self, video_id: str) -> VideoInfo:
         req_url = f"https://kg.qq.com/node/play?s={video_id}"
-        async with httpx.AsyncClient() as client:
-            headers = {
-                "User-Agent": fake_useragent.UserAgent(os="windows").random,
-            }
-            response = await client.get(req_url, headers=headers)
-            response.raise_for_status()
-
-        re_pattern = r"window.__DATA__ = (.*?); </script>"
-        re_result = re.search(re_pattern, response.text)
+        headers = {
+            "User-Agent": self.get_user_agent("windows"),
+        }
+        json_text = await self.fetch_embedded_data(
+            req_url, rb"window.__DATA__ = ", b"; </script>", headers=headers
+        )
 
-        if not re_result or len(re_result.groups()) < 1:
+        if not json_text:
             raise Exception("failed to parse video JSON info from HTML")
 
-        json_text = re_result.group(1).strip()
-        json_data = json.loads(json_text)
+        with trace_span("decode"):
+            json_data = fastjson.loads(json_text.strip())
         data = json_data["detail"]
 
         video_info = VideoInfo(
@@ -1,10 +1,24 @@
-import re
 import asyncio
-import fake_useragent
-import httpx
-import yaml
+import os
+from typing import Optional, Tuple
 
-from .base import BaseParser, ImgInfo, VideoAuthor, VideoInfo
+from utils import jsobject
+from utils.cache import TTLCache
+from utils.metrics import metrics_registry
+from utils.ratelimit import is_throttled_response
+from utils.tracing import trace_span
+
+from .base import BaseParser, ImgInfo, VideoAuthor, VideoInfo, VideoSource
+
+# 同一篇笔记内并发探测图片格式的数量
+REDBOOK_PROBE_CONCURRENCY = int(os.getenv("REDBOOK_PROBE_CONCURRENCY", "4"))
+# 图片格式探测结果缓存: 最大条数与有效期(秒)
+REDBOOK_PROBE_CACHE_SIZE = int(os.getenv("REDBOOK_PROBE_CACHE_SIZE", "10000"))
+REDBOOK_PROBE_CACHE_TTL = float(os.getenv("REDBOOK_PROBE_CACHE_TTL", "86400"))
+
+# 图片id -> 是否支持 png, 不同图片的支持情况不同, 只按图片id缓存
+png_support_cache = TTLCache(REDBOOK_PROBE_CACHE_SIZE, REDBOOK_PROBE_CACHE_TTL)
+metrics_registry.register_cache("redbook_png_support", png_support_cache)
 
 
 class RedBook(BaseParser):
@@ -12,30 +26,36 @@ class RedBook(BaseParser):
     小红书
     """
 
+    source = VideoSource.RedBook
+
+    # 只解析 __INITIAL_STATE__ 中当前笔记相关的部分, 失败时再解析完整数据
+    partial_state_decode = True
+
     async def parse_share_url(self, share_url: str) -> VideoInfo:
         headers = {
-            "User-Agent": fake_useragent.UserAgent(os=["windows"]).random,
+            "User-Agent": self.get_user_agent("windows"),
         }
-        async with httpx.AsyncClient(follow_redirects=True) as client:
-            response = await client.get(share_url, headers=headers)
-            response.raise_for_status()
+        if "xhslink.com" in share_url:
+            # 短链接跳转地址可以缓存, 命中时直接请求跳转后的地址
+            redirect = await self.resolve_redirect(share_url, headers=headers)
+            share_url = redirect["location"] or share_url
 
-        pattern = re.compile(
-            pattern=r"window\.__INITIAL_STATE__\s*=\s*(.*?)</script>",
-            flags=re.DOTALL,
+        json_text = await self.fetch_embedded_data(
+            share_url,
+            rb"window\.__INITIAL_STATE__\s*=\s*",
+            headers=headers,
+            follow_redirects=True,
         )
-        find_res = pattern.search(response.text)
 
-        if not find_res or not find_res.group(1):
+        if not json_text:
             raise ValueError("parse video json info from html fail")
 
-        json_data = yaml.safe_load(find_res.group(1))
-
-        note_id = json_data["note"]["currentNoteId"]
+        with trace_span("decode"):
+            note_id, note_detail_map = self.load_note_state(json_text)
         # 验证返回：小红书的分享链接有有效期，过期后会返回 undefined
-        if note_id == "undefined":
+        if not note_id or note_id == "undefined":
             raise Exception("parse fail: note id in response is undefined")
-        data = json_data["note"]["noteDetailMap"][note_id]["note"]
+        data = note_detail_map[note_id]["note"]
 
         # 视频地址
         video_url = ""
@@ -48,6 +68,7 @@ class RedBook(BaseParser):
         # 获取图集图片地址
         images = []
         if len(video_url) <= 0:
+            png_urls = []
             for img_item in data["imageList"]:
                 # 个别图片有水印, 替换图片域名
                 image_id = img_item["urlDefault"].split("/")[-1].split("!")[0]
@@ -57,17 +78,35 @@ class RedBook(BaseParser):
                 )
 
                 if "notes_pre_post" not in img_item["urlDefault"]:
-                    new_url = "https://ci.xiaohongshu.com/" + f"{image_id}" + "?imageView2/format/png"
+                    new_url = (
+                        "https://ci.xiaohongshu.com/"
+                        + f"{image_id}"
+                        + "?imageView2/format/png"
+                    )
                 else:
                     new_url = (
                         "https://ci.xiaohongshu.com/notes_pre_post/"
                         + f"{spectrum_str}{image_id}"
                         + "?imageView2/format/png"
                     )
-                if not await self.check_resource_link(new_url):
+                png_urls.append((image_id, new_url))
+
+            # 并发探测图片是否支持 png 格式
+            semaphore = asyncio.Semaphore(REDBOOK_PROBE_CONCURRENCY)
+            png_supported = await asyncio.gather(
+                *[
+                    self.check_png_support(image_id, new_url, semaphore)
+                    for image_id, new_url in png_urls
+                ]
+            )
+
+            for img_item, (_, new_url), supported in zip(
+                data["imageList"], png_urls, png_supported
+            ):
+                if not supported:
                     new_url = new_url.replace("format/png", "format/jpg")
-                    print(f'replace: {new_url}')
-                
+                    print(f"replace: {new_url}")
+
                 img_info = ImgInfo(url=new_url)
 
                 # 如果原图片网址中没有 notes_pre_post 关键字，不支持替换域名，使用原域名
@@ -98,7 +137,29 @@ class RedBook(BaseParser):
 
     async def parse_video_id(self, video_id: str) -> VideoInfo:
         raise NotImplementedError("小红书暂不支持直接解析视频ID")
-    
+
+    def load_note_state(self, json_text: str) -> Tuple[str, dict]:
+        """
+        解析 window.__INITIAL_STATE__, 获取当前笔记id 和 noteDetailMap
+        :param json_text: __INITIAL_STATE__ 的 js 对象字面量
+        :return: (currentNoteId, noteDetailMap)
+        """
+        if self.partial_state_decode:
+            try:
+                # 先截取 note 对象, 避免匹配到 state 其他部分中的同名键
+                note_text = jsobject.extract_value(json_text, "note")
+                if note_text is not None:
+                    note_id = jsobject.loads_value(note_text, "currentNoteId")
+                    note_detail_map = jsobject.loads_value(note_text, "noteDetailMap")
+                    # 笔记不在 noteDetailMap 中时说明匹配有误, 解析完整数据
+                    if not note_id or note_id in note_detail_map:
+                        return note_id, note_detail_map
+            except Exception:
+                pass
+
+        json_data = jsobject.loads(json_text)
+        return json_data["note"]["currentNoteId"], json_data["note"]["noteDetailMap"]
+
     # async def check_resource_link(self, url:str) -> bool:
     #     headers = {
     #         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.0.0 Safari/537.36",
@@ -116,36 +177,63 @@ class RedBook(BaseParser):
     #         return response.status_code in (200, 206)
     #     except:
     #         return False
-    
-    async def check_resource_link(self, url: str) -> bool:
+
+    async def check_png_support(
+        self, image_id: str, url: str, semaphore: asyncio.Semaphore
+    ) -> bool:
+        """
+        判断图片是否支持 png 格式, 结果按图片id缓存
+        :param image_id: 图片id
+        :param url: png 格式的图片地址
+        :param semaphore: 限制同一篇笔记的并发探测数
+        :return:
+        """
+        supported = png_support_cache.get(image_id)
+        if supported is not None:
+            return supported
+
+        async with semaphore:
+            supported = await self.check_resource_link(url)
+        if supported is None:
+            # 请求失败时不缓存, 下次重新探测
+            return False
+
+        png_support_cache.set(image_id, supported)
+        return supported
+
+    async def check_resource_link(self, url: str) -> Optional[bool]:
+        """
+        请求资源的前 100 字节判断链接是否可用
+        :param url: 资源地址
+        :return: 是否可用, 多次重试仍请求失败时返回 None
+        """
         headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.0.0 Safari/537.36",
-            "Range": "bytes=0-99"
+            "User-Agent": self.get_user_agent("windows"),
+            "Range": "bytes=0-99",
         }
         max_retries = 3  # 设置最大重试次数
         retry_delay = 1  # 重试间隔时间（秒）
-        
+
         for attempt in range(max_retries):
             try:
-                transport = httpx.AsyncHTTPTransport(retries=5)
-                async with httpx.AsyncClient(
-                    transport=transport, 
-                    timeout=10, 
-                    follow_redirects=True
-                ) as client:
-                    response = await client.get(
-                        url,
-                        headers=headers,
-                        follow_redirects=True
-                    )
-                print(f"Check resource {url} (attempt {attempt+1}/{max_retries}): Status {response.status_code}")
-                return response.status_code in (200, 206)
+                # 只请求前 100 字节并读完, 连接可以放回连接池复用
+                response = await self.get(
+                    url, headers=headers, timeout=10, follow_redirects=True
+                )
+                print(
+                    f"Check resource {url} (attempt {attempt+1}/{max_retries}): "
+                    f"Status {response.status_code}"
+                )
+                # 被限流或服务端出错时无法判断资源是否可用, 按请求失败重试
+                if not is_throttled_response(response):
+                    return response.status_code in (200, 206)
             except Exception as e:
-                print(f"Check resource failed {url} (attempt {attempt+1}/{max_retries}): {str(e)}")
-                # 如果不是最后一次尝试，等待后重试
-                if attempt < max_retries - 1:
-                    await asyncio.sleep(retry_delay)
+                print(
+                    f"Check resource failed {url} "
+                    f"(attempt {attempt+1}/{max_retries}): {str(e)}"
+                )
+            # 如果不是最后一次尝试，等待后重试
+            if attempt < max_retries - 1:
+                await asyncio.sleep(retry_delay)
         # 所有重试都失败
-        return False
-    
-    
+        return None
@@ -0,0 +1,74 @@
+import re
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+# 协议头与用户信息可选, 端口不属于 host
+_HOST_REG = re.compile(r"(?:(?:[a-zA-Z][\w+.-]*:)?//)?(?:[^@/?#]*@)?([^:/?#]*)")
+
+
+class _Node:
+    __slots__ = ("children", "value")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        self.value: Optional[Any] = None
+
+
+class HostRouter:
+    """
+    按域名后缀路由: 域名按 label 倒序存入字典树, 如 v.douyin.com -> com/douyin/v
+
+    注册的域名匹配该域名本身及其所有子域名, 多个域名都能匹配时取最长的一个;
+    只按完整 label 匹配, 6.cn 不会匹配 weibo6.cn
+    """
+
+    def __init__(self):
+        self._root: _Node = _Node()
+        self._domains: Dict[str, Any] = {}
+
+    def add(self, domain: str, value: Any) -> None:
+        domain = domain.lower().strip(".")
+        node = self._root
+        for label in reversed(domain.split(".")):
+            node = node.children.setdefault(label, _Node())
+        node.value = value
+        self._domains[domain] = value
+
+    def match_host(self, host: str) -> Optional[Any]:
+        """
+        根据 host 查找, 找不到时返回 None
+        :param host: 域名
+        :return:
+        """
+        # 完整域名直接命中
+        value = self._domains.get(host)
+        if value is not None:
+            return value
+
+        node = self._root
+        for label in reversed(host.split(".")):
+            node = node.children.get(label)
+            if node is None:
+                break
+            if node.value is not None:
+                value = node.value
+        return value
+
+    def match(self, url: str) -> Optional[Any]:
+        """
+        根据链接的 host 查找, 找不到时返回 None
+        :param url: 链接, 可以不带协议头
+        :return:
+        """
+        return self.match_host(get_host(url))
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        return iter(self._domains.items())
+
+
+def get_host(url: str) -> str:
+    """
+    获取链接中的 host, 统一转为小写
+    :param url: 链接, 可以不带协议头
+    :return:
+    """
+    return _HOST_REG.match(url.strip()).group(1).lower().rstrip(".")
@@ -1,9 +1,7 @@
-import fake_useragent
-import httpx
+from utils import fastjson, get_val_from_url_by_query_key
+from utils.tracing import trace_span
 
-from utils import get_val_from_url_by_query_key
-
-from .base import BaseParser, VideoAuthor, VideoInfo
+from .base import BaseParser, VideoAuthor, VideoInfo, VideoSource
 
 
 class SixRoom(BaseParser):
@@ -11,6 +9,8 @@ class SixRoom(BaseParser):
     六间房
     """
 
+    source = VideoSource.SixRoom
+
     async def parse_share_url(self, share_url: str) -> VideoInfo:
         if "watchMini.php?vid=" in share_url:
             video_id = get_val_from_url_by_query_key(share_url, "vid")
@@ -30,13 +30,13 @@ class SixRoom(BaseParser):
         )
         headers = {
             "Referer": f"https://m.6.cn/v/{video_id}",
-            "User-Agent": fake_useragent.UserAgent(os=["ios"]).random,
+            "User-Agent": self.get_user_agent("ios"),
         }
-        async with httpx.AsyncClient(follow_redirects=True) as client:
-            response = await client.get(req_url, headers=headers)
-            response.raise_for_status()
+        response = await self.get(req_url, headers=headers, follow_redirects=True)
+        response.raise_for_status()
 
-        json_data = response.json()
+        with trace_span("decode"):
+            json_data = fastjson.loads(response.content)
         data = json_data["content"]
 
         video_info = VideoInfo(
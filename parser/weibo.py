@@ -1,9 +1,7 @@
-import fake_useragent
-import httpx
+from utils import fastjson, get_val_from_url_by_query_key
+from utils.tracing import trace_span
 
-from utils import get_val_from_url_by_query_key
-
-from .base import BaseParser, VideoAuthor, VideoInfo
+from .base import BaseParser, VideoAuthor, VideoInfo, VideoSource
 
 
 class WeiBo(BaseParser):
@@ -11,6 +9,8 @@ class WeiBo(BaseParser):
     微博
     """
 
+    source = VideoSource.WeiBo
+
     async def parse_share_url(self, share_url: str) -> VideoInfo:
         if "show?fid=" in share_url:
             video_id = get_val_from_url_by_query_key(share_url, "fid")
@@ -27,14 +27,16 @@ class WeiBo(BaseParser):
         headers = {
             "Referer": f"https://h5.video.weibo.com/show/{video_id}",
             "Content-Type": "application/x-www-form-urlencoded",
-            "User-Agent": fake_useragent.UserAgent(os=["ios"]).random,
+            "User-Agent": self.get_user_agent("ios"),
         }
         post_content = 'data={"Component_Play_Playinfo":{"oid":"' + video_id + '"}}'
-        async with httpx.AsyncClient(follow_redirects=True) as client:
-            response = await client.post(req_url, headers=headers, content=post_content)
-            response.raise_for_status()
+        response = await self.post(
+            req_url, headers=headers, content=post_content, follow_redirects=True
+        )
+        response.raise_for_status()
 
-        json_data = response.json()
+        with trace_span("decode"):
+            json_data = fastjson.loads(response.content)
         data = json_data["data"]["Component_Play_Playinfo"]
 
         video_url = data["stream_url"]
@@ -1,8 +1,7 @@
-import httpx
+from utils import fastjson, get_val_from_url_by_query_key
+from utils.tracing import trace_span
 
-from utils import get_val_from_url_by_query_key
-
-from .base import BaseParser, VideoAuthor, VideoInfo
+from .base import BaseParser, VideoAuthor, VideoInfo, VideoSource
 
 
 class WeiShi(BaseParser):
@@ -10,6 +9,8 @@ class WeiShi(BaseParser):
     微视
     """
 
+    source = VideoSource.WeiShi
+
     async def parse_share_url(self, share_url: str) -> VideoInfo:
         video_id = get_val_from_url_by_query_key(share_url, "id")
         return await self.parse_video_id(video_id)
@@ -19,11 +20,11 @@ class WeiShi(BaseParser):
             "https://h5.weishi.qq.com/webapp/json/weishi/WSH5GetPlayPage"
             f"?feedid={video_id}"
         )
-        async with httpx.AsyncClient() as client:
-            response = await client.get(req_url, headers=self.get_default_headers())
-            response.raise_for_status()
+        response = await self.get(req_url, headers=self.get_default_headers())
+        response.raise_for_status()
 
-        json_data = response.json()
+        with trace_span("decode"):
+            json_data = fastjson.loads(response.content)
         # 接口返回错误
         if json_data["ret"] != 0:
             raise Exception(json_data["msg"])
@@ -1,10 +1,9 @@
-import json
-
-import fake_useragent
-import httpx
 from parsel import Selector
 
-from .base import BaseParser, VideoAuthor, VideoInfo
+from utils import fastjson
+from utils.tracing import trace_span
+
+from .base import BaseParser, VideoAuthor, VideoInfo, VideoSource
 
 
 class XinPianChang(BaseParser):
@@ -12,19 +11,22 @@ class XinPianChang(BaseParser):
     新片场
     """
 
+    source = VideoSource.XinPianChang
+
     async def parse_share_url(self, share_url: str) -> VideoInfo:
         headers = {
-            "User-Agent": fake_useragent.UserAgent(os=["windows"]).random,
+            "User-Agent": self.get_user_agent("windows"),
             "Upgrade-Insecure-Requests": "1",
             "Referer": "https://www.xinpianchang.com/",
         }
-        async with httpx.AsyncClient(follow_redirects=True) as client:
-            response = await client.get(share_url, headers=headers)
-            response.raise_for_status()
+        response = await self.get(share_url, headers=headers, follow_redirects=True)
+        response.raise_for_status()
 
-        sel = Selector(response.text)
+        with trace_span("extract"):
+            sel = Selector(response.text)
         json_text = sel.css("script#__NEXT_DATA__::text").get()
-        json_data = json.loads(json_text)
+        with trace_span("decode"):
+            json_data = fastjson.loads(json_text)
         data = json_data["props"]["pageProps"]["detail"]
 
         # 获取 appKey 和 media_id， 另外调用接口获取mp4视频地址
@@ -34,10 +36,12 @@ class XinPianChang(BaseParser):
             f"https://mod-api.xinpianchang.com/mod/api/v2/media/{media_id}"
             f"?appKey={app_key}&extend=userInfo%2CuserStatus"
         )
-        async with httpx.AsyncClient(follow_redirects=True) as client:
-            mp4_response = await client.get(req_mp4_url, headers=headers)
-            mp4_response.raise_for_status()
-        mp4_data = mp4_response.json()
+        mp4_response = await self.get(
+            req_mp4_url, headers=headers, follow_redirects=True
+        )
+        mp4_response.raise_for_status()
+        with trace_span("decode"):
+            mp4_data = fastjson.loads(mp4_response.content)
         video_url = mp4_data["data"]["resource"]["progressive"][0]["url"]
 
         video_info = VideoInfo(
@@ -1,8 +1,7 @@
-import httpx
+from utils import fastjson, get_val_from_url_by_query_key
+from utils.tracing import trace_span
 
-from utils import get_val_from_url_by_query_key
-
-from .base import BaseParser, VideoAuthor, VideoInfo
+from .base import BaseParser, VideoAuthor, VideoInfo, VideoSource
 
 
 class ZuiYou(BaseParser):
@@ -10,6 +9,8 @@ class ZuiYou(BaseParser):
     最右
     """
 
+    source = VideoSource.ZuiYou
+
     async def parse_share_url(self, share_url: str) -> VideoInfo:
         video_id = get_val_from_url_by_query_key(share_url, "pid")
         return await self.parse_video_id(video_id)
@@ -21,13 +22,16 @@ class ZuiYou(BaseParser):
             "h_av": "5.2.13.011",
             "pid": int_video_id,
         }
-        async with httpx.AsyncClient(follow_redirects=True) as client:
-            response = await client.post(
-                req_url, headers=self.get_default_headers(), json=post_data
-            )
-            response.raise_for_status()
+        response = await self.post(
+            req_url,
+            headers=self.get_default_headers(),
+            json=post_data,
+            follow_redirects=True,
+        )
+        response.raise_for_status()
 
-        json_data = response.json()
+        with trace_span("decode"):
+            json_data = fastjson.loads(response.content)
         data = json_data["data"]["post"]
         video_key = str(data["imgs"][0]["id"])
 
@@ -0,0 +1,65 @@
+import asyncio
+
+import httpx
+import pytest
+
+from utils.breaker import CircuitBreaker, mark_upstream_failure
+
+
+def status_error(status_code: int) -> httpx.HTTPStatusError:
+    request = httpx.Request("GET", "https://upstream.mock.test/")
+    response = httpx.Response(status_code, request=request)
+    return httpx.HTTPStatusError("error", request=request, response=response)
+
+
+async def fail_with(err: Exception, reason: str = "") -> None:
+    if reason:
+        mark_upstream_failure(reason)
+    raise err
+
+
+def call_times(breaker: CircuitBreaker, times: int, err: Exception, reason: str = ""):
+    async def run():
+        for _ in range(times):
+            with pytest.raises(type(err)):
+                await breaker.call(lambda: fail_with(err, reason))
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize(
+    "err",
+    [
+        Exception("parse fail: note id in response is undefined"),
+        Exception("failed to get location url from share url"),
+        KeyError("aweme_id"),
+        NotImplementedError("不支持"),
+        status_error(404),
+    ],
+)
+def test_input_errors_do_not_open(err):
+    # 用户发送的无效链接不能让该平台对所有人熔断
+    breaker = CircuitBreaker("test", failure_threshold=2)
+    call_times(breaker, 5, err)
+
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.consecutive_failures == 0
+
+
+@pytest.mark.parametrize(
+    "err, reason",
+    [
+        (httpx.ConnectError("connection refused"), ""),
+        (httpx.ReadTimeout("timeout"), ""),
+        (status_error(429), ""),
+        (status_error(503), ""),
+        # 上游返回验证码页面或缺少内嵌数据后, 解析器抛出的普通异常
+        (ValueError("parse video json info from html fail"), "302"),
+        (ValueError("parse video json info from html fail"), "embedded data missing"),
+    ],
+)
+def test_upstream_errors_open(err, reason):
+    breaker = CircuitBreaker("test", failure_threshold=2)
+    call_times(breaker, 2, err, reason)
+
+    assert breaker.state == CircuitBreaker.OPEN
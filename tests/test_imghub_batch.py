@@ -0,0 +1,145 @@
+import asyncio
+import sqlite3
+
+import httpx
+import pytest
+
+from utils import imghub
+from utils.http_client import http_client_registry
+from utils.media_index import MediaIndex, get_url_key
+
+
+@pytest.fixture(autouse=True)
+def mock_transfer(monkeypatch, tmp_path):
+    """返回收到的请求 (method, url) 列表, 文件内容只与链接路径有关"""
+    requests = []
+
+    def serve_media(request: httpx.Request) -> httpx.Response:
+        requests.append((request.method, str(request.url)))
+        if request.method == "POST":
+            request.read()
+            return httpx.Response(200, json=[{"src": f"/file/{len(requests)}"}])
+        return httpx.Response(200, content=request.url.path.encode() * 1000)
+
+    monkeypatch.setattr(imghub, "IMG_DOMAIN", "https://imghub.mock.test")
+    monkeypatch.setattr(imghub, "MEDIA_TMP_DIR", str(tmp_path))
+    monkeypatch.setattr(imghub, "MEDIA_UPLOAD_QUEUE_SIZE", 1)
+    monkeypatch.setattr(imghub, "MEDIA_ITEM_CONCURRENCY", 2)
+    monkeypatch.setattr(imghub, "media_index", MediaIndex(str(tmp_path / "idx.db")))
+    transport = httpx.MockTransport(serve_media)
+    for name in ("media", "imghub"):
+        http_client_registry.configure(name, transport=transport)
+    yield requests
+    for name in ("media", "imghub"):
+        http_client_registry.configure(name)
+
+
+async def transfer_urls(urls: list) -> list:
+    items = [(url, "img/test") for url in urls]
+    try:
+        return await asyncio.wait_for(imghub.batch_transfer_media(items), timeout=10)
+    finally:
+        await http_client_registry.aclose()
+
+
+async def transfer(count: int) -> list:
+    return await transfer_urls([f"https://cdn.mock.test/{i}.jpg" for i in range(count)])
+
+
+def test_skip_uploaded_url(mock_transfer):
+    url = "https://cdn.mock.test/{i}.jpg?id={i}&x-expires={ts}&sign={sign}"
+    first = asyncio.run(
+        transfer_urls([url.format(i=i, ts=1, sign="a") for i in range(3)])
+    )
+    mock_transfer.clear()
+    # 签名、过期时间参数不同, 仍是同一个链接
+    second = asyncio.run(
+        transfer_urls([url.format(i=i, ts=2, sign="b") for i in range(3)])
+    )
+
+    assert [r["skipped"] for r in first] == ["", "", ""]
+    assert [r["skipped"] for r in second] == ["url", "url", "url"]
+    assert all(r["success"] for r in second)
+    assert [r["src"] for r in second] == [r["src"] for r in first]
+    assert [r["hash"] for r in second] == [r["hash"] for r in first]
+    assert mock_transfer == []
+
+
+def test_skip_uploaded_content(mock_transfer):
+    first = asyncio.run(
+        transfer_urls([f"https://cdn.mock.test/{i}.jpg" for i in range(3)])
+    )
+    mock_transfer.clear()
+    # 其他源站上的相同文件: 需要下载计算哈希, 但不再上传
+    mirror_urls = [f"https://mirror.mock.test/{i}.jpg" for i in range(3)]
+    second = asyncio.run(transfer_urls(mirror_urls))
+
+    assert [r["skipped"] for r in second] == ["content", "content", "content"]
+    assert [r["src"] for r in second] == [r["src"] for r in first]
+    assert sorted(mock_transfer) == [("GET", url) for url in mirror_urls]
+
+    # 按内容命中时同时记录了链接, 再次转存时不再下载
+    mock_transfer.clear()
+    third = asyncio.run(transfer_urls(mirror_urls))
+    assert [r["skipped"] for r in third] == ["url", "url", "url"]
+    assert mock_transfer == []
+
+
+def test_image_format_query_is_part_of_url(mock_transfer):
+    asyncio.run(transfer_urls(["https://cdn.mock.test/0.jpg?imageView2/format/png"]))
+    mock_transfer.clear()
+    png, jpg = asyncio.run(
+        transfer_urls(
+            [
+                "https://cdn.mock.test/0.jpg?imageView2/format/png",
+                "https://cdn.mock.test/0.jpg?imageView2/format/jpg",
+            ]
+        )
+    )
+
+    assert png["skipped"] == "url"
+    # 格式参数不同的链接不按链接跳过, 需要下载
+    assert jpg["skipped"] == "content"
+    assert [method for method, _ in mock_transfer] == ["GET"]
+
+
+@pytest.mark.parametrize(
+    "url, key",
+    [
+        ("https://cdn.mock.test/a.mp4", "cdn.mock.test/a.mp4"),
+        (
+            "http://cdn.mock.test/a.mp4?x-expires=1&id=7&sign=s&Signature=t&ts=9",
+            "cdn.mock.test/a.mp4?id=7",
+        ),
+        ("https://cdn.mock.test/a.mp4?b=2&a=1", "cdn.mock.test/a.mp4?a=1&b=2"),
+        ("https://cdn.mock.test/a.mp4?expires=1&sign=s", "cdn.mock.test/a.mp4"),
+        (
+            "https://cdn.mock.test/a?imageView2/format/png",
+            "cdn.mock.test/a?imageView2/format/png",
+        ),
+    ],
+)
+def test_get_url_key(url, key):
+    assert get_url_key(url) == key
+
+
+def test_index_write_error_keeps_transfer(monkeypatch):
+    async def add(*args, **kwargs):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(imghub.media_index, "add", add)
+    results = asyncio.run(transfer(6))
+
+    assert all(result["success"] for result in results)
+    assert all("database is locked" in result["error"] for result in results)
+
+
+def test_uploader_error_does_not_hang(monkeypatch, tmp_path):
+    async def publish_media(result, staged, retries=3):
+        raise RuntimeError("uploader crashed")
+
+    monkeypatch.setattr(imghub, "publish_media", publish_media)
+    with pytest.raises(RuntimeError, match="uploader crashed"):
+        asyncio.run(transfer(6))
+    # 队列中和被取消的 worker 持有的临时文件都已删除
+    assert list(tmp_path.glob("imghub_*")) == []
@@ -0,0 +1,127 @@
+import asyncio
+import hashlib
+import re
+
+import httpx
+import pytest
+
+from utils import imghub
+from utils.http_client import http_client_registry
+from utils.ratelimit import rate_limiter_registry
+
+SEGMENT_SIZE = 64 * 1024
+CONTENT = bytes(range(256)) * (4 * SEGMENT_SIZE // 256 + 1)
+
+
+def serve_ranges(request: httpx.Request) -> httpx.Response:
+    match = re.fullmatch(r"bytes=(\d+)-(\d*)", request.headers.get("Range", ""))
+    if match is None:
+        return httpx.Response(200, content=CONTENT)
+    start = int(match[1])
+    end = int(match[2]) if match[2] else len(CONTENT) - 1
+    stop = end + 1
+    return httpx.Response(
+        206,
+        content=CONTENT[start:stop],
+        headers={
+            "Content-Range": f"bytes {start}-{end}/{len(CONTENT)}",
+            "ETag": '"v1"',
+        },
+    )
+
+
+@pytest.fixture(autouse=True)
+def segmented(monkeypatch, tmp_path):
+    monkeypatch.setattr(imghub, "MEDIA_SEGMENTS", 4)
+    monkeypatch.setattr(imghub, "MEDIA_SEGMENT_MIN_SIZE", SEGMENT_SIZE)
+    monkeypatch.setattr(imghub, "MEDIA_TMP_DIR", str(tmp_path))
+    http_client_registry.configure("media", transport=httpx.MockTransport(serve_ranges))
+    yield
+    http_client_registry.configure("media")
+
+
+async def download_all(host: str, limit: int, downloads: int) -> list:
+    limiter = rate_limiter_registry.get(imghub.MEDIA_PLATFORM, host)
+    limiter.limit = limiter.min_concurrency = limiter.max_concurrency = limit
+    try:
+        results = await asyncio.wait_for(
+            asyncio.gather(
+                *(
+                    imghub.download_media(f"https://{host}/video/{i}.mp4")
+                    for i in range(downloads)
+                )
+            ),
+            timeout=10,
+        )
+    finally:
+        await http_client_registry.aclose()
+    return [staged for staged, _ in results]
+
+
+@pytest.mark.parametrize("limit, downloads", [(1, 1), (1, 3), (4, 4), (4, 8)])
+def test_segmented_download_does_not_deadlock(limit, downloads):
+    # 首个请求持有名额时不能等待其他分段的名额, 名额为 1 时各段依次下载
+    host = f"cdn-{limit}-{downloads}.mock.test"
+    staged_files = asyncio.run(download_all(host, limit, downloads))
+
+    assert len(staged_files) == downloads
+    for staged in staged_files:
+        assert staged.size == len(CONTENT)
+        assert staged.content_hash == hashlib.sha256(CONTENT).hexdigest()
+    limiter = rate_limiter_registry.get(imghub.MEDIA_PLATFORM, host)
+    assert limiter.in_flight == 0
+
+
+class DroppedStream(httpx.AsyncByteStream):
+    """发送 sent 字节后断开连接"""
+
+    def __init__(self, content: bytes, sent: int):
+        self.content = content
+        self.sent = sent
+
+    async def __aiter__(self):
+        yield self.content[: self.sent]
+        raise httpx.ReadError("connection reset")
+
+
+def test_resume_requests_only_unfinished_range(monkeypatch):
+    monkeypatch.setattr(imghub, "MEDIA_CHUNK_SIZE", 1024)
+    sent = 4096
+    ranges = []
+    dropped = []
+
+    def drop_one_segment(request: httpx.Request) -> httpx.Response:
+        response = serve_ranges(request)
+        ranges.append(request.headers["Range"])
+        if request.headers["Range"] != "bytes=0-" and not dropped:
+            dropped.append(request.headers["Range"])
+            return httpx.Response(
+                response.status_code,
+                headers=response.headers,
+                stream=DroppedStream(response.content, sent),
+            )
+        return response
+
+    http_client_registry.configure(
+        "media", transport=httpx.MockTransport(drop_one_segment)
+    )
+    host = "cdn-resume.mock.test"
+
+    async def download():
+        try:
+            return await imghub.download_media(f"https://{host}/video/resume.mp4")
+        finally:
+            await http_client_registry.aclose()
+
+    staged, attempts = asyncio.run(download())
+
+    assert attempts == 2
+    assert staged.size == len(CONTENT)
+    assert staged.content_hash == hashlib.sha256(CONTENT).hexdigest()
+    with open(staged.path, "rb") as f:
+        assert f.read() == CONTENT
+    asyncio.run(staged.remove())
+    # 首个请求和 4 个分段中的 3 个, 重试时只请求断开的分段中未下载的部分
+    start, end = map(int, re.fullmatch(r"bytes=(\d+)-(\d+)", dropped[0]).groups())
+    assert len(ranges) == 5
+    assert ranges[-1] == f"bytes={start + sent}-{end}"
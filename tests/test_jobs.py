@@ -0,0 +1,136 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from utils import jobs
+from utils.http_client import http_client_registry
+from utils.jobs import FAILED, SUCCEEDED, JobFailed, JobManager, JobStore
+
+
+class Progress:
+    def to_dict(self) -> dict:
+        return {"done": 1}
+
+
+async def transfer(params: dict, progress: Progress) -> dict:
+    result = {"failed": params["failed"]}
+    if params["failed"]:
+        raise JobFailed("1/1 个文件转存失败", result)
+    return result
+
+
+async def wait_job(manager: JobManager, job_id: str) -> dict:
+    while True:
+        job = await manager.get(job_id)
+        if job["status"] in (SUCCEEDED, FAILED):
+            return job
+        await asyncio.sleep(0.01)
+
+
+async def run_jobs(*params: dict) -> list:
+    manager = JobManager(JobStore(":memory:"), workers=1)
+    manager.register("transfer", transfer, Progress)
+    await manager.start()
+    try:
+        jobs = [await manager.submit("transfer", p) for p in params]
+        return [await wait_job(manager, job["id"]) for job in jobs]
+    finally:
+        await manager.stop()
+
+
+def test_job_status_follows_handler_result():
+    ok, failed = asyncio.run(run_jobs({"failed": 0}, {"failed": 1}))
+
+    assert ok["status"] == SUCCEEDED
+    assert ok["result"] == {"failed": 0}
+    assert failed["status"] == FAILED
+    assert failed["error"] == "1/1 个文件转存失败"
+    # 失败的任务同样保存结果, 便于查看哪些文件失败
+    assert failed["result"] == {"failed": 1}
+    assert failed["progress"] == {"done": 1}
+
+
+@pytest.mark.parametrize(
+    "callback, allowed",
+    [
+        ("", True),
+        ("https://hooks.example.com/done", True),
+        ("http://hooks.example.com:8080/done", True),
+        ("http://169.254.169.254/latest/meta-data/", False),
+        ("http://127.0.0.1:8000/hook", False),
+        ("https://hooks.example.com.evil.test/done", False),
+        ("file:///etc/passwd", False),
+    ],
+)
+def test_check_callback(monkeypatch, callback, allowed):
+    monkeypatch.setattr(jobs, "JOB_WEBHOOK_ALLOWED_HOSTS", {"hooks.example.com"})
+    if allowed:
+        jobs.check_callback(callback)
+    else:
+        with pytest.raises(jobs.CallbackNotAllowed):
+            jobs.check_callback(callback)
+
+
+def test_unwritable_store_disables_jobs(tmp_path):
+    # 父路径是文件, 无法创建任务文件所在的目录
+    (tmp_path / "readonly").write_text("")
+    manager = JobManager(JobStore(str(tmp_path / "readonly" / "jobs.db")))
+
+    async def start_and_stop():
+        await manager.start()
+        enabled = manager.enabled
+        await manager.stop()
+        return enabled
+
+    assert asyncio.run(start_and_stop()) is False
+
+
+@pytest.mark.parametrize("release", [True, False])
+def test_callback_does_not_block_worker(monkeypatch, release):
+    monkeypatch.setattr(jobs, "JOB_WEBHOOK_ALLOWED_HOSTS", {"hooks.mock.test"})
+    monkeypatch.setattr(jobs, "JOB_WEBHOOK_TIMEOUT", 0.1)
+    payloads = []
+
+    async def run():
+        # 回调地址不响应, 直到 released
+        released = asyncio.Event()
+
+        async def hook(request: httpx.Request) -> httpx.Response:
+            payloads.append(json.loads(request.content))
+            await released.wait()
+            return httpx.Response(200)
+
+        http_client_registry.configure("webhook", transport=httpx.MockTransport(hook))
+        manager = JobManager(JobStore(":memory:"), workers=1)
+        manager.register("transfer", transfer, Progress)
+        await manager.start()
+        try:
+            submitted = [
+                await manager.submit(
+                    "transfer", {"failed": 0}, callback="https://hooks.mock.test/"
+                )
+                for _ in range(2)
+            ]
+            assert all("callback" not in job for job in submitted)
+            # 只有一个 worker, 第一个任务的回调未结束时第二个任务也能执行
+            done = await asyncio.wait_for(
+                asyncio.gather(*(wait_job(manager, job["id"]) for job in submitted)),
+                timeout=5,
+            )
+            assert [job["status"] for job in done] == [SUCCEEDED, SUCCEEDED]
+            await asyncio.sleep(0.01)
+            if release:
+                released.set()
+        finally:
+            # 未结束的回调最多等待 JOB_WEBHOOK_TIMEOUT
+            await asyncio.wait_for(manager.stop(), timeout=5)
+            await http_client_registry.aclose()
+            http_client_registry.configure("webhook")
+
+    asyncio.run(run())
+
+    # 两个任务各回调一次
+    assert len({p["id"] for p in payloads}) == 2
+    assert all(p["status"] == SUCCEEDED and "callback" not in p for p in payloads)
@@ -0,0 +1,65 @@
+import json
+
+import pytest
+
+from parser.redbook import RedBook
+from utils import jsobject
+
+
+def test_js_only_values_become_null():
+    text = '{"a":undefined,"b":[NaN,-Infinity,1],"c":"undefined NaN","d":"x"}'
+
+    assert jsobject.loads(text) == {
+        "a": None,
+        "b": [None, None, 1],
+        # 字符串中的同名文本不替换
+        "c": "undefined NaN",
+        "d": "x",
+    }
+
+
+def test_identifiers_containing_js_only_values_are_kept():
+    assert jsobject.to_json('{"a":undefinedValue}') == '{"a":undefinedValue}'
+
+
+def test_extract_value_skips_brackets_inside_strings():
+    text = '{"a":{"desc":"}]{[ \\"}\\" ","list":[1,{"b":"]"}]},"c":2}'
+
+    assert jsobject.extract_value(text, "a") == (
+        '{"desc":"}]{[ \\"}\\" ","list":[1,{"b":"]"}]}'
+    )
+    assert jsobject.loads_value(text, "list") == [1, {"b": "]"}]
+    assert jsobject.loads_value(text, "c") == 2
+
+
+def test_loads_value_missing_key():
+    with pytest.raises(KeyError):
+        jsobject.loads_value('{"a":1}', "b")
+
+
+def build_state(desc: str) -> str:
+    note_detail_map = {"n2": {"note": {"noteId": "n2", "desc": desc}}}
+    state = {
+        # state 其他部分中的同名键出现在 note 之前
+        "feed": {"currentNoteId": "n1", "noteDetailMap": {"n1": {}}},
+        "note": {
+            "noteDetailMap": note_detail_map,
+            "currentNoteId": "n2",
+            "cursor": None,
+        },
+    }
+    text = json.dumps(state, separators=(",", ":"))
+    return text.replace('"cursor":null', '"cursor":undefined')
+
+
+@pytest.mark.parametrize("partial_state_decode", [True, False])
+@pytest.mark.parametrize(
+    "desc", ["普通描述", '"currentNoteId":"n1"', "}]} 未闭合的括号 {["]
+)
+def test_load_note_state_reads_note_object(monkeypatch, partial_state_decode, desc):
+    monkeypatch.setattr(RedBook, "partial_state_decode", partial_state_decode)
+
+    note_id, note_detail_map = RedBook().load_note_state(build_state(desc))
+
+    assert note_id == "n2"
+    assert note_detail_map["n2"]["note"]["desc"] == desc
@@ -0,0 +1,40 @@
+import pytest
+
+from parser import (
+    VideoSource,
+    get_video_source,
+    source_router,
+    video_source_info_mapping,
+)
+
+
+def build_cases():
+    cases = []
+    for source, source_info in video_source_info_mapping.items():
+        for domain in source_info["domain_list"]:
+            cases += [
+                (f"https://{domain}/share/abc?a=1&b=2", source),
+                (f"http://{domain.upper()}:8080/share/abc", source),
+                (f"https://m.{domain}/share/abc", source),
+                (f"{domain}/share/abc", source),
+                (f"https://not{domain}/share/abc", None),
+                (f"https://{domain}.example.com/share/abc", None),
+            ]
+    # 子串匹配时容易误判的链接
+    cases += [
+        ("https://m.weibo.cn/status/123", VideoSource.LvZhou),
+        ("https://video.weibo.com/show?fid=123", VideoSource.WeiBo),
+        ("https://v.weibo6.cn/abc", None),
+        ("https://example.com/?url=https://v.douyin.com/abc", None),
+    ]
+    return cases
+
+
+@pytest.mark.parametrize("url, expected", build_cases())
+def test_route(url, expected):
+    assert source_router.match(url) == expected
+    if expected is None:
+        with pytest.raises(ValueError):
+            get_video_source(url)
+    else:
+        assert get_video_source(url) == expected
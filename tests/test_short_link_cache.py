@@ -0,0 +1,66 @@
+import asyncio
+
+import httpx
+import pytest
+
+from parser.base import BaseParser, short_link_cache
+from utils.http_client import http_client_registry
+
+SHARE_URL = "https://v.mock.test/abc/"
+LOCATION = "https://www.mock.test/photo/123"
+
+
+class MockParser(BaseParser):
+    async def parse_share_url(self, share_url: str):
+        raise NotImplementedError
+
+    async def parse_video_id(self, video_id: str):
+        raise NotImplementedError
+
+
+@pytest.fixture
+def short_link_requests():
+    requests = []
+
+    def redirect(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(
+            302,
+            headers={"Location": LOCATION, "Set-Cookie": f"did=session{len(requests)}"},
+        )
+
+    short_link_cache.clear()
+    http_client_registry.configure("default", transport=httpx.MockTransport(redirect))
+    yield requests
+    http_client_registry.configure("default")
+    short_link_cache.clear()
+
+
+async def resolve_twice(with_session: bool) -> list:
+    try:
+        return [
+            await MockParser().resolve_redirect(
+                SHARE_URL, {}, with_session=with_session
+            )
+            for _ in range(2)
+        ]
+    finally:
+        await http_client_registry.aclose()
+
+
+def test_only_location_is_cached(short_link_requests):
+    first, second = asyncio.run(resolve_twice(with_session=False))
+
+    assert len(short_link_requests) == 1
+    assert first == second == {"location": LOCATION, "headers": [], "cookies": {}}
+    assert short_link_cache.get(SHARE_URL) == LOCATION
+
+
+def test_session_is_fetched_per_call(short_link_requests):
+    # 会话 cookie 不缓存, 不同用户不会复用同一个会话
+    first, second = asyncio.run(resolve_twice(with_session=True))
+
+    assert len(short_link_requests) == 2
+    assert first["cookies"] == {"did": "session1"}
+    assert second["cookies"] == {"did": "session2"}
+    assert second["location"] == LOCATION
@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+
+from utils.singleflight import SingleFlight
+
+
+class Upstream:
+    """记录调用次数, 等待 release 后返回第几次调用"""
+
+    def __init__(self):
+        self.calls = 0
+        self.cancelled = 0
+        self.release = asyncio.Event()
+
+    async def fetch(self) -> int:
+        self.calls += 1
+        call = self.calls
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            # 取消时的清理还需要等待一次, 任务不会立即结束
+            self.cancelled += 1
+            await asyncio.sleep(0)
+            raise
+        return call
+
+
+async def settle() -> None:
+    # 让等待者都进入 SingleFlight.do
+    for _ in range(3):
+        await asyncio.sleep(0)
+
+
+def test_cancelled_waiter_does_not_affect_others():
+    async def run():
+        flight, upstream = SingleFlight(), Upstream()
+        waiters = [
+            asyncio.ensure_future(flight.do("key", upstream.fetch)) for _ in range(3)
+        ]
+        await settle()
+        waiters[0].cancel()
+        await asyncio.sleep(0)
+        upstream.release.set()
+
+        with pytest.raises(asyncio.CancelledError):
+            await waiters[0]
+        assert await asyncio.gather(*waiters[1:]) == [1, 1]
+        assert upstream.calls == 1
+        assert upstream.cancelled == 0
+        assert len(flight) == 0
+
+    asyncio.run(run())
+
+
+def test_all_waiters_cancelled_cancels_task():
+    async def run():
+        flight, upstream = SingleFlight(), Upstream()
+        waiters = [
+            asyncio.ensure_future(flight.do("key", upstream.fetch)) for _ in range(2)
+        ]
+        await settle()
+        for waiter in waiters:
+            waiter.cancel()
+        results = await asyncio.gather(*waiters, return_exceptions=True)
+
+        assert all(isinstance(r, asyncio.CancelledError) for r in results)
+        await asyncio.sleep(0.01)
+        assert upstream.cancelled == 1
+        assert len(flight) == 0
+
+    asyncio.run(run())
+
+
+def test_join_after_cancellation_starts_new_call():
+    async def run():
+        flight, upstream = SingleFlight(), Upstream()
+        waiter = asyncio.ensure_future(flight.do("key", upstream.fetch))
+        await settle()
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+
+        # 第一次调用的任务还在处理取消, 新的调用方不应等待它
+        joined = asyncio.ensure_future(flight.do("key", upstream.fetch))
+        await settle()
+        upstream.release.set()
+
+        assert await joined == 2
+        assert upstream.calls == 2
+        assert upstream.cancelled == 1
+
+    asyncio.run(run())
@@ -1,3 +1,4 @@
+from typing import Optional
 from urllib.parse import parse_qs, urlparse
 
 
@@ -20,3 +21,41 @@ def get_val_from_url_by_query_key(url: str, query_key: str) -> str:
         raise ValueError(f"url中query参数值长度为0: {query_key}")
 
     return url_query[query_key][0]
+
+
+# url 中表示过期时间(unix 时间戳)的 query 参数
+_EXPIRE_QUERY_KEYS = ("x-expires", "x-oss-expires", "expires", "expire", "deadline")
+
+
+def get_url_expire_time(url: str) -> Optional[int]:
+    """
+    从 CDN 签名 url 中解析过期时间
+    - 抖音/快手等: x-expires, expires 等参数, 10 位或 13 位时间戳
+    - 小红书: sign + t 参数, t 为 16 进制时间戳
+    :param url: url地址
+    :return: 过期时间的 unix 时间戳, 无法解析时返回 None
+    """
+    url_query = parse_qs(urlparse(url).query)
+
+    for query_key in _EXPIRE_QUERY_KEYS:
+        query_val = url_query.get(query_key, [""])[0]
+        if query_val.isdigit():
+            return _normalize_timestamp(int(query_val))
+
+    if "sign" in url_query and "t" in url_query:
+        try:
+            return _normalize_timestamp(int(url_query["t"][0], 16))
+        except ValueError:
+            return None
+
+    return None
+
+
+def _normalize_timestamp(timestamp: int) -> Optional[int]:
+    # 13 位毫秒时间戳转为秒
+    if timestamp > 10**12:
+        timestamp //= 1000
+    # 不像时间戳的值(如有效时长)忽略
+    if not 10**9 < timestamp < 10**10:
+        return None
+    return timestamp
@@ -0,0 +1,212 @@
+import asyncio
+import os
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, List, Optional
+
+import httpx
+
+# 连续失败多少次后熔断
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+# 最近 CIRCUIT_WINDOW_SIZE 次调用中超时比例达到该值后熔断
+CIRCUIT_TIMEOUT_RATE_THRESHOLD = float(
+    os.getenv("CIRCUIT_TIMEOUT_RATE_THRESHOLD", "0.5")
+)
+CIRCUIT_WINDOW_SIZE = int(os.getenv("CIRCUIT_WINDOW_SIZE", "20"))
+# 统计超时比例所需的最少调用次数
+CIRCUIT_MIN_CALLS = int(os.getenv("CIRCUIT_MIN_CALLS", "10"))
+# 熔断持续时间(秒), 之后进入半开状态放行探测请求
+CIRCUIT_OPEN_SECONDS = float(os.getenv("CIRCUIT_OPEN_SECONDS", "30"))
+# 半开状态下同时放行的探测请求数
+CIRCUIT_HALF_OPEN_MAX_CALLS = int(os.getenv("CIRCUIT_HALF_OPEN_MAX_CALLS", "1"))
+
+
+class CircuitOpenError(Exception):
+    """
+    熔断中, 请求被直接拒绝
+    """
+
+
+# 当前熔断器调用中观察到的上游异常, 不在熔断器调用中时为 None
+_upstream_failures: ContextVar[Optional[List[str]]] = ContextVar(
+    "upstream_failures", default=None
+)
+
+
+def mark_upstream_failure(reason: str) -> None:
+    """
+    标记当前调用遇到了上游异常(限流、5xx、验证码、页面缺少内嵌数据),
+    调用失败时才计入熔断; 用户输入导致的失败(如链接失效、id 错误)不计入
+    :param reason: 原因, 如响应状态码
+    :return:
+    """
+    failures = _upstream_failures.get()
+    if failures is not None:
+        failures.append(reason)
+
+
+def is_upstream_failure(err: Exception, failures: List[str]) -> bool:
+    """
+    失败是否由上游引起: 网络错误、超时、429/5xx, 或调用中标记过上游异常
+    """
+    if failures or isinstance(err, (httpx.TransportError, asyncio.TimeoutError)):
+        return True
+    if isinstance(err, httpx.HTTPStatusError):
+        status_code = err.response.status_code
+        return status_code == 429 or status_code >= 500
+    return False
+
+
+class CircuitBreaker:
+    """
+    熔断器: 上游持续失败时快速失败, 不再等待网络超时
+
+    - closed: 正常放行, 连续失败次数或超时比例超过阈值时进入 open
+    - open: 直接拒绝, 持续 open_seconds 后进入 half_open
+    - half_open: 放行少量探测请求, 成功则恢复 closed, 失败则重新 open
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+        timeout_rate_threshold: float = CIRCUIT_TIMEOUT_RATE_THRESHOLD,
+        window_size: int = CIRCUIT_WINDOW_SIZE,
+        min_calls: int = CIRCUIT_MIN_CALLS,
+        open_seconds: float = CIRCUIT_OPEN_SECONDS,
+        half_open_max_calls: int = CIRCUIT_HALF_OPEN_MAX_CALLS,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.timeout_rate_threshold = timeout_rate_threshold
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = half_open_max_calls
+
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_count = 0
+        self.rejected_count = 0
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+        # 最近调用是否超时
+        self._recent_timeouts: Deque[bool] = deque(maxlen=window_size)
+
+    def _before_call(self) -> None:
+        if self.state == self.OPEN:
+            if time.monotonic() - self._opened_at < self.open_seconds:
+                self.rejected_count += 1
+                raise CircuitOpenError(
+                    f"{self.name} circuit is open, upstream is failing"
+                )
+            self.state = self.HALF_OPEN
+            self._half_open_calls = 0
+
+        if self.state == self.HALF_OPEN:
+            if self._half_open_calls >= self.half_open_max_calls:
+                self.rejected_count += 1
+                raise CircuitOpenError(
+                    f"{self.name} circuit is half open, waiting for probe result"
+                )
+            self._half_open_calls += 1
+
+    def _open(self) -> None:
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+        self.opened_count += 1
+
+    def on_success(self) -> None:
+        self.consecutive_failures = 0
+        self._recent_timeouts.append(False)
+        if self.state == self.HALF_OPEN:
+            self.state = self.CLOSED
+            self._recent_timeouts.clear()
+
+    def on_failure(self, is_timeout: bool = False) -> None:
+        self.consecutive_failures += 1
+        self._recent_timeouts.append(is_timeout)
+
+        if self.state == self.HALF_OPEN:
+            self._open()
+            return
+
+        if self.state == self.CLOSED and (
+            self.consecutive_failures >= self.failure_threshold
+            or self.timeout_rate >= self.timeout_rate_threshold
+        ):
+            self._open()
+
+    @property
+    def timeout_rate(self) -> float:
+        if len(self._recent_timeouts) < self.min_calls:
+            return 0.0
+        return sum(self._recent_timeouts) / len(self._recent_timeouts)
+
+    async def call(self, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        通过熔断器执行 fn
+        :param fn: 返回协程的函数
+        :return: fn 的返回值
+        """
+        self._before_call()
+        failures: List[str] = []
+        token = _upstream_failures.set(failures)
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            self._release_probe()
+            raise
+        except Exception as err:
+            self._release_probe()
+            # 输入或数据格式导致的失败(包括不支持的操作)与上游状态无关, 不计入熔断
+            if is_upstream_failure(err, failures):
+                self.on_failure(
+                    is_timeout=isinstance(
+                        err, (httpx.TimeoutException, asyncio.TimeoutError)
+                    )
+                )
+            raise
+        finally:
+            _upstream_failures.reset(token)
+        self._release_probe()
+        self.on_success()
+        return result
+
+    def _release_probe(self) -> None:
+        if self.state == self.HALF_OPEN and self._half_open_calls > 0:
+            self._half_open_calls -= 1
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "timeout_rate": round(self.timeout_rate, 2),
+            "opened_count": self.opened_count,
+            "rejected_count": self.rejected_count,
+        }
+
+
+class CircuitBreakerRegistry:
+    """
+    按名称(视频来源)维护熔断器
+    """
+
+    def __init__(self):
+        self._breakers: Dict[Hashable, CircuitBreaker] = {}
+
+    def get(self, name: str) -> CircuitBreaker:
+        breaker = self._breakers.get(name)
+        if breaker is None:
+            breaker = self._breakers[name] = CircuitBreaker(name)
+        return breaker
+
+    def stats(self) -> Dict[str, dict]:
+        return {name: breaker.stats() for name, breaker in self._breakers.items()}
+
+
+circuit_breaker_registry = CircuitBreakerRegistry()
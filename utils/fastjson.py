@@ -0,0 +1,71 @@
+"""
+json 编解码: 优先使用 orjson, 其次 msgspec, 都未安装时使用标准库 json
+"""
+
+import dataclasses
+import json
+from enum import Enum
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+if orjson is not None:
+    JSON_BACKEND = "orjson"
+elif msgspec is not None:
+    JSON_BACKEND = "msgspec"
+else:
+    JSON_BACKEND = "json"
+
+
+def _default(obj: Any) -> Any:
+    # 解析结果模型(VideoInfo 等)自带 to_dict, 直接转换
+    to_dict = getattr(obj, "to_dict", None)
+    if to_dict is not None:
+        return to_dict()
+    # 其他 dataclass 按字段浅转换为 dict, 嵌套字段交给编码器递归处理
+    if dataclasses.is_dataclass(obj):
+        return {
+            field.name: getattr(obj, field.name) for field in dataclasses.fields(obj)
+        }
+    if isinstance(obj, Enum):
+        return obj.value
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def loads(data: Union[str, bytes, bytearray]) -> Any:
+    """
+    解析 json 字符串
+    :param data: json 字符串或字节
+    :return:
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    if msgspec is not None:
+        return msgspec.json.decode(data)
+    return json.loads(data)
+
+
+def dumps(obj: Any) -> bytes:
+    """
+    序列化为 utf-8 编码的 json 字节, 支持 dataclass 与 Enum
+    :param obj: 待序列化对象
+    :return:
+    """
+    if orjson is not None:
+        # orjson 逐个 getattr 编码 slots dataclass 较慢, 交给 _default 转换
+        return orjson.dumps(
+            obj, option=orjson.OPT_PASSTHROUGH_DATACLASS, default=_default
+        )
+    if msgspec is not None:
+        return msgspec.json.encode(obj, enc_hook=_default)
+    return json.dumps(
+        obj, ensure_ascii=False, separators=(",", ":"), default=_default
+    ).encode("utf-8")
@@ -0,0 +1,159 @@
+import asyncio
+import os
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+from typing import Dict, Tuple
+
+import httpx
+
+# 连接池配置, 可通过环境变量调整
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+# 开启 HTTP/2 需要额外安装 h2: pip install httpx[http2]
+HTTP_ENABLE_HTTP2 = os.getenv("HTTP_ENABLE_HTTP2", "").lower() in ("1", "true", "yes")
+# 压测用: 所有上游请求改发到该地址(如本地模拟服务 http://127.0.0.1:9000),
+# 原始 host 通过 X-Upstream-Host 请求头传递
+HTTP_UPSTREAM_OVERRIDE = os.getenv("HTTP_UPSTREAM_OVERRIDE", "")
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class UpstreamOverrideTransport(httpx.AsyncBaseTransport):
+    """
+    把请求改发到固定地址, 保留原始的路径和参数, 原始 host 放在 X-Upstream-Host 中
+    """
+
+    def __init__(self, upstream: str, transport: httpx.AsyncBaseTransport):
+        self.upstream = httpx.URL(upstream)
+        self.transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        url = request.url.copy_with(
+            scheme=self.upstream.scheme,
+            host=self.upstream.host,
+            port=self.upstream.port,
+        )
+        headers = request.headers.copy()
+        headers["Host"] = url.netloc.decode("ascii")
+        headers["X-Upstream-Host"] = request.url.host
+        upstream_request = httpx.Request(
+            request.method,
+            url,
+            headers=headers,
+            stream=request.stream,
+            extensions=request.extensions,
+        )
+        return await self.transport.handle_async_request(upstream_request)
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+class HttpClientRegistry:
+    """
+    进程级共享的 httpx.AsyncClient 注册表
+
+    - 同名 client 在同一事件循环内复用, httpx 连接池按 host 维持 keep-alive 连接
+    - client 不保存响应中的 cookie, 避免不同请求之间互相串 cookie
+    - 事件循环变化时(如多次 asyncio.run)会重新创建 client
+    """
+
+    def __init__(self):
+        self._clients: Dict[
+            str, Tuple[httpx.AsyncClient, asyncio.AbstractEventLoop]
+        ] = {}
+        self._client_kwargs: Dict[str, dict] = {}
+
+    def configure(self, name: str = "default", **kwargs) -> None:
+        """
+        为指定名称的 client 设置额外的创建参数, 需在 client 创建前调用
+        :param name: client 名称
+        :param kwargs: 透传给 httpx.AsyncClient 的参数
+        :return:
+        """
+        self._client_kwargs[name] = kwargs
+
+    def get_client(self, name: str = "default") -> httpx.AsyncClient:
+        """
+        获取指定名称的共享 client, 不存在时创建
+        :param name: client 名称
+        :return:
+        """
+        loop = asyncio.get_running_loop()
+        if name in self._clients:
+            client, client_loop = self._clients[name]
+            if client_loop is loop and not client.is_closed:
+                return client
+
+        client = self._create_client(name)
+        self._clients[name] = (client, loop)
+        return client
+
+    def _create_client(self, name: str) -> httpx.AsyncClient:
+        kwargs = {
+            "limits": httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+            ),
+            "http2": HTTP_ENABLE_HTTP2 and _http2_available(),
+            # allowed_domains 为空列表时, 任何响应 cookie 都不会写入共享 client
+            "cookies": CookieJar(policy=DefaultCookiePolicy(allowed_domains=[])),
+        }
+        kwargs.update(self._client_kwargs.get(name, {}))
+        if HTTP_UPSTREAM_OVERRIDE and "transport" not in kwargs:
+            # 指定 transport 后 client 的 limits/http2 参数不再生效, 需要传给 transport
+            kwargs["transport"] = UpstreamOverrideTransport(
+                HTTP_UPSTREAM_OVERRIDE,
+                httpx.AsyncHTTPTransport(
+                    limits=kwargs["limits"], http2=kwargs["http2"]
+                ),
+            )
+        return httpx.AsyncClient(**kwargs)
+
+    def stats(self) -> Dict[str, dict]:
+        """
+        各 client 连接池状态: 连接数、空闲连接数、等待连接的请求数
+        """
+        result = {}
+        for name, (client, _) in self._clients.items():
+            transport = client._transport
+            if isinstance(transport, UpstreamOverrideTransport):
+                transport = transport.transport
+            pool = getattr(transport, "_pool", None)
+            if pool is None:
+                continue
+            connections = pool.connections
+            result[name] = {
+                "connections": len(connections),
+                "idle_connections": sum(1 for i in connections if i.is_idle()),
+                "pending_requests": len(getattr(pool, "_requests", ())),
+            }
+        return result
+
+    async def aclose(self) -> None:
+        """
+        关闭所有 client, 应用退出时调用
+        :return:
+        """
+        clients, self._clients = self._clients, {}
+        for client, _ in clients.values():
+            await client.aclose()
+
+
+http_client_registry = HttpClientRegistry()
+
+
+def get_http_client(name: str = "default") -> httpx.AsyncClient:
+    """
+    获取进程级共享的 httpx.AsyncClient
+    :param name: client 名称
+    :return:
+    """
+    return http_client_registry.get_client(name)
@@ -1,139 +1,701 @@
 import os
 import re
+import time
 import asyncio
+import hashlib
+import tempfile
 import httpx
 import mimetypes
-import json
+from contextvars import ContextVar
 from pathlib import Path
 from urllib.parse import urlparse, unquote
 
+from utils.http_client import get_http_client
+from utils.media_index import media_index
+from utils.metrics import record_upstream_request
+from utils.ratelimit import is_throttled_response, rate_limiter_registry
+from utils.singleflight import SingleFlight
+
 IMG_DOMAIN = os.getenv("IMG_DOMAIN")
 UPLOAD_TOKEN = os.getenv("UPLOAD_TOKEN")
-# 新增：控制并发数，避免请求过多被限制
-CONCURRENT_LIMIT = 5  # 可根据实际情况调整
+# 单个请求(一个图集)最多同时传输的文件数, 避免大图集占满全局并发名额
+MEDIA_ITEM_CONCURRENCY = int(os.getenv("MEDIA_ITEM_CONCURRENCY", "8"))
+# 下载、上传时每次读写的块大小
+MEDIA_CHUNK_SIZE = int(os.getenv("MEDIA_CHUNK_SIZE", str(64 * 1024)))
+# 分段下载: 源站支持 Range 且文件不小于 MEDIA_SEGMENT_MIN_SIZE 时, 分成最多 MEDIA_SEGMENTS 段并发下载,
+# 每段不小于 MEDIA_SEGMENT_MIN_SIZE, 重试时只续传未完成的段; MEDIA_SEGMENTS 为 1 时不分段
+MEDIA_SEGMENTS = int(os.getenv("MEDIA_SEGMENTS", "4"))
+MEDIA_SEGMENT_MIN_SIZE = int(os.getenv("MEDIA_SEGMENT_MIN_SIZE", str(4 * 1024 * 1024)))
+# 下载的临时文件目录, 默认使用系统临时目录
+MEDIA_TMP_DIR = os.getenv("MEDIA_TMP_DIR") or None
+# 已下载、等待上传的文件数上限, 达到上限时暂停下载
+MEDIA_UPLOAD_QUEUE_SIZE = int(os.getenv("MEDIA_UPLOAD_QUEUE_SIZE", "4"))
+
+# 同一内容同时上传到同一目录时只上传一次
+upload_single_flight = SingleFlight()
+
+# 全进程共享的并发名额: 下载按源站 host, 上传按图床 host, 各自按 AIMD 自适应调整,
+# 可通过 RATE_LIMIT_CONFIG 的 media / imghub 配置覆盖
+MEDIA_PLATFORM = "media"
+IMGHUB_PLATFORM = "imghub"
+for _platform in (MEDIA_PLATFORM, IMGHUB_PLATFORM):
+    rate_limiter_registry.set_platform_defaults(
+        _platform, rate=0, concurrency=4, min_concurrency=1, max_concurrency=16
+    )
+
 
 def clean_filename(filename):
     return re.sub(r'[^a-zA-Z0-9_.]', '_', filename)
 
+
 def clean_author_name(author_name):
     return re.sub(r'[^\u4e00-\u9fa5a-zA-Z0-9_]', '_', author_name)
 
-async def download_media(url, retries=3, timeout=60):
-    # 保持不变
-    async with httpx.AsyncClient() as client:
-        for i in range(retries):
-            try:
-                response = await client.get(url, timeout=timeout)
-                response.raise_for_status()
-                content = response.content
-
-                content_disposition = response.headers.get('Content-Disposition', '')
-                parsed_url = urlparse(url)
-                filename = clean_filename(unquote(Path(parsed_url.path).name))
-
-                if '.' not in filename:
-                    content_type = response.headers.get('Content-Type', '').split(';')[0]
-                    ext = mimetypes.guess_extension(content_type)
-                    if ext:
-                        filename += ext 
-                    else:
-                        filename += '.bin'
-                
-                return content, filename, response
-            except httpx.TimeoutException:
-                print(f"Timeout occurred, retrying... ({i + 1}/{retries})")
-                if i == retries - 1:
-                    return None, None, None
-            except Exception as e:
-                print(f"Error downloading {url}: {str(e)}")
-                if i == retries - 1:
-                    return None, None, None
-    print(f"Failed to download '{url}' after {retries} retries.")
-    return None, None, None
-
-async def batch_download(download_url: list):
-    downloaded = {}
-    if not download_url:
-        return downloaded
-        
-    # 使用信号量控制并发数
-    semaphore = asyncio.Semaphore(CONCURRENT_LIMIT)
-    
-    async def bounded_download(url):
-        async with semaphore:  # 限制并发
-            return await download_media(url)
-    
-    # 并发执行所有下载任务
-    tasks = [bounded_download(url) for url in download_url]
-    results = await asyncio.gather(*tasks)
-    
-    # 收集结果
-    for content, filename, _ in results:
-        if content and filename:
-            downloaded[filename] = content
-            
-    return downloaded
-
-# 修改：单个文件上传增加信号量参数
-async def upload_single_file(client, filename, file_content, url, params, headers, semaphore, retries=3):
-    """单个文件上传，支持重试和并发控制"""
-    for i in range(retries):
-        try:
-            async with semaphore:  # 限制并发
-                files = {"file": (filename, file_content)}
-                resp = await client.post(
-                    url, 
-                    params=params, 
-                    files=files, 
-                    headers=headers, 
-                    timeout=60
-                )
-                resp.raise_for_status()
-                print(f"上传成功 {filename} (尝试 {i+1}/{retries})")
-                return True
-        except Exception as e:
-            print(f"上传失败 {filename} (尝试 {i+1}/{retries}): {str(e)}")
-            if i == retries - 1:
-                return False
-            await asyncio.sleep(1)
 
-# 修改：批量上传改为并发执行
-async def batch_upload_media(upload_files:dict, upload_folder, retries=3):
-    if not upload_files:
-        return
-        
+def guess_filename(url, response):
+    """根据链接路径取文件名, 没有扩展名时按 Content-Type 补充"""
+    parsed_url = urlparse(url)
+    filename = clean_filename(unquote(Path(parsed_url.path).name))
+
+    if '.' not in filename:
+        content_type = response.headers.get('Content-Type', '').split(';')[0]
+        ext = mimetypes.guess_extension(content_type)
+        if ext:
+            filename += ext
+        else:
+            filename += '.bin'
+    return filename
+
+
+class MultipartStream:
+    """
+    把文件内容的异步迭代器包装成只含一个文件字段的 multipart/form-data 请求体,
+    边读边发, 不在内存中拼接整个文件
+    """
+
+    def __init__(self, field, filename, content_type, chunks, content_length=None):
+        """
+        :param field: 表单字段名
+        :param filename: 文件名, 需要已经过 clean_filename 处理
+        :param content_type: 文件类型
+        :param chunks: 文件内容的异步迭代器
+        :param content_length: 文件大小, 未知时使用分块传输编码
+        """
+        self.boundary = os.urandom(16).hex()
+        self.head = (
+            f'--{self.boundary}\r\n'
+            f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+            f'Content-Type: {content_type}\r\n\r\n'
+        ).encode()
+        self.tail = f'\r\n--{self.boundary}--\r\n'.encode()
+        self.chunks = chunks
+        self.content_length = content_length
+
+    @property
+    def headers(self):
+        headers = {'Content-Type': f'multipart/form-data; boundary={self.boundary}'}
+        if self.content_length is not None:
+            length = len(self.head) + self.content_length + len(self.tail)
+            headers['Content-Length'] = str(length)
+        return headers
+
+    async def __aiter__(self):
+        yield self.head
+        async for chunk in self.chunks:
+            yield chunk
+        yield self.tail
+
+
+def get_upload_args(upload_folder):
     headers = {
             "Authorization": f"Bearer {UPLOAD_TOKEN}"
         }
-    url = f"{IMG_DOMAIN}/upload"
     params = {
         "uploadFolder": upload_folder,
         "serverCompress": "false",
         "uploadChannel": "telegram",
         "autoRetry": "true"
     }
+    return f"{IMG_DOMAIN}/upload", params, headers
+
+
+def record_transfer(platform, host, response, error, start):
+    if response is not None:
+        status = str(response.status_code)
+        num_bytes = response.num_bytes_downloaded
+    else:
+        status = type(error).__name__ if error else "cancelled"
+        num_bytes = 0
+    record_upstream_request(
+        platform, host, status, time.perf_counter() - start, num_bytes
+    )
+
+
+class TransferProgress:
+    """一次转存的进度, 字节数包含重试时重复传输的部分"""
+
+    def __init__(self):
+        self.total = 0
+        self.done = 0
+        self.success = 0
+        self.failed = 0
+        self.skipped = 0
+        self.bytes_downloaded = 0
+        self.bytes_uploaded = 0
+
+    def add_result(self, result):
+        self.done += 1
+        if result["success"]:
+            self.success += 1
+        else:
+            self.failed += 1
+        if result["skipped"]:
+            self.skipped += 1
+
+    def to_dict(self):
+        return {
+            "total": self.total,
+            "done": self.done,
+            "success": self.success,
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "bytes_downloaded": self.bytes_downloaded,
+            "bytes_uploaded": self.bytes_uploaded,
+        }
+
+
+# 当前转存的进度, 由 process_media_item 的 progress 参数设置, 下载和上传的 worker 会继承
+_current_progress = ContextVar("current_progress", default=None)
+
+
+class StagedFile:
+    """下载到本地临时文件、等待上传的文件"""
+
+    def __init__(self, path, filename, content_type, size, content_hash):
+        self.path = path
+        self.filename = filename
+        self.content_type = content_type
+        self.size = size
+        self.content_hash = content_hash
+
+    async def chunks(self):
+        f = await asyncio.to_thread(open, self.path, 'rb')
+        try:
+            while chunk := await asyncio.to_thread(f.read, MEDIA_CHUNK_SIZE):
+                yield chunk
+                progress = _current_progress.get()
+                if progress is not None:
+                    progress.bytes_uploaded += len(chunk)
+        finally:
+            await asyncio.to_thread(f.close)
+
+    async def remove(self):
+        # 删除很快, 不放到线程池中, 被取消时也能在返回前删除
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def _write_chunk(f, sha256, chunk):
+    # 在线程池中执行, hashlib 计算大块数据时会释放 GIL
+    if sha256 is not None:
+        sha256.update(chunk)
+    f.write(chunk)
+
+
+def _hash_file(path):
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(1024 * 1024):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+class RangeNotSupported(Exception):
+    """源站不支持或中途不再支持 Range 请求, 改为单个请求下载"""
+
+
+class Segment:
+    __slots__ = ('start', 'end', 'pos')
+
+    def __init__(self, start, end):
+        self.start = start
+        # end 包含在该段内, 与 Range 请求头一致
+        self.end = end
+        # 下一个待写入的位置, 重试时从这里续传
+        self.pos = start
+
+    @property
+    def done(self):
+        return self.pos > self.end
+
+
+def parse_content_range(response):
+    """解析 206 响应的 Content-Range, 如 bytes 0-1023/4096, 返回 (start, end, total)"""
+    content_range = response.headers.get('Content-Range', '')
+    match = re.fullmatch(r'bytes (\d+)-(\d+)/(\d+)', content_range)
+    if response.status_code != 206 or match is None:
+        return None
+    return tuple(int(value) for value in match.groups())
+
+
+async def _gather_all(*aws):
+    """
+    等待所有分段结束后再抛出异常, 避免失败后仍有分段在写入; 已下载的部分保留, 下次只续传
+    """
+    results = await asyncio.gather(*aws, return_exceptions=True)
+    errors = [result for result in results if isinstance(result, BaseException)]
+    for error in errors:
+        if isinstance(error, RangeNotSupported):
+            raise error
+    if errors:
+        raise errors[0]
+
+
+class MediaDownload:
+    """
+    下载单个文件到临时文件
+
+    首个请求带上 Range: bytes=0-, 源站返回 206 且文件足够大时按 Content-Range 的总大小预分配文件,
+    首个请求的响应作为第一段继续读取, 同时并发请求其余各段; 否则按单个请求顺序下载
+
+    每个请求单独占用源站的并发名额, 持有名额时不等待其他请求的名额, 名额只剩 1 个时各段依次下载
+    """
+
+    def __init__(self, url, path, timeout=60):
+        self.url = url
+        self.path = path
+        self.timeout = timeout
+        self.host = httpx.URL(url).host
+        self.limiter = rate_limiter_registry.get(MEDIA_PLATFORM, self.host)
+        self.progress = _current_progress.get()
+        # 分段下载时的各段, 为 None 时按单个请求下载
+        self.segments = None
+        self.ranges_supported = MEDIA_SEGMENTS > 1
+        # 分段请求带上 If-Range, 文件在分段之间变化时源站返回 200, 改为单个请求下载
+        self.validator = None
+        self.response = None
+        self.size = 0
+        self.content_hash = None
+
+    async def run(self):
+        """执行一次下载, 失败时抛出异常, 再次调用时只续传未完成的段"""
+        try:
+            if self.segments is None:
+                await self._probe()
+            else:
+                pending = [segment for segment in self.segments if not segment.done]
+                await _gather_all(*map(self._fetch_segment, pending))
+        except RangeNotSupported:
+            print(f"分段下载失败, 改为单个请求下载 {self.url}")
+            self.ranges_supported = False
+            self.segments = None
+            await self._request({}, self._read_first)
+        # 单个请求下载时边下载边计算, 分段下载(包括续传)完成后再读一遍文件计算
+        if self.content_hash is None:
+            self.content_hash = await asyncio.to_thread(_hash_file, self.path)
+
+    async def _probe(self):
+        # 首个请求确定分段后通知其余各段开始下载, 首个请求读完第一段就释放名额, 不等待其余各段
+        segmented = asyncio.get_running_loop().create_future()
+
+        async def first():
+            try:
+                headers = {'Range': 'bytes=0-'} if self.ranges_supported else {}
+                await self._request(headers, self._read_first, segmented)
+            finally:
+                if not segmented.done():
+                    segmented.set_result(False)
 
-    # 控制上传并发数
-    semaphore = asyncio.Semaphore(CONCURRENT_LIMIT)
-    
-    async with httpx.AsyncClient() as client:
-        # 创建所有上传任务
-        tasks = [
-            upload_single_file(
-                client, filename, file_content, 
-                url, params, headers, semaphore,  # 传入信号量
-                retries=retries
-            ) 
-            for filename, file_content in upload_files.items()
+        async def rest():
+            if await segmented:
+                await _gather_all(*map(self._fetch_segment, self.segments[1:]))
+
+        await _gather_all(first(), rest())
+
+    async def _request(self, headers, read, *args):
+        async with self.limiter.acquire():
+            response = None
+            error = None
+            start = time.perf_counter()
+            try:
+                async with get_http_client("media").stream(
+                    'GET', self.url, headers=headers, timeout=self.timeout
+                ) as response:
+                    if is_throttled_response(response):
+                        self.limiter.on_throttled()
+                    if response.status_code == 416 and 'Range' in headers:
+                        raise RangeNotSupported()
+                    response.raise_for_status()
+                    await read(response, *args)
+                self.limiter.on_success()
+            except Exception as e:
+                error = e
+                if isinstance(e, httpx.TimeoutException):
+                    self.limiter.on_throttled()
+                raise
+            finally:
+                record_transfer(MEDIA_PLATFORM, self.host, response, error, start)
+
+    async def _read_first(self, response, segmented=None):
+        self.response = response
+        content_range = parse_content_range(response) if self.ranges_supported else None
+        if (
+            content_range is None
+            or content_range[0] != 0
+            or content_range[2] < MEDIA_SEGMENT_MIN_SIZE
+        ):
+            await self._read_all(response)
+            return
+
+        total = content_range[2]
+        etag = response.headers.get('ETag', '')
+        if etag and not etag.startswith('W/'):
+            self.validator = etag
+        else:
+            self.validator = response.headers.get('Last-Modified')
+        count = max(1, min(MEDIA_SEGMENTS, total // MEDIA_SEGMENT_MIN_SIZE))
+        size = -(-total // count)
+        self.segments = [
+            Segment(start, min(start + size, total) - 1)
+            for start in range(0, total, size)
         ]
-        # 并发执行
-        results = await asyncio.gather(*tasks)
-        
-        # 检查失败的任务
-        for idx, success in enumerate(results):
-            if not success:
-                filename = list(upload_files.keys())[idx]
-                print(f"文件 {filename} 经过 {retries} 次重试后仍上传失败")
+        self.size = total
+        await asyncio.to_thread(os.truncate, self.path, total)
+        segmented.set_result(True)
+        # 首个请求的响应作为第一段, 与其余各段并发读取
+        await self._read_segment(self.segments[0], response)
+
+    async def _read_all(self, response):
+        sha256 = hashlib.sha256()
+        self.size = 0
+        f = await asyncio.to_thread(open, self.path, 'wb')
+        try:
+            async for chunk in response.aiter_bytes(MEDIA_CHUNK_SIZE):
+                await asyncio.to_thread(_write_chunk, f, sha256, chunk)
+                self.size += len(chunk)
+                if self.progress is not None:
+                    self.progress.bytes_downloaded += len(chunk)
+        finally:
+            await asyncio.to_thread(f.close)
+        self.content_hash = sha256.hexdigest()
+
+    async def _fetch_segment(self, segment):
+        headers = {'Range': f'bytes={segment.pos}-{segment.end}'}
+        if self.validator:
+            headers['If-Range'] = self.validator
+
+        async def read(response):
+            content_range = parse_content_range(response)
+            if (
+                content_range is None
+                or content_range[0] != segment.pos
+                or content_range[2] != self.size
+            ):
+                raise RangeNotSupported()
+            await self._read_segment(segment, response)
+
+        await self._request(headers, read)
+
+    async def _read_segment(self, segment, response):
+        f = await asyncio.to_thread(open, self.path, 'r+b')
+        try:
+            await asyncio.to_thread(f.seek, segment.pos)
+            async for chunk in response.aiter_bytes(MEDIA_CHUNK_SIZE):
+                chunk = chunk[:segment.end + 1 - segment.pos]
+                await asyncio.to_thread(_write_chunk, f, None, chunk)
+                segment.pos += len(chunk)
+                if self.progress is not None:
+                    self.progress.bytes_downloaded += len(chunk)
+                if segment.done:
+                    break
+        finally:
+            await asyncio.to_thread(f.close)
+        if not segment.done:
+            raise httpx.RemoteProtocolError(f"分段 {segment.start}-{segment.end} 未下载完整")
+
+
+async def download_media(url, retries=3, timeout=60):
+    """
+    下载单个文件到临时文件并计算 sha256, 内存中只保留一个块; 源站支持 Range 时分段并发下载,
+    失败重试时只续传未完成的段
+    :return: (StagedFile, 尝试次数)
+    """
+    staged = None
+    fd, path = tempfile.mkstemp(prefix='imghub_', dir=MEDIA_TMP_DIR)
+    os.close(fd)
+    download = MediaDownload(url, path, timeout=timeout)
+    try:
+        for i in range(retries):
+            try:
+                await download.run()
+                break
+            except Exception as e:
+                print(f"下载失败 {url} (尝试 {i+1}/{retries}): {str(e)}")
+                if i == retries - 1:
+                    raise
+            await asyncio.sleep(1)
+        response = download.response
+        content_type = (
+            response.headers.get('Content-Type') or 'application/octet-stream'
+        )
+        staged = StagedFile(
+            path,
+            guess_filename(url, response),
+            content_type,
+            download.size,
+            download.content_hash,
+        )
+        return staged, i + 1
+    finally:
+        if staged is None:
+            # 下载失败或被取消时删除临时文件
+            os.unlink(path)
+
+
+def get_upload_src(resp):
+    """图床返回的文件地址, 如 [{"src": "/file/xxx.jpg"}], 无法识别时返回空字符串"""
+    try:
+        data = resp.json()
+    except ValueError:
+        return ""
+    if isinstance(data, list) and data:
+        data = data[0]
+    if isinstance(data, dict):
+        return str(data.get('src') or data.get('url') or "")
+    return ""
+
+
+async def upload_media(staged, upload_folder, retries=3, timeout=60):
+    """
+    从临时文件上传到图床的 upload_folder 目录, 失败时只重试上传
+    :return: (图床返回的文件地址, 尝试次数)
+    """
+    upload_url, params, headers = get_upload_args(upload_folder)
+    host = httpx.URL(upload_url).host
+    limiter = rate_limiter_registry.get(IMGHUB_PLATFORM, host)
+    for i in range(retries):
+        async with limiter.acquire():
+            resp = None
+            error = None
+            start = time.perf_counter()
+            try:
+                body = MultipartStream(
+                    'file',
+                    staged.filename,
+                    staged.content_type,
+                    staged.chunks(),
+                    staged.size,
+                )
+                resp = await get_http_client("imghub").post(
+                    upload_url,
+                    params=params,
+                    content=body,
+                    headers={**headers, **body.headers},
+                    timeout=timeout
+                )
+                if is_throttled_response(resp):
+                    limiter.on_throttled()
+                resp.raise_for_status()
+                limiter.on_success()
+                print(f"上传成功 {staged.filename} (尝试 {i+1}/{retries})")
+                return get_upload_src(resp), i + 1
+            except Exception as e:
+                error = e
+                if isinstance(e, httpx.TimeoutException):
+                    limiter.on_throttled()
+                print(f"上传失败 {staged.filename} (尝试 {i+1}/{retries}): {str(e)}")
+                if i == retries - 1:
+                    raise
+            finally:
+                record_transfer(IMGHUB_PLATFORM, host, resp, error, start)
+        await asyncio.sleep(1)
+
+
+async def _find_uploaded(find, *args):
+    """查询索引, 索引不可用(如 SQLite 出错)时按未上传处理, 不影响转存"""
+    try:
+        return await find(*args)
+    except Exception as e:
+        print(f"查询转存索引失败: {type(e).__name__}: {e}")
+        return None
+
+
+async def stage_media(result, retries=3):
+    """
+    转存的下载阶段: 按链接和内容哈希查询索引, 已上传过的文件跳过
+    :return: 需要上传的 StagedFile, 跳过或下载失败时返回 None
+    """
+    url, upload_folder = result["url"], result["folder"]
+    found = await _find_uploaded(media_index.find_by_url, url, upload_folder)
+    if found is not None:
+        result.update(success=True, skipped="url", **_uploaded_fields(found))
+        return None
+
+    try:
+        staged, attempts = await download_media(url, retries=retries)
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+        result["attempts"] += retries
+        return None
+    result["attempts"] += attempts
+
+    try:
+        found = await _find_uploaded(
+            media_index.find_by_hash, url, staged.content_hash, upload_folder
+        )
+    except asyncio.CancelledError:
+        # 下载完成后被取消, 临时文件还没有交给上传 worker
+        await staged.remove()
+        raise
+    if found is not None:
+        await staged.remove()
+        result.update(success=True, skipped="content", **_uploaded_fields(found))
+        return None
+    result.update(filename=staged.filename, size=staged.size, hash=staged.content_hash)
+    return staged
+
+
+async def publish_media(result, staged, retries=3):
+    """
+    转存的上传阶段: 上传成功后写入索引, 相同内容同时上传时只上传一次
+    """
+    upload_folder = result["folder"]
+
+    try:
+        src, attempts = await upload_single_flight.do(
+            (staged.content_hash, upload_folder),
+            lambda: upload_media(staged, upload_folder, retries=retries)
+        )
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+        result["attempts"] += retries
+        return
+    result.update(success=True, src=src, error="")
+    result["attempts"] += attempts
+    try:
+        await media_index.add(
+            result["url"],
+            upload_folder,
+            staged.content_hash,
+            staged.filename,
+            staged.size,
+            src,
+        )
+    except Exception as e:
+        # 已上传成功, 只是下次不能跳过
+        result["error"] = f"写入转存索引失败: {type(e).__name__}: {e}"
+        print(f"{result['error']} {result['url']}")
+
+
+def _uploaded_fields(found):
+    return {
+        "filename": found["filename"],
+        "size": found["size"],
+        "hash": found["content_hash"],
+        "src": found["src"],
+    }
+
+
+async def batch_transfer_media(items: list, retries=3):
+    """
+    转存一批文件: 下载和上传分两组 worker, 下载完成的文件放入有界队列等待上传,
+    队列满时暂停下载, 两组各最多 MEDIA_ITEM_CONCURRENCY 个,
+    实际并发还受各源站和图床的全局名额限制
+    :param items: [(文件链接, 图床目录)]
+    :return: 与 items 顺序对应的转存结果
+    """
+    results = [
+        {
+            "url": url,
+            "folder": upload_folder,
+            "filename": "",
+            "size": 0,
+            "hash": "",
+            "src": "",
+            "success": False,
+            # 命中索引跳过的原因: url 链接已上传过, content 相同内容已上传过
+            "skipped": "",
+            "attempts": 0,
+            "error": "",
+            "elapsed": 0.0,
+        }
+        for url, upload_folder in items
+    ]
+    progress = _current_progress.get()
+    if progress is not None:
+        progress.total += len(items)
+    if not items:
+        return results
+
+    def finish(result):
+        result["elapsed"] = round(time.perf_counter() - result["elapsed"], 3)
+        if progress is not None:
+            progress.add_result(result)
+
+    download_queue = asyncio.Queue()
+    for result in results:
+        download_queue.put_nowait(result)
+    upload_queue = asyncio.Queue(MEDIA_UPLOAD_QUEUE_SIZE)
+    workers = min(MEDIA_ITEM_CONCURRENCY, len(items))
+
+    async def downloader():
+        while not download_queue.empty():
+            result = download_queue.get_nowait()
+            result["elapsed"] = time.perf_counter()
+            staged = await stage_media(result, retries=retries)
+            if staged is None:
+                finish(result)
+            else:
+                try:
+                    await upload_queue.put((result, staged))
+                except asyncio.CancelledError:
+                    await staged.remove()
+                    raise
+
+    async def uploader():
+        while True:
+            item = await upload_queue.get()
+            if item is None:
+                return
+            result, staged = item
+            try:
+                await publish_media(result, staged, retries=retries)
+            finally:
+                await staged.remove()
+                finish(result)
+
+    async def close_uploads():
+        await asyncio.gather(*downloaders)
+        for _ in uploaders:
+            await upload_queue.put(None)
+
+    downloaders = [asyncio.create_task(downloader()) for _ in range(workers)]
+    uploaders = [asyncio.create_task(uploader()) for _ in range(workers)]
+    tasks = downloaders + uploaders + [asyncio.create_task(close_uploads())]
+    try:
+        # 任意一个 worker 出错时立即结束, 避免下载 worker 阻塞在已满、无人消费的上传队列上
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        for task in done:
+            if not task.cancelled() and task.exception() is not None:
+                raise task.exception()
+    finally:
+        # 出错或被取消时停止所有 worker, 清理还在队列中的临时文件
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        while not upload_queue.empty():
+            item = upload_queue.get_nowait()
+            if item is not None:
+                await item[1].remove()
+
+    # 检查失败的任务
+    for result in results:
+        if not result["success"]:
+            print(f"文件 {result['url']} 经过 {retries} 次重试后仍转存失败")
+    return results
+
 
 async def _async_process_media_item(data: dict):
     print(data)
@@ -143,7 +705,7 @@ async def _async_process_media_item(data: dict):
     video_urls = []
 
     author_name = clean_author_name(data['author']['name'])
-    
+
     video_url = data.get('video_url', '')
 
     for item in data['images']:
@@ -152,32 +714,52 @@ async def _async_process_media_item(data: dict):
 
         if item.get('live_photo_url', ''):
             video_urls.append(item['live_photo_url'])
-    
+
     if video_url:
         video_urls.append(video_url)
-    
-    # 并行下载图片和视频
-    img_files, video_files = await asyncio.gather(
-        batch_download(image_urls),
-        batch_download(video_urls)
-    )
-    
-    print(f"image: {len(img_files)}")
-    print(f"video: {len(video_files)}")
+
+    print(f"image: {len(image_urls)}")
+    print(f"video: {len(video_urls)}")
 
     img_folder = f'img/{author_name}'
     video_folder = f'video/{author_name}'
     print('uploading...')
-    
-    # 并行上传图片和视频
-    await asyncio.gather(
-        batch_upload_media(img_files, img_folder),
-        batch_upload_media(video_files, video_folder)
-    )
-    
-    print("Upload finish")
-    return {}
 
-async def process_media_item(data: dict):
-    data = json.loads(json.dumps(data, ensure_ascii=False, default=lambda x: x.__dict__))
-    return await _async_process_media_item(data)
+    # 图片和视频放在同一个队列中转存, 已上传过的链接和内容会跳过
+    items = [(url, img_folder) for url in image_urls]
+    items += [(url, video_folder) for url in video_urls]
+    results = await batch_transfer_media(items)
+
+    success = sum(1 for result in results if result["success"])
+    skipped = sum(1 for result in results if result["skipped"])
+    print(f"Upload finish: {success}/{len(results)}, skipped: {skipped}")
+    return {
+        "total": len(results),
+        "success": success,
+        "failed": len(results) - success,
+        "skipped": skipped,
+        "items": results,
+    }
+
+
+def _to_plain(data):
+    # VideoInfo 等模型使用 slots, 没有 __dict__, 通过 to_dict 转换
+    if hasattr(data, 'to_dict'):
+        return data.to_dict()
+    if isinstance(data, dict):
+        return {key: _to_plain(value) for key, value in data.items()}
+    if isinstance(data, (list, tuple)):
+        return [_to_plain(item) for item in data]
+    return data
+
+
+async def process_media_item(data, progress=None):
+    """
+    data 可以是 VideoInfo, 或其 dict 形式, 或 {"code", "msg", "data"} 格式的解析结果
+    progress 为 TransferProgress 时, 转存过程中实时更新其中的进度
+    """
+    token = _current_progress.set(progress)
+    try:
+        return await _async_process_media_item(_to_plain(data))
+    finally:
+        _current_progress.reset(token)
@@ -0,0 +1,379 @@
+"""
+后台任务: 耗时的转存在后台 worker 中执行, 请求只提交任务并返回任务 id
+
+- 任务保存在 SQLite 中, 服务重启后未完成的任务重新排队
+- 任务完成(成功或失败)后, 可选 POST 回调通知
+"""
+
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+from urllib.parse import urlsplit
+
+from utils import fastjson
+from utils.http_client import get_http_client
+
+# 任务文件路径, 为 :memory: 时不持久化
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", "data/jobs.db")
+# 同时执行的任务数
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# 排队中的任务数上限, 超过时拒绝提交
+JOB_MAX_PENDING = int(os.getenv("JOB_MAX_PENDING", "1000"))
+# 已结束任务的保留时间(秒), 启动时清理
+JOB_RETENTION = int(os.getenv("JOB_RETENTION", str(7 * 86400)))
+# 默认回调地址, 提交任务时未指定回调地址时使用, 为空时不回调
+JOB_WEBHOOK_URL = os.getenv("JOB_WEBHOOK_URL", "")
+# 提交任务时允许指定的回调地址 host, 逗号分隔, 为空时只能使用 JOB_WEBHOOK_URL
+JOB_WEBHOOK_ALLOWED_HOSTS = frozenset(
+    host.strip().lower()
+    for host in os.getenv("JOB_WEBHOOK_ALLOWED_HOSTS", "").split(",")
+    if host.strip()
+)
+JOB_WEBHOOK_TIMEOUT = float(os.getenv("JOB_WEBHOOK_TIMEOUT", "10"))
+JOB_WEBHOOK_RETRIES = int(os.getenv("JOB_WEBHOOK_RETRIES", "3"))
+
+PENDING = "pending"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    params TEXT NOT NULL,
+    callback TEXT NOT NULL,
+    progress TEXT,
+    result TEXT,
+    error TEXT NOT NULL DEFAULT '',
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+"""
+
+# 任务处理函数: (任务参数, 进度对象) -> 任务结果
+JobHandler = Callable[[Dict[str, Any], Any], Awaitable[Any]]
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class CallbackNotAllowed(ValueError):
+    pass
+
+
+def check_callback(callback: str) -> None:
+    """
+    检查提交任务时指定的回调地址, 避免服务端向任意地址(如内网、云主机元数据)发请求
+    :param callback: 回调地址
+    :return:
+    """
+    if not callback or callback == JOB_WEBHOOK_URL:
+        return
+    parts = urlsplit(callback)
+    if parts.scheme not in ("http", "https"):
+        raise CallbackNotAllowed(f"回调地址只支持 http/https: {callback}")
+    if (parts.hostname or "") not in JOB_WEBHOOK_ALLOWED_HOSTS:
+        raise CallbackNotAllowed(
+            f"回调地址的 host 不在 JOB_WEBHOOK_ALLOWED_HOSTS 中: {parts.hostname}"
+        )
+
+
+class JobFailed(Exception):
+    """
+    处理函数执行完但结果为失败(如部分文件转存失败)时抛出, 任务标记为 failed 并保存结果
+    """
+
+    def __init__(self, message: str, result: Any = None):
+        super().__init__(message)
+        self.result = result
+
+
+class JobStore:
+    """
+    sqlite3 是阻塞调用, 异步方法在线程池中执行, 同一时刻只有一个线程访问连接
+    """
+
+    def __init__(self, path: str = JOB_DB_PATH):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def _execute(self, sql: str, params: tuple = ()) -> list:
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                return conn.execute(sql, params).fetchall()
+
+    async def execute(self, sql: str, params: tuple = ()) -> list:
+        return await asyncio.to_thread(self._execute, sql, params)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def _job_to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+    job = dict(row)
+    # 回调地址只在服务端使用, 不在查询结果和回调内容中返回
+    del job["callback"]
+    job["params"] = fastjson.loads(job["params"])
+    for key in ("progress", "result"):
+        if job[key] is not None:
+            job[key] = fastjson.loads(job[key])
+    return job
+
+
+class JobManager:
+    """
+    固定数量的 worker 按提交顺序执行任务, 每种任务类型对应一个处理函数
+
+    worker 被取消(服务退出)时任务保持 running 状态, 下次启动时重新排队
+    """
+
+    def __init__(self, store: JobStore, workers: int = JOB_WORKERS):
+        self.store = store
+        self.workers = workers
+        self._handlers: Dict[str, JobHandler] = {}
+        self._progress_factories: Dict[str, Callable[[], Any]] = {}
+        # 执行中任务的进度对象, 查询时返回实时进度
+        self._running: Dict[str, Any] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: list = []
+        # 进行中的回调, 不占用 worker, 退出时等待
+        self._notifications: Set[asyncio.Task] = set()
+
+    def register(
+        self,
+        kind: str,
+        handler: JobHandler,
+        progress_factory: Callable[[], Any] = lambda: None,
+    ) -> None:
+        """
+        注册任务类型
+        :param kind: 任务类型
+        :param handler: 处理函数, 返回值需要可以 json 序列化
+        :param progress_factory: 创建进度对象, 进度对象需要有 to_dict 方法
+        """
+        self._handlers[kind] = handler
+        self._progress_factories[kind] = progress_factory
+
+    @property
+    def enabled(self) -> bool:
+        """
+        是否已启动, 任务文件无法打开(如只读目录)时不启用
+        """
+        return self._queue is not None
+
+    async def start(self) -> None:
+        """
+        启动 worker, 未完成的任务(包括上次退出时正在执行的)重新排队;
+        任务文件无法打开时只记录日志, 不启用后台任务
+        """
+        try:
+            rows = await self._recover()
+        except (sqlite3.Error, OSError) as err:
+            print(f"任务文件 {self.store.path} 无法打开, 不启用后台任务: {err}")
+            self.store.close()
+            return
+        self._queue = asyncio.Queue()
+        for row in rows:
+            self._queue.put_nowait(row["id"])
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def _recover(self) -> list:
+        now = time.time()
+        await self.store.execute(
+            "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?",
+            (SUCCEEDED, FAILED, now - JOB_RETENTION),
+        )
+        await self.store.execute(
+            "UPDATE jobs SET status = ?, updated_at = ? WHERE status = ?",
+            (PENDING, now, RUNNING),
+        )
+        return await self.store.execute(
+            "SELECT id FROM jobs WHERE status = ? ORDER BY created_at", (PENDING,)
+        )
+
+    async def stop(self) -> None:
+        """
+        停止 worker, 进行中的回调最多再等待 JOB_WEBHOOK_TIMEOUT 秒
+        """
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._notifications:
+            _, pending = await asyncio.wait(
+                self._notifications, timeout=JOB_WEBHOOK_TIMEOUT
+            )
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        self._queue = None
+        self.store.close()
+
+    async def submit(
+        self, kind: str, params: Dict[str, Any], callback: str = ""
+    ) -> Dict[str, Any]:
+        """
+        提交任务
+        :param kind: 任务类型
+        :param params: 任务参数, 需要可以 json 序列化
+        :param callback: 任务结束时回调的地址, 为空时使用 JOB_WEBHOOK_URL,
+            host 需要在 JOB_WEBHOOK_ALLOWED_HOSTS 中
+        :return: 任务信息
+        """
+        if kind not in self._handlers:
+            raise ValueError(f"未知的任务类型: {kind}")
+        check_callback(callback)
+        if self._queue is None:
+            raise RuntimeError("任务队列未启动")
+        if self._queue.qsize() >= JOB_MAX_PENDING:
+            raise JobQueueFull(f"排队中的任务已达上限 {JOB_MAX_PENDING}")
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        await self.store.execute(
+            "INSERT INTO jobs (id, kind, status, params, callback, created_at,"
+            " updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                job_id,
+                kind,
+                PENDING,
+                fastjson.dumps(params).decode(),
+                callback or JOB_WEBHOOK_URL,
+                now,
+                now,
+            ),
+        )
+        self._queue.put_nowait(job_id)
+        return await self.get(job_id)
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        查询任务, 执行中的任务返回实时进度
+        :param job_id: 任务 id
+        :return: 任务信息, 不存在时返回 None
+        """
+        if not self.enabled:
+            return None
+        rows = await self.store.execute("SELECT * FROM jobs WHERE id = ?", (job_id,))
+        if not rows:
+            return None
+        job = _job_to_dict(rows[0])
+        progress = self._running.get(job_id)
+        if progress is not None:
+            job["progress"] = progress.to_dict()
+        return job
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "workers": len(self._tasks),
+            "pending": self._queue.qsize() if self._queue is not None else 0,
+            "running": len(self._running),
+        }
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except Exception as err:
+                print(f"任务 {job_id} 执行出错: {type(err).__name__}: {err}")
+
+    async def _run(self, job_id: str) -> None:
+        rows = await self.store.execute("SELECT * FROM jobs WHERE id = ?", (job_id,))
+        if not rows or rows[0]["status"] != PENDING:
+            return
+        job = _job_to_dict(rows[0])
+        callback = rows[0]["callback"]
+        await self.store.execute(
+            "UPDATE jobs SET status = ?, updated_at = ? WHERE id = ?",
+            (RUNNING, time.time(), job_id),
+        )
+        progress = self._progress_factories[job["kind"]]()
+        self._running[job_id] = progress
+        status, result, error = SUCCEEDED, None, ""
+        try:
+            result = await self._handlers[job["kind"]](job["params"], progress)
+        except JobFailed as err:
+            status, result, error = FAILED, err.result, str(err)
+        except Exception as err:
+            status, error = FAILED, f"{type(err).__name__}: {err}"
+        finally:
+            # 被取消时不更新状态, 下次启动时重新执行
+            self._running.pop(job_id, None)
+        await self.store.execute(
+            "UPDATE jobs SET status = ?, progress = ?, result = ?, error = ?,"
+            " updated_at = ? WHERE id = ?",
+            (
+                status,
+                (
+                    fastjson.dumps(progress.to_dict()).decode()
+                    if progress is not None
+                    else None
+                ),
+                fastjson.dumps(result).decode() if result is not None else None,
+                error,
+                time.time(),
+                job_id,
+            ),
+        )
+        if callback:
+            # 回调可能因地址不可达重试很久, 不阻塞 worker 执行下一个任务
+            task = asyncio.create_task(self._notify(callback, await self.get(job_id)))
+            self._notifications.add(task)
+            task.add_done_callback(self._notifications.discard)
+
+    async def _notify(self, callback: str, job: Dict[str, Any]) -> None:
+        """
+        POST 任务信息到回调地址, 失败时重试, 最终失败只记录日志
+        """
+        try:
+            # 配置可能在任务提交后收紧, 回调前再检查一次
+            check_callback(callback)
+        except CallbackNotAllowed as err:
+            print(f"任务 {job['id']} 不回调: {err}")
+            return
+        content = fastjson.dumps(job)
+        for i in range(JOB_WEBHOOK_RETRIES):
+            try:
+                response = await get_http_client("webhook").post(
+                    callback,
+                    content=content,
+                    headers={"Content-Type": "application/json"},
+                    timeout=JOB_WEBHOOK_TIMEOUT,
+                )
+                response.raise_for_status()
+                return
+            except Exception as err:
+                print(
+                    f"任务 {job['id']} 回调失败 (尝试 {i + 1}/{JOB_WEBHOOK_RETRIES}):"
+                    f" {err}"
+                )
+                if i < JOB_WEBHOOK_RETRIES - 1:
+                    await asyncio.sleep(2**i)
+
+
+job_manager = JobManager(JobStore())
@@ -0,0 +1,92 @@
+"""
+解析页面中内嵌的 js 对象字面量, 如小红书的 window.__INITIAL_STATE__
+
+这类数据基本是 json, 只是会出现 undefined/NaN/Infinity 等 json 不支持的值,
+先把这些值替换为 null 再交给 json 解析, 比 yaml 解析快得多
+"""
+
+import re
+from typing import Any, Optional
+
+from utils import fastjson
+
+# 匹配 json 字符串, 或字符串之外的 undefined/NaN/Infinity
+_TOKEN_REG = re.compile(
+    r'("(?:[^"\\]|\\.)*")|-?(?<![\w$])(?:undefined|NaN|Infinity)(?![\w$])'
+)
+# 匹配 json 字符串或括号, 用于查找对象/数组的结束位置
+_BRACKET_REG = re.compile(r'"(?:[^"\\]|\\.)*"|[{}\[\]]')
+# 匹配字符串、数字等简单值
+_SIMPLE_VALUE_REG = re.compile(r'"(?:[^"\\]|\\.)*"|[^,}\]]*')
+_JS_ONLY_TOKENS = ("undefined", "NaN", "Infinity")
+
+
+def _replace_token(match: re.Match) -> str:
+    return match.group(1) or "null"
+
+
+def to_json(text: str) -> str:
+    """
+    将 js 对象字面量转为合法 json: undefined/NaN/Infinity 替换为 null
+    :param text: js 对象字面量
+    :return:
+    """
+    if not any(token in text for token in _JS_ONLY_TOKENS):
+        return text
+    return _TOKEN_REG.sub(_replace_token, text)
+
+
+def loads(text: str) -> Any:
+    """
+    解析 js 对象字面量
+    :param text: js 对象字面量
+    :return:
+    """
+    return fastjson.loads(to_json(text))
+
+
+def extract_value(text: str, key: str) -> Optional[str]:
+    """
+    截取第一个 "key": 对应的值的原始文本, 不解析其他部分
+    :param text: js 对象字面量
+    :param key: 键名
+    :return: 值的原始文本, 找不到时返回 None
+    """
+    key_reg = re.compile(r'"' + re.escape(key) + r'"\s*:\s*')
+    key_match = key_reg.search(text)
+    if not key_match:
+        return None
+
+    start = key_match.end()
+    if start >= len(text):
+        return None
+
+    if text[start] not in "{[":
+        # 字符串、数字等简单值
+        value_match = _SIMPLE_VALUE_REG.match(text, start)
+        return value_match.group().strip()
+
+    depth = 0
+    for bracket_match in _BRACKET_REG.finditer(text, start):
+        bracket = bracket_match.group()
+        if bracket in "{[":
+            depth += 1
+        elif bracket in "}]":
+            depth -= 1
+            if depth == 0:
+                end = bracket_match.end()
+                return text[start:end]
+    return None
+
+
+def loads_value(text: str, key: str) -> Any:
+    """
+    只解析第一个 "key": 对应的值, 大对象中只需要一小部分时使用
+    :param text: js 对象字面量
+    :param key: 键名
+    :return: 解析后的值, 找不到时抛出 KeyError
+    """
+    value_text = extract_value(text, key)
+    if value_text is None:
+        raise KeyError(key)
+    return loads(value_text)
@@ -0,0 +1,220 @@
+"""
+已转存媒体文件的本地索引(SQLite), 用于跳过重复的下载和上传
+
+- 按源链接: 同一个链接已经上传到同一目录时, 不再下载
+- 按内容哈希: 不同链接下载到相同内容时, 不再上传
+"""
+
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+# 索引文件路径, 为空时不使用索引
+MEDIA_INDEX_PATH = os.getenv("MEDIA_INDEX_PATH", "data/media_index.db")
+
+# 链接中会随每次分享变化的签名、过期时间参数, 不参与链接去重
+VOLATILE_QUERY_KEYS = frozenset(
+    (
+        "expires",
+        "x-expires",
+        "sign",
+        "signature",
+        "x-signature",
+        "auth_key",
+        "x-oss-expires",
+        "x-oss-signature",
+        "ts",
+    )
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS media_urls (
+    url_key TEXT NOT NULL,
+    folder TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    PRIMARY KEY (url_key, folder)
+);
+CREATE TABLE IF NOT EXISTS media_contents (
+    content_hash TEXT NOT NULL,
+    folder TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    src TEXT NOT NULL,
+    uploaded_at REAL NOT NULL,
+    PRIMARY KEY (content_hash, folder)
+);
+"""
+
+
+def get_url_key(url: str) -> str:
+    """
+    链接去重使用的 key: 去掉协议和签名、过期时间参数, 其余参数(如视频 id)保留
+    :param url: 源链接
+    :return:
+    """
+    parts = urlsplit(url)
+    key = parts.netloc + parts.path
+    if parts.query:
+        if "=" not in parts.query:
+            # 如小红书的 ?imageView2/format/png, 决定图片格式
+            return f"{key}?{parts.query}"
+        query = [
+            (name, value)
+            for name, value in parse_qsl(parts.query, keep_blank_values=True)
+            if name.lower() not in VOLATILE_QUERY_KEYS
+        ]
+        if query:
+            key += "?" + urlencode(sorted(query))
+    return key
+
+
+class MediaIndex:
+    """
+    sqlite3 是阻塞调用, 异步方法在线程池中执行, 同一时刻只有一个线程访问连接
+    """
+
+    def __init__(self, path: str = MEDIA_INDEX_PATH):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def _find_by_url(self, url_key: str, folder: str) -> Optional[dict]:
+        with self._lock:
+            row = (
+                self._connect()
+                .execute(
+                    "SELECT c.* FROM media_urls u JOIN media_contents c"
+                    " ON u.content_hash = c.content_hash AND u.folder = c.folder"
+                    " WHERE u.url_key = ? AND u.folder = ?",
+                    (url_key, folder),
+                )
+                .fetchone()
+            )
+        return dict(row) if row else None
+
+    def _find_by_hash(self, content_hash: str, folder: str) -> Optional[dict]:
+        with self._lock:
+            row = (
+                self._connect()
+                .execute(
+                    "SELECT * FROM media_contents"
+                    " WHERE content_hash = ? AND folder = ?",
+                    (content_hash, folder),
+                )
+                .fetchone()
+            )
+        return dict(row) if row else None
+
+    def _add_url(self, url_key: str, folder: str, content_hash: str) -> None:
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO media_urls VALUES (?, ?, ?)",
+                    (url_key, folder, content_hash),
+                )
+
+    def _add(
+        self,
+        url_key: str,
+        folder: str,
+        content_hash: str,
+        filename: str,
+        size: int,
+        src: str,
+    ) -> None:
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO media_contents VALUES (?, ?, ?, ?, ?, ?)",
+                    (content_hash, folder, filename, size, src, time.time()),
+                )
+                conn.execute(
+                    "INSERT OR REPLACE INTO media_urls VALUES (?, ?, ?)",
+                    (url_key, folder, content_hash),
+                )
+
+    async def find_by_url(self, url: str, folder: str) -> Optional[dict]:
+        """
+        查找该链接是否已上传到 folder
+        :param url: 源链接
+        :param folder: 图床目录
+        :return: 已上传的文件信息, 未上传时返回 None
+        """
+        if not self.enabled:
+            return None
+        return await asyncio.to_thread(self._find_by_url, get_url_key(url), folder)
+
+    async def find_by_hash(
+        self, url: str, content_hash: str, folder: str
+    ) -> Optional[dict]:
+        """
+        查找相同内容是否已上传到 folder, 已上传时同时记录该链接, 下次不再下载
+        :param url: 源链接
+        :param content_hash: 文件内容的 sha256
+        :param folder: 图床目录
+        :return: 已上传的文件信息, 未上传时返回 None
+        """
+        if not self.enabled:
+            return None
+        found = await asyncio.to_thread(self._find_by_hash, content_hash, folder)
+        if found is not None:
+            await asyncio.to_thread(
+                self._add_url, get_url_key(url), folder, content_hash
+            )
+        return found
+
+    async def add(
+        self,
+        url: str,
+        folder: str,
+        content_hash: str,
+        filename: str,
+        size: int,
+        src: str = "",
+    ) -> None:
+        """
+        记录上传成功的文件
+        :param url: 源链接
+        :param folder: 图床目录
+        :param content_hash: 文件内容的 sha256
+        :param filename: 上传的文件名
+        :param size: 文件大小
+        :param src: 图床返回的文件地址
+        :return:
+        """
+        if not self.enabled:
+            return
+        await asyncio.to_thread(
+            self._add, get_url_key(url), folder, content_hash, filename, size, src
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+media_index = MediaIndex()
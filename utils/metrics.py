@@ -0,0 +1,274 @@
+"""
+运行指标统计, 以 Prometheus 文本格式输出, 不依赖 prometheus_client
+"""
+
+import bisect
+import math
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# 延迟直方图的默认分桶(秒)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+# 上游请求次数直方图的分桶
+HOP_BUCKETS = (0, 1, 2, 3, 4, 5, 8, 13)
+
+LabelValues = Tuple[str, ...]
+# (指标名后缀, 标签, 值)
+Sample = Tuple[str, Dict[str, str], float]
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_sample(name: str, labels: Dict[str, str], value: float) -> str:
+    if not labels:
+        return f"{name} {_format_value(value)}"
+    label_text = ",".join(
+        f'{key}="{_escape_label_value(str(val))}"' for key, val in labels.items()
+    )
+    return f"{name}{{{label_text}}} {_format_value(value)}"
+
+
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _label_values(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def samples(self) -> Iterator[Sample]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type}",
+        ]
+        for suffix, labels, value in self.samples():
+            lines.append(_format_sample(self.name + suffix, labels, value))
+        return lines
+
+
+class Counter(Metric):
+    """
+    只增不减的计数
+    """
+
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._label_values(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> Iterator[Sample]:
+        for key, value in self._values.items():
+            yield "", dict(zip(self.labelnames, key)), value
+
+
+class Histogram(Metric):
+    """
+    分桶统计, 用于延迟等分布
+    """
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # 标签 -> 各分桶(不累计)的计数
+        self._counts: Dict[LabelValues, List[int]] = {}
+        self._sums: Dict[LabelValues, float] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._label_values(labels)
+        counts = self._counts.get(key)
+        if counts is None:
+            counts = self._counts[key] = [0] * len(self.buckets)
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        self._sums[key] = self._sums.get(key, 0.0) + value
+
+    def samples(self) -> Iterator[Sample]:
+        for key, counts in self._counts.items():
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                yield "_bucket", {**labels, "le": _format_value(bound)}, cumulative
+            yield "_sum", labels, self._sums[key]
+            yield "_count", labels, cumulative
+
+
+class GaugeCollector(Metric):
+    """
+    输出时才计算的指标, 如缓存大小、连接池状态
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        collect: Callable[[], Iterable[Tuple[Dict[str, str], float]]],
+        metric_type: str = "gauge",
+    ):
+        super().__init__(name, documentation)
+        self.type = metric_type
+        self.collect = collect
+
+    def samples(self) -> Iterator[Sample]:
+        for labels, value in self.collect():
+            yield "", labels, value
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        # 名称 -> 缓存对象, 需要有 stats() 方法
+        self._caches: Dict[str, object] = {}
+
+        self.gauge("cache_entries", "缓存条数", lambda: self._cache_stats("size"))
+        self.gauge(
+            "cache_hits_total",
+            "缓存命中次数",
+            lambda: self._cache_stats("hits"),
+            metric_type="counter",
+        )
+        self.gauge(
+            "cache_misses_total",
+            "缓存未命中次数",
+            lambda: self._cache_stats("misses"),
+            metric_type="counter",
+        )
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames=()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(
+        self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(
+        self, name: str, documentation: str, collect, metric_type: str = "gauge"
+    ) -> GaugeCollector:
+        """
+        注册输出时才计算的指标
+        :param name: 指标名
+        :param documentation: 说明
+        :param collect: 返回 [(标签, 值)] 的函数
+        :param metric_type: 指标类型, 累计值使用 counter
+        """
+        return self.register(GaugeCollector(name, documentation, collect, metric_type))
+
+    def register_cache(self, name: str, cache) -> None:
+        """
+        注册缓存, 输出其大小与命中情况
+        :param name: 缓存名称
+        :param cache: 有 stats() 方法的缓存, 如 utils.cache.TTLCache
+        """
+        self._caches[name] = cache
+
+    def _cache_stats(self, key: str) -> Iterator[Tuple[Dict[str, str], float]]:
+        for name, cache in self._caches.items():
+            yield {"cache": name}, cache.stats()[key]
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+
+metrics_registry = MetricsRegistry()
+
+parse_requests_total = metrics_registry.counter(
+    "parse_requests_total", "解析请求数", ("source", "result")
+)
+parse_errors_total = metrics_registry.counter(
+    "parse_errors_total", "解析失败数, 按异常类型统计", ("source", "error")
+)
+parse_duration_seconds = metrics_registry.histogram(
+    "parse_duration_seconds", "解析耗时(含缓存命中)", ("source",)
+)
+parse_upstream_hops = metrics_registry.histogram(
+    "parse_upstream_hops",
+    "单次解析(未命中缓存)的上游请求次数",
+    ("source",),
+    HOP_BUCKETS,
+)
+upstream_requests_total = metrics_registry.counter(
+    "upstream_requests_total", "上游请求数", ("platform", "host", "status")
+)
+upstream_request_duration_seconds = metrics_registry.histogram(
+    "upstream_request_duration_seconds",
+    "上游请求耗时(含读取响应体)",
+    ("platform", "host"),
+)
+upstream_response_bytes_total = metrics_registry.counter(
+    "upstream_response_bytes_total", "从上游下载的字节数", ("platform", "host")
+)
+
+# 当前解析过程中的上游请求次数
+_upstream_hops: ContextVar[Optional[List[int]]] = ContextVar(
+    "upstream_hops", default=None
+)
+
+
+@contextmanager
+def count_upstream_hops() -> Iterator[List[int]]:
+    """
+    统计上下文内的上游请求次数, 结果在返回列表的第一个元素中
+    """
+    hops = [0]
+    token = _upstream_hops.set(hops)
+    try:
+        yield hops
+    finally:
+        _upstream_hops.reset(token)
+
+
+def record_upstream_request(
+    platform: str, host: str, status: str, duration: float, num_bytes: int
+) -> None:
+    """
+    记录一次上游请求
+    :param platform: 平台
+    :param host: 上游 host
+    :param status: 状态码, 请求异常时为异常类型
+    :param duration: 耗时(秒)
+    :param num_bytes: 下载的字节数
+    """
+    upstream_requests_total.inc(platform=platform, host=host, status=status)
+    upstream_request_duration_seconds.observe(duration, platform=platform, host=host)
+    if num_bytes:
+        upstream_response_bytes_total.inc(num_bytes, platform=platform, host=host)
+    hops = _upstream_hops.get()
+    if hops is not None:
+        hops[0] += 1
@@ -0,0 +1,207 @@
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, Tuple
+
+import httpx
+
+# 默认限流配置, 可通过环境变量 RATE_LIMIT_CONFIG 按平台覆盖, 例如:
+# {"default": {"rate": 20}, "douyin": {"rate": 5, "max_concurrency": 8}}
+DEFAULT_RATE_LIMIT_CONFIG = {
+    # 令牌桶: 每秒请求数, <= 0 表示不限制
+    "rate": 20.0,
+    # 令牌桶: 突发请求数
+    "burst": 40,
+    # 初始并发数
+    "concurrency": 8,
+    # 自适应并发的上下限
+    "min_concurrency": 1,
+    "max_concurrency": 32,
+    # 被限流时并发数乘以该系数
+    "backoff": 0.5,
+}
+
+
+class TokenBucket:
+    """
+    令牌桶, 限制请求速率
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self._tokens = float(self.burst)
+        self._updated_at = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(
+            self.burst, self._tokens + (now - self._updated_at) * self.rate
+        )
+        self._updated_at = now
+
+    async def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        while True:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    @property
+    def tokens(self) -> float:
+        if self.rate <= 0:
+            return float(self.burst)
+        self._refill()
+        return self._tokens
+
+
+class AdaptiveLimiter:
+    """
+    令牌桶 + AIMD 自适应并发控制
+
+    - 请求成功时并发上限缓慢增加(每轮约 +1)
+    - 遇到 429/5xx/验证码/超时时并发上限按 backoff 系数成倍下降
+    """
+
+    # 两次降低并发上限之间的最小间隔(秒), 避免同一批失败请求连续降级
+    backoff_interval = 1.0
+
+    def __init__(
+        self,
+        rate: float = DEFAULT_RATE_LIMIT_CONFIG["rate"],
+        burst: int = DEFAULT_RATE_LIMIT_CONFIG["burst"],
+        concurrency: int = DEFAULT_RATE_LIMIT_CONFIG["concurrency"],
+        min_concurrency: int = DEFAULT_RATE_LIMIT_CONFIG["min_concurrency"],
+        max_concurrency: int = DEFAULT_RATE_LIMIT_CONFIG["max_concurrency"],
+        backoff: float = DEFAULT_RATE_LIMIT_CONFIG["backoff"],
+    ):
+        self.bucket = TokenBucket(rate, burst)
+        self.min_concurrency = max(min_concurrency, 1)
+        self.max_concurrency = max(max_concurrency, self.min_concurrency)
+        self.limit = float(
+            min(max(concurrency, self.min_concurrency), self.max_concurrency)
+        )
+        self.backoff = backoff
+        self.in_flight = 0
+        self.throttled = 0
+        self._last_backoff_at = 0.0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @asynccontextmanager
+    async def acquire(self):
+        await self.bucket.acquire()
+        while self.in_flight >= int(self.limit):
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                # 已被唤醒但随后被取消, 把名额让给下一个等待者
+                if waiter.done() and not waiter.cancelled():
+                    self._wake_up()
+                raise
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+
+        self.in_flight += 1
+        try:
+            yield self
+        finally:
+            self.in_flight -= 1
+            self._wake_up()
+
+    def _wake_up(self) -> None:
+        available = int(self.limit) - self.in_flight
+        while available > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                available -= 1
+
+    def on_success(self) -> None:
+        # 加性增: 每完成 limit 个请求, 并发上限 +1
+        self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+        self._wake_up()
+
+    def on_throttled(self) -> None:
+        self.throttled += 1
+        now = time.monotonic()
+        if now - self._last_backoff_at < self.backoff_interval:
+            return
+        # 乘性减
+        self._last_backoff_at = now
+        self.limit = max(self.min_concurrency, self.limit * self.backoff)
+
+    def stats(self) -> dict:
+        return {
+            "rate": self.bucket.rate,
+            "tokens": round(self.bucket.tokens, 2),
+            "concurrency_limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "waiting": len(self._waiters),
+            "throttled": self.throttled,
+        }
+
+
+class RateLimiterRegistry:
+    """
+    按 (平台, 上游 host) 维护限流器, 配置按平台生效
+    """
+
+    def __init__(self, config: Dict[str, dict] = None):
+        self.config = config or {}
+        # 模块为自己的"平台"设置的默认配置, 如图床上传不需要令牌桶
+        self.platform_defaults: Dict[str, dict] = {}
+        self._limiters: Dict[Tuple[str, str], AdaptiveLimiter] = {}
+
+    def set_platform_defaults(self, platform: str, **config) -> None:
+        """
+        设置平台的默认配置, 优先级低于 RATE_LIMIT_CONFIG 中该平台的配置
+        :param platform: 平台名称
+        :param config: 同 DEFAULT_RATE_LIMIT_CONFIG
+        :return:
+        """
+        self.platform_defaults[platform] = config
+
+    def get_config(self, platform: str) -> dict:
+        return {
+            **DEFAULT_RATE_LIMIT_CONFIG,
+            **self.config.get("default", {}),
+            **self.platform_defaults.get(platform, {}),
+            **self.config.get(platform, {}),
+        }
+
+    def get(self, platform: str, host: str) -> AdaptiveLimiter:
+        key = (platform, host)
+        limiter = self._limiters.get(key)
+        if limiter is None:
+            limiter = self._limiters[key] = AdaptiveLimiter(**self.get_config(platform))
+        return limiter
+
+    def stats(self) -> Dict[str, Dict[str, dict]]:
+        result = {}
+        for (platform, host), limiter in self._limiters.items():
+            result.setdefault(platform, {})[host] = limiter.stats()
+        return result
+
+
+def is_throttled_response(response: httpx.Response) -> bool:
+    """
+    判断上游是否在限流: 429, 5xx, 或跳转到验证码页面
+    """
+    if response.status_code == 429 or response.status_code >= 500:
+        return True
+    location = response.headers.get("location", "")
+    return "captcha" in location or "captcha" in response.url.path
+
+
+rate_limiter_registry = RateLimiterRegistry(
+    json.loads(os.getenv("RATE_LIMIT_CONFIG", "") or "{}")
+)
@@ -0,0 +1,57 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class _Call:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    合并相同 key 的并发调用: 同一时刻只执行一次, 其余调用方等待同一个任务的结果
+
+    - 任务失败时, 异常会抛给所有等待者
+    - 某个等待者被取消不影响其他等待者; 所有等待者都取消后, 任务也会被取消
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        执行 fn, 如果相同 key 的调用正在执行, 则等待其结果
+        :param key: 合并调用的 key
+        :param fn: 返回协程的函数
+        :return: fn 的返回值
+        """
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(fn()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _: self._forget(key, call))
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        except asyncio.CancelledError:
+            # 最后一个等待者被取消时, 没有人需要结果了, 取消正在执行的任务;
+            # 任务可能还要一段时间才结束, 先移除 key, 之后的调用重新执行而不是等待被取消的任务
+            if call.waiters == 1 and not call.task.done():
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+                call.task.cancel()
+            raise
+        finally:
+            call.waiters -= 1
+
+    def _forget(self, key: Hashable, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        # 所有等待者都已取消时, 避免出现 "exception was never retrieved" 警告
+        if not call.task.cancelled():
+            call.task.exception()
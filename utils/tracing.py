@@ -0,0 +1,176 @@
+"""
+请求内的分段耗时追踪: 记录每次上游请求、数据提取和解码的耗时,
+以 Server-Timing 响应头返回, 可选输出结构化日志或 OpenTelemetry span
+"""
+
+import logging
+import os
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+from utils import fastjson
+
+try:
+    from opentelemetry import trace as otel_trace
+except ImportError:  # 未安装 opentelemetry 时不输出 span
+    otel_trace = None
+
+# 是否返回 Server-Timing 响应头
+TRACE_SERVER_TIMING = os.getenv("TRACE_SERVER_TIMING", "true").lower() == "true"
+# 单个请求最多记录的分段数, 批量解析时避免响应头过大
+TRACE_MAX_SPANS = int(os.getenv("TRACE_MAX_SPANS", "32"))
+# 是否输出结构化日志(每个请求一行 json), 只输出耗时不低于 TRACE_LOG_MIN_MS 的请求
+TRACE_LOG = os.getenv("TRACE_LOG", "false").lower() == "true"
+TRACE_LOG_MIN_MS = float(os.getenv("TRACE_LOG_MIN_MS", "0"))
+# 是否输出 OpenTelemetry span, 需要自行安装并配置 opentelemetry-sdk
+TRACE_OTEL = os.getenv("TRACE_OTEL", "false").lower() == "true"
+
+logger = logging.getLogger(__name__)
+if TRACE_LOG and not logger.handlers:
+    # uvicorn 只配置了自己的 logger, 这里单独输出到 stderr
+    logger.addHandler(logging.StreamHandler())
+    logger.setLevel(logging.INFO)
+
+_tracer = otel_trace.get_tracer("parse-video-py") if TRACE_OTEL and otel_trace else None
+
+
+class Span:
+    __slots__ = ("name", "desc", "start", "duration", "attributes")
+
+    def __init__(self, name: str, desc: str = "", **attributes: Any):
+        self.name = name
+        self.desc = desc
+        self.start = time.perf_counter()
+        self.duration = 0.0
+        self.attributes = attributes
+
+    def to_dict(self, trace_start: float) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "desc": self.desc,
+            "start_ms": round((self.start - trace_start) * 1e3, 2),
+            "dur_ms": round(self.duration * 1e3, 2),
+            **self.attributes,
+        }
+
+
+class Trace:
+    """
+    一个请求内记录的所有分段
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.start = time.perf_counter()
+        self.spans: List[Span] = []
+        # 超过 TRACE_MAX_SPANS 未记录的分段数
+        self.dropped = 0
+
+    def add(self, span: Span) -> None:
+        if len(self.spans) < TRACE_MAX_SPANS:
+            self.spans.append(span)
+        else:
+            self.dropped += 1
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+    def server_timing(self) -> str:
+        """
+        Server-Timing 响应头, 如: upstream;desc="douyin v.douyin.com 302";dur=35.2
+        """
+        items = [f"total;dur={self.elapsed() * 1e3:.1f}"]
+        for span in self.spans:
+            item = span.name
+            if span.desc:
+                item += f';desc="{_escape_desc(span.desc)}"'
+            items.append(f"{item};dur={span.duration * 1e3:.1f}")
+        return ", ".join(items)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "dur_ms": round(self.elapsed() * 1e3, 2),
+            "spans": [span.to_dict(self.start) for span in self.spans],
+            "dropped": self.dropped,
+        }
+
+
+def _escape_desc(desc: str) -> str:
+    # 响应头只能是 ascii, desc 为 quoted-string
+    desc = desc.encode("ascii", "replace").decode()
+    return desc.replace("\\", "\\\\").replace('"', '\\"')
+
+
+# 当前请求的追踪记录, 不在请求中(如直接调用解析方法)时为 None
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+
+
+@contextmanager
+def start_trace(name: str) -> Iterator[Trace]:
+    """
+    开始记录一个请求的分段耗时, 结束时按配置输出结构化日志
+    :param name: 名称, 如请求路径
+    """
+    trace = Trace(name)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+        if TRACE_LOG and trace.elapsed() * 1e3 >= TRACE_LOG_MIN_MS:
+            logger.info(fastjson.dumps(trace.to_dict()).decode())
+
+
+@contextmanager
+def trace_span(name: str, desc: str = "", **attributes: Any) -> Iterator[Span]:
+    """
+    记录一段耗时, 可在上下文中修改 span.desc 和 span.attributes
+    :param name: 分段名称, 需要是 Server-Timing 允许的 token, 如 upstream、decode
+    :param desc: 描述, 如上游 host
+    :param attributes: 附加属性, 输出到结构化日志和 OpenTelemetry span
+    """
+    span = Span(name, desc, **attributes)
+    otel_context = _tracer.start_as_current_span(name) if _tracer else nullcontext()
+    with otel_context as otel_span:
+        try:
+            yield span
+        except Exception as err:
+            span.attributes["error"] = type(err).__name__
+            raise
+        finally:
+            span.duration = time.perf_counter() - span.start
+            trace = _current_trace.get()
+            if trace is not None:
+                trace.add(span)
+            if otel_span is not None:
+                otel_span.set_attributes({"desc": span.desc, **span.attributes})
+
+
+class ServerTimingMiddleware:
+    """
+    ASGI 中间件: 为每个 http 请求记录分段耗时, 并返回 Server-Timing 响应头
+
+    流式响应的响应头先于响应体发送, 只包含发送响应头之前的分段
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with start_trace(scope["path"]) as trace:
+
+            async def send_with_server_timing(message):
+                if message["type"] == "http.response.start" and TRACE_SERVER_TIMING:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", trace.server_timing().encode()))
+                    message = {**message, "headers": headers}
+                await send(message)
+
+            await self.app(scope, receive, send_with_server_timing)
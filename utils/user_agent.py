@@ -0,0 +1,82 @@
+import os
+import random
+import time
+from typing import Dict, List, Tuple
+
+# 每个系统预生成的 User-Agent 数量
+UA_POOL_SIZE = int(os.getenv("UA_POOL_SIZE", "50"))
+# 同一平台固定使用同一个 User-Agent 的时长(秒), 0 表示每次请求随机
+UA_PIN_TTL = float(os.getenv("UA_PIN_TTL", "0"))
+
+
+class UserAgentPool:
+    """
+    预生成的 User-Agent 池
+
+    fake_useragent.UserAgent 每次构造都要重新加载 UA 数据,
+    这里只在启动时构造一次, 按系统预先采样, 请求时直接从池中随机取
+    """
+
+    def __init__(
+        self,
+        os_list: Tuple[str, ...] = ("ios", "android", "windows"),
+        pool_size: int = UA_POOL_SIZE,
+        pin_ttl: float = UA_PIN_TTL,
+    ):
+        self.os_list = os_list
+        self.pool_size = pool_size
+        self.pin_ttl = pin_ttl
+        self._pools: Dict[str, List[str]] = {}
+        # key -> (User-Agent, 过期时间)
+        self._pinned: Dict[Tuple[str, str], Tuple[str, float]] = {}
+
+    def load(self) -> None:
+        """
+        预生成所有系统的 User-Agent 池, 应用启动时调用
+        :return:
+        """
+        for os_name in self.os_list:
+            self._get_pool(os_name)
+
+    def _get_pool(self, os_name: str) -> List[str]:
+        pool = self._pools.get(os_name)
+        if pool is None:
+            pool = self._pools[os_name] = self._build_pool(os_name)
+        return pool
+
+    def _build_pool(self, os_name: str) -> List[str]:
+        import fake_useragent
+
+        ua = fake_useragent.UserAgent(os=[os_name])
+        samples = {ua.random for _ in range(self.pool_size * 3)}
+        return list(samples)[: self.pool_size]
+
+    def random(self, os_name: str = "ios") -> str:
+        """
+        随机获取一个 User-Agent
+        :param os_name: 系统: ios, android, windows...
+        :return:
+        """
+        return random.choice(self._get_pool(os_name))
+
+    def pinned(self, os_name: str, key: str) -> str:
+        """
+        获取 key 对应的固定 User-Agent, 在 pin_ttl 秒内保持不变
+        :param os_name: 系统: ios, android, windows...
+        :param key: 会话标识, 如平台名称
+        :return:
+        """
+        if self.pin_ttl <= 0:
+            return self.random(os_name)
+
+        now = time.monotonic()
+        pinned = self._pinned.get((os_name, key))
+        if pinned and pinned[1] > now:
+            return pinned[0]
+
+        user_agent = self.random(os_name)
+        self._pinned[(os_name, key)] = (user_agent, now + self.pin_ttl)
+        return user_agent
+
+
+user_agent_pool = UserAgentPool()